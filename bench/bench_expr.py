@@ -0,0 +1,30 @@
+"""
+Expr tree cost: memory held by genclass() output, time to build it and time to render it.
+run from the repo root: python -m bench.bench_expr
+"""
+import time, tracemalloc
+from dartjsonclass.dartgen import genclass
+from .bench_format import wide_class
+
+def main():
+    print(f"{'fields':>7} {'tree MB':>8} {'blocks':>8} {'build ms':>9} {'render ms':>10}")
+    for nfields in (200, 800, 3200):
+        cls = wide_class(nfields)
+        tracemalloc.start()
+        expr = genclass(cls, meta=True)
+        size = tracemalloc.get_traced_memory()[0]
+        blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+        tracemalloc.stop()
+        build = render = float('inf')
+        for _ in range(3):
+            del expr
+            start = time.perf_counter()
+            expr = genclass(cls, meta=True)
+            build = min(build, time.perf_counter() - start)
+            start = time.perf_counter()
+            expr.render()
+            render = min(render, time.perf_counter() - start)
+        print(f'{nfields:>7} {size / 1e6:>8.2f} {blocks:>8} {build * 1e3:>9.1f} {render * 1e3:>10.1f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""
+format_exprs scaling: time per token should stay flat as classes grow.
+run from the repo root: python -m bench.bench_format
+"""
+import time
+from dartjsonclass.codegen import format_exprs
+from dartjsonclass.dartgen import genclass
+from dartjsonclass.parser import DartClass
+from test.test_format import reference_format_exprs
+
+FIELD_TYPES = ['String', 'int?', 'List<Item>', 'Map<String, List<Other>>', 'DateTime?']
+
+def wide_class(nfields: int) -> DartClass:
+    "class with nfields fields cycling through FIELD_TYPES"
+    return DartClass.parse('Wide', {'fields': [
+        f'{FIELD_TYPES[i % len(FIELD_TYPES)]} f{i}'
+        for i in range(nfields)
+    ]})
+
+def best_of(fn, tokens, repeat=3) -> float:
+    "min wall time of fn(tokens) over repeat runs"
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(tokens)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    print(f"{'fields':>7} {'tokens':>8} {'new ms':>8} {'ns/tok':>7} {'ref ms':>9} {'ns/tok':>8}")
+    for nfields in (50, 200, 800, 3200, 12800):
+        tokens = genclass(wide_class(nfields), meta=True).render()
+        new = best_of(format_exprs, tokens)
+        ref = best_of(reference_format_exprs, tokens, 1)
+        print(f'{nfields:>7} {len(tokens):>8} {new * 1e3:>8.1f} {new / len(tokens) * 1e9:>7.0f} {ref * 1e3:>9.1f} {ref / len(tokens) * 1e9:>8.0f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+whole-pipeline benchmark on a synthetic schema: time + memory per generator stage, with machine-readable output.
+run from the repo root: python -m bench.bench_gen [--models N --fields N ...] [--json out.json]
+"""
+import argparse, importlib, json, os, platform, sys, tempfile, time, tracemalloc
+from typing import Callable, Dict, Tuple
+from dartjsonclass.cache import write_if_changed
+from dartjsonclass.codegen import format_exprs
+from dartjsonclass.dartgen import genclass, SUBTREE_CACHE
+from dartjsonclass.pydantic_source import classes_in_module, dart_type, pydantic_to_dart
+from .synth import Shape, meta_names, write_module
+
+STAGES = ('classes_in_module', 'pydantic_to_dart', 'genclass', 'render', 'format_exprs', 'write')
+
+def stage_fns(path: str, out_path: str, meta: set) -> Dict[str, Callable]:
+    "each stage takes the previous stage's result"
+    return {
+        'classes_in_module': lambda _: classes_in_module(path),
+        'pydantic_to_dart': lambda classes: [pydantic_to_dart(cls) for cls in classes],
+        'genclass': lambda dart_classes: [genclass(cls, meta=cls.name in meta) for cls in dart_classes],
+        'render': lambda exprs: [expr.render() for expr in exprs],
+        'format_exprs': lambda token_lists: ['\n'.join(format_exprs(tokens)) for tokens in token_lists],
+        'write': lambda texts: write_if_changed(out_path, '\n\n'.join(texts)),
+    }
+
+def reset(module: str, out_path: str):
+    "make the next pipeline run start cold: re-import the schema, empty the memos, no output file"
+    sys.modules.pop(module, None)
+    importlib.invalidate_caches()
+    dart_type.cache_clear()
+    SUBTREE_CACHE.clear()
+    if os.path.exists(out_path):
+        os.remove(out_path)
+
+def run_pipeline(fns: Dict[str, Callable], memory: bool) -> Tuple[Dict[str, dict], dict]:
+    "run every stage once. returns per-stage measurements + the intermediate results"
+    stats = {}
+    results = {}
+    value = None
+    for name in STAGES:
+        if memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        value = fns[name](value)
+        elapsed = time.perf_counter() - start
+        stats[name] = {'seconds': elapsed}
+        if memory:
+            current, peak = tracemalloc.get_traced_memory()
+            stats[name].update(alloc_bytes=current - before, peak_bytes=peak - before)
+        results[name] = value
+    return stats, results
+
+def bench(shape: Shape, repeat: int = 3) -> dict:
+    "best-of-repeat times (without tracemalloc) + one traced run for memory"
+    meta = set(meta_names(shape))
+    with tempfile.TemporaryDirectory() as root:
+        path = write_module(root, shape)
+        module = path.removesuffix('.py')
+        out_path = os.path.join(root, 'out.dart')
+        cwd = os.getcwd()
+        os.chdir(root)
+        sys.path.insert(0, root)
+        try:
+            fns = stage_fns(path, out_path, meta)
+            best = {name: float('inf') for name in STAGES}
+            for _ in range(repeat):
+                reset(module, out_path)
+                stats, _ = run_pipeline(fns, memory=False)
+                for name in STAGES:
+                    best[name] = min(best[name], stats[name]['seconds'])
+            reset(module, out_path)
+            tracemalloc.start()
+            try:
+                mem, results = run_pipeline(fns, memory=True)
+            finally:
+                tracemalloc.stop()
+            size = os.path.getsize(out_path)
+        finally:
+            sys.path.remove(root)
+            os.chdir(cwd)
+            sys.modules.pop(module, None)
+    return {
+        'shape': shape.asdict(),
+        'repeat': repeat,
+        'python': platform.python_version(),
+        'stages': {
+            name: {'seconds': best[name], 'alloc_bytes': mem[name]['alloc_bytes'], 'peak_bytes': mem[name]['peak_bytes']}
+            for name in STAGES
+        },
+        'totals': {
+            'classes': len(results['pydantic_to_dart']),
+            'meta_classes': len(meta),
+            'fields': sum(len(cls.fields) for cls in results['pydantic_to_dart']),
+            'tokens': sum(map(len, results['render'])),
+            'output_bytes': size,
+            'seconds': sum(best.values()),
+        },
+    }
+
+def print_table(report: dict, stream=sys.stdout):
+    print(f"{'stage':<18} {'ms':>9} {'alloc MB':>9} {'peak MB':>9}", file=stream)
+    for name, stage in report['stages'].items():
+        print(f"{name:<18} {stage['seconds'] * 1e3:>9.1f} {stage['alloc_bytes'] / 1e6:>9.2f} {stage['peak_bytes'] / 1e6:>9.2f}", file=stream)
+    totals = report['totals']
+    print(f"{totals['classes']} classes, {totals['fields']} fields, {totals['tokens']} tokens, {totals['output_bytes'] / 1e3:.0f} kB out, {totals['seconds'] * 1e3:.0f} ms total", file=stream)
+
+def compare(report: dict, baseline: dict, stream=sys.stdout):
+    "per-stage time ratio against an earlier report (> 1 is slower)"
+    if baseline['shape'] != report['shape']:
+        print('warning: baseline has a different shape', file=stream)
+    for name, stage in report['stages'].items():
+        if name in baseline['stages']:
+            print(f"{name:<18} {stage['seconds'] / baseline['stages'][name]['seconds']:>6.2f}x", file=stream)
+
+def main():
+    p = argparse.ArgumentParser()
+    defaults = Shape()
+    for name, value in defaults.asdict().items():
+        p.add_argument(f'--{name}', type=type(value), default=value)
+    p.add_argument('--repeat', type=int, default=3)
+    p.add_argument('--baseline', help="earlier --json report to compare stage times against")
+    p.add_argument('--json', help="write the report here as json ('-' for stdout, which moves the table to stderr)")
+    args = p.parse_args()
+    shape = Shape(**{name: getattr(args, name) for name in defaults.asdict()})
+    report = bench(shape, args.repeat)
+    table = sys.stderr if args.json == '-' else sys.stdout
+    print_table(report, table)
+    if args.baseline:
+        with open(args.baseline) as stream:
+            compare(report, json.load(stream), table)
+    if args.json == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, 'w') as out:
+            json.dump(report, out, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+import vs ast source on a synthetic package. cold = fresh process per run (what CI pays), warm = repeat in one process.
+run from the repo root: python -m bench.bench_sources
+"""
+import os, subprocess, sys, tempfile, time
+from dartjsonclass import pydantic_source
+from dartjsonclass.ast_source import StaticSource
+
+FIELD_TYPES = ['str', 'Optional[int]', 'List[{ref}]', 'Dict[str, List[{ref}]]', 'datetime', 'uuid.UUID', "Literal['a', 'b']"]
+
+def write_package(root: str, nmodules: int, nclasses: int, nfields: int) -> list:
+    "write package synpkg under root, each module referencing classes from the previous one. returns relative paths"
+    os.makedirs(os.path.join(root, 'synpkg'))
+    open(os.path.join(root, 'synpkg', '__init__.py'), 'w').close()
+    paths = []
+    for mod in range(nmodules):
+        lines = [
+            'import uuid',
+            'from datetime import datetime',
+            'from typing import Dict, List, Literal, Optional',
+            'import pydantic',
+        ]
+        if mod:
+            lines.append(f'from .m{mod - 1} import C{mod - 1}_0')
+        for cls in range(nclasses):
+            ref = f'C{mod - 1}_0' if mod else 'str'
+            lines.append(f'class C{mod}_{cls}(pydantic.BaseModel):')
+            lines.extend(f'    f{i}: {FIELD_TYPES[i % len(FIELD_TYPES)].format(ref=ref)}' for i in range(nfields))
+        path = f'synpkg/m{mod}.py'
+        with open(os.path.join(root, path), 'w') as out:
+            out.write('\n'.join(lines) + '\n')
+        paths.append(path)
+    return paths
+
+def extract(source, paths):
+    return [source.to_dart(key) for path in paths for key, _, _ in source.models_in_module(path)]
+
+def cold(root: str, paths: list, source: str, repeat: int = 3) -> float:
+    "min wall time of the whole cli in a fresh interpreter"
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-m', 'dartjsonclass', *paths, '--source', source, '-o', os.devnull], cwd=root, env=env, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def warm(paths: list, make_source, repeat: int = 3) -> float:
+    "min time to extract every class again in a process that has already done it once"
+    extract(make_source(), paths)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extract(make_source(), paths)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    print(f"{'classes':>8} {'import cold':>12} {'ast cold':>9} {'import warm':>12} {'ast warm':>9}")
+    for nmodules in (10, 40, 160):
+        with tempfile.TemporaryDirectory() as root:
+            paths = write_package(root, nmodules, 10, 20)
+            cold_import, cold_ast = cold(root, paths, 'import'), cold(root, paths, 'ast')
+            sys.path.insert(0, root)
+            os.chdir(root)
+            try:
+                # warm import: modules stay imported, the cost left is walking __fields__
+                warm_import = warm(paths, lambda: pydantic_source)
+                # warm ast: parsed modules are cached by mtime, the cost left is resolving annotations
+                warm_ast = warm(paths, StaticSource)
+            finally:
+                os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+                sys.path.remove(root)
+                for name in [name for name in sys.modules if name.startswith('synpkg')]:
+                    del sys.modules[name]
+        ms = lambda secs: f'{secs * 1e3:.0f} ms'
+        print(f'{nmodules * 10:>8} {ms(cold_import):>12} {ms(cold_ast):>9} {ms(warm_import):>12} {ms(warm_ast):>9}')
+
+if __name__ == '__main__':
+    main()
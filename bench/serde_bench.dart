@@ -0,0 +1,113 @@
+// serialization throughput, default codegen vs the lean flags (+ --compact), --lazy and --immutable. `make bench-dart` generates both libs + runs this.
+// for allocations, run under `dart --observe` and compare the allocation profile of the two phases in devtools.
+import 'dart:convert';
+import 'package:djc_example/example.dart' as base;
+import 'package:djc_example/jsonbase.dart';
+import 'package:djc_example/example_lean.dart' as lean;
+import 'package:djc_example/example_lazy.dart' as lazy;
+import 'package:djc_example/example_immutable.dart' as immutable;
+
+const iterations = 200000;
+
+/// results land here so the compiler can't drop the work
+Object? sink;
+
+/// runs fn repeatedly, returns ops / second (after a warmup round so the JIT has settled)
+double opsPerSecond(String label, Object? Function() fn) {
+  for (var i = 0; i < iterations ~/ 10; i++) {
+    sink = fn();
+  }
+  final watch = Stopwatch()..start();
+  for (var i = 0; i < iterations; i++) {
+    sink = fn();
+  }
+  watch.stop();
+  final ops = iterations / (watch.elapsedMicroseconds / 1e6);
+  print('${label.padRight(28)} ${ops.toStringAsFixed(0).padLeft(10)} ops/s');
+  return ops;
+}
+
+base.Msg baseMsg() => base.Msg(
+  "12345",
+  null,
+  base.Item(1, "one"),
+  DateTime.parse("2022-01-01 12:00:00+00:00"),
+  [for (var i = 0; i < 20; i++) base.Item(i, "item $i")],
+  {for (var i = 0; i < 20; i++) "k$i": base.Item(i, "val $i")},
+  {"y": base.Item(4, "four")},
+);
+
+lean.Msg leanMsg() => lean.Msg.fromMap(baseMsg().toMap());
+
+base.StrList baseStrList() => base.StrList([for (var i = 0; i < 50; i++) "s$i"], {for (var i = 0; i < 50; i++) "k$i": "v$i"});
+
+lean.StrList leanStrList() => lean.StrList.fromMap(baseStrList().toMap());
+
+/// Msg == as generated before per-type equality
+bool oldMsgEqual(base.Msg a, base.Msg b) =>
+    a.id == b.id && a.maybe == b.maybe && a.item == b.item && a.dt == b.dt &&
+    listEqual(a.item_list, b.item_list) && mapEqual(a.item_dict, b.item_dict) && mapEqual(a.id_dict, b.id_dict);
+
+/// Msg.hashCode with the Object.hashAll-based hashcodeList / hashcodeMap
+int oldMsgHash(base.Msg m) {
+  int oldMap(Map map) => Object.hash(Object.hashAll(map.keys), Object.hashAll(map.values));
+  return Object.hash(m.id, m.maybe, m.item, m.dt, Object.hashAll(m.item_list), oldMap(m.item_dict), oldMap(m.id_dict));
+}
+
+void compare(String label, Object? Function() before, Object? Function() after, {String variant = 'lean'}) {
+  final old = opsPerSecond('$label (default)', before);
+  final now = opsPerSecond('$label ($variant)', after);
+  print('${label.padRight(28)} ${(now / old).toStringAsFixed(2)}x');
+}
+
+void main() {
+  final msg = baseMsg(), msg2 = leanMsg();
+  final strlist = baseStrList(), strlist2 = leanStrList();
+  compare('Msg.toMap', () => msg.toMap(), () => msg2.toMap());
+  compare('Msg.toJson', () => msg.toJson(), () => msg2.toJson());
+  compare('Msg.copy', () => msg.copy(), () => msg2.copy());
+  compare('StrList.toMap', () => strlist.toMap(), () => strlist2.toMap());
+  compare('StrList.toJson', () => strlist.toJson(), () => strlist2.toJson());
+  // writeJson vs the old toJson, jsonEncode(toMap())
+  compare('Msg.writeJson', () => jsonEncode(msg.toMap()), () => msg.toJson());
+  compare('StrList.writeJson', () => jsonEncode(strlist.toMap()), () => strlist.toJson());
+  final msgMap = msg.toMap(), strlistMap = strlist.toMap();
+  final msgJson = msg.toJson(), strlistJson = strlist.toJson();
+  compare('Msg.fromMap', () => base.Msg.fromMap(msgMap), () => lean.Msg.fromMap(msgMap));
+  compare('Msg.fromJson', () => base.Msg.fromJson(msgJson), () => lean.Msg.fromJson(msgJson));
+  compare('StrList.fromMap', () => base.StrList.fromMap(strlistMap), () => lean.StrList.fromMap(strlistMap));
+  compare('StrList.fromJson', () => base.StrList.fromJson(strlistJson), () => lean.StrList.fromJson(strlistJson));
+  // decode, read a couple of fields, throw the rest away
+  compare('Msg.fromJson + 2 fields', () {
+    final m = base.Msg.fromJson(msgJson);
+    return '${m.id}${m.item.b}';
+  }, () {
+    final m = lazy.Msg.fromJson(msgJson);
+    return '${m.id}${m.item.b}';
+  }, variant: 'lazy');
+  final frozen = immutable.Msg.fromMap(msgMap), frozenStrList = immutable.StrList.fromMap(strlistMap);
+  compare('Msg.hashCode', () => msg.hashCode, () => frozen.hashCode, variant: 'immutable');
+  compare('StrList.hashCode', () => strlist.hashCode, () => frozenStrList.hashCode, variant: 'immutable');
+  compare('Msg.copy', () => msg.copy(), () => frozen.copy(), variant: 'immutable');
+  // one-field edit: deep copy + assign vs copyWith, which shares the rest
+  compare('Msg edit one field', () => msg.copy()..id = "x", () => msg.copyWith(id: "x"), variant: 'copyWith');
+  // generated per-type equality vs the generic listEqual / mapEqual it replaced
+  final msgEq = base.Msg.fromMap(msgMap), strlistEq = base.StrList.fromMap(strlistMap);
+  compare('Msg ==', () => oldMsgEqual(msg, msgEq), () => msg == msgEq, variant: 'generated');
+  compare('StrList ==', () => listEqual(strlist.strlist, strlistEq.strlist) && mapEqual(strlist.strmap, strlistEq.strmap), () => strlist == strlistEq, variant: 'generated');
+  // hashcodeList / hashcodeMap vs the Object.hashAll versions they replaced
+  compare('StrList.hashCode', () => Object.hash(Object.hashAll(strlist.strlist), Object.hash(Object.hashAll(strlist.strmap.keys), Object.hashAll(strlist.strmap.values))), () => strlist.hashCode, variant: 'hashing');
+  compare('Msg.hashCode', () => oldMsgHash(msg), () => msg.hashCode, variant: 'hashing');
+  // reading every column of a row: by name vs resolved once to indexes
+  final columns = base.Msg.djc__fields, indexes = [for (final name in columns) msg.fieldIndex(name)];
+  compare('Msg all fields', () => [for (final name in columns) msg.getAttr(name)], () => [for (final i in indexes) msg.getAt(i)], variant: 'getAt');
+  compare('Msg fromMap + toMap', () => base.Msg.fromMap(msgMap).toMap(), () => lazy.Msg.fromMap(msgMap).toMap(), variant: 'lazy');
+  // positional encoding: payload size, then decode + encode time against keyed json
+  final items = [for (var i = 0; i < 100; i++) lean.Item(i, "item $i")];
+  final keyed = jsonEncode([for (final item in items) item.toMap()]), compact = lean.Item.toJsonCompactList(items);
+  print('${'List<Item> json bytes'.padRight(28)} ${keyed.length} keyed, ${compact.length} compact (${(compact.length / keyed.length).toStringAsFixed(2)}x)');
+  final msgCompact = msg2.toJsonCompact();
+  print('${'Msg json bytes'.padRight(28)} ${msgJson.length} keyed, ${msgCompact.length} compact (${(msgCompact.length / msgJson.length).toStringAsFixed(2)}x)');
+  compare('List<Item> decode', () => [for (final m in jsonDecode(keyed)) lean.Item.fromMap(m)], () => lean.Item.fromJsonCompactList(compact), variant: 'compact');
+  compare('Msg decode', () => lean.Msg.fromJson(msgJson), () => lean.Msg.fromJsonCompact(msgCompact), variant: 'compact');
+  compare('Msg encode', () => msg2.toJson(), () => msg2.toJsonCompact(), variant: 'compact');
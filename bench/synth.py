@@ -0,0 +1,69 @@
+"""
+synthetic pydantic schemas for benchmarks. deterministic for a given shape + seed.
+"""
+import os, random
+from dataclasses import dataclass, asdict
+from typing import List
+
+SCALARS = ['str', 'int', 'float', 'bool']
+
+@dataclass
+class Shape:
+    "knobs for a synthetic schema. shares are fractions of fields"
+    models: int = 100
+    fields: int = 20
+    # max nesting of List / Dict around a field's leaf type
+    depth: int = 2
+    optional: float = 0.2
+    union: float = 0.05
+    datetime: float = 0.1
+    # share of fields that reference another model, and of models that get --with-meta
+    refs: float = 0.2
+    meta: float = 0.5
+    seed: int = 0
+
+    def asdict(self) -> dict:
+        return asdict(self)
+
+def field_type(rng: random.Random, shape: Shape, index: int) -> str:
+    "annotation for one field of model `index`. refs only point at earlier models so the module imports in order"
+    roll = rng.random()
+    if roll < shape.union:
+        leaf = f'Union[{rng.choice(SCALARS)}, {rng.choice(SCALARS)}]'
+    elif roll < shape.union + shape.datetime:
+        leaf = 'datetime'
+    elif roll < shape.union + shape.datetime + shape.refs and index:
+        leaf = f'M{rng.randrange(index)}'
+    else:
+        leaf = rng.choice(SCALARS)
+    for _ in range(rng.randint(0, shape.depth)):
+        leaf = f'List[{leaf}]' if rng.random() < 0.5 else f'Dict[str, {leaf}]'
+    if rng.random() < shape.optional:
+        leaf = f'Optional[{leaf}]'
+    return leaf
+
+def module_source(shape: Shape) -> str:
+    "source of a module with shape.models models named M0..Mn"
+    rng = random.Random(shape.seed)
+    lines = [
+        '"synthetic schema, generated by bench/synth.py"',
+        'from datetime import datetime',
+        'from typing import Dict, List, Optional, Union',
+        'import pydantic',
+    ]
+    for index in range(shape.models):
+        lines.append(f'class M{index}(pydantic.BaseModel):')
+        lines.extend(f'    f{field}: {field_type(rng, shape, index)}' for field in range(shape.fields))
+    return '\n'.join(lines) + '\n'
+
+def meta_names(shape: Shape) -> List[str]:
+    "class names to pass to --with-meta"
+    rng = random.Random(shape.seed + 1)
+    return [f'M{index}' for index in range(shape.models) if rng.random() < shape.meta]
+
+def write_module(root: str, shape: Shape, name: str = 'synth_schema') -> str:
+    "write module_source to root/name.py, return the path relative to root"
+    path = f'{name}.py'
+    with open(os.path.join(root, path), 'w') as out:
+        out.write(module_source(shape))
+    return path
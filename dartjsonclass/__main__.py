@@ -1,15 +1,17 @@
-import argparse, sys, collections, os, shutil
-from typing import List, Sequence
-import pydantic
+import argparse, sys, collections, itertools, json, os
+from typing import Dict, List, Optional, Set, Tuple
 from .parser import DartClass
-from .dartgen import genclass
-from .codegen import format_exprs
-from .pydantic_source import classes_in_module, pydantic_to_dart, dep_classes
+from .cache import RenderCache, write_if_changed
+from .render import iter_classes, render_modules
+from .depgraph import DepGraph
+from .ast_source import StaticSource
+from .watch import watch
+from . import compact, timings
 
 def main():
     p = argparse.ArgumentParser()
     # todo: command to detect + clear generated files in a target dir
-    p.add_argument('paths', help="list of .py or .dart files to process", nargs='+')
+    p.add_argument('paths', help="list of .py or .json spec files to process", nargs='+')
     p.add_argument('-o', '--output', default='-', help="destination file (default stdout)")
     p.add_argument('--mods', action='store_true', help="treat '-o' as directory, make submodules that match source layout")
     p.add_argument('--no-ser', action='store_true', help="omit json / map methods")
@@ -17,88 +19,200 @@ def main():
     p.add_argument('--no-data', action='store_true', help="omit dataclass methods (copy, equal)")
     p.add_argument('--exclude', help="list of classes to exclude", nargs='+')
     p.add_argument('--include', help="list of classes to include (if none given, include all)", nargs='+')
+    p.add_argument('--lean-tomap', action='store_true', help="toMap as a map literal, primitive collections passed through uncopied (the map shares them with the object)")
+    p.add_argument('--lean-frommap', action='store_true', help="fromMap with fixed-length lists and no closure chains. fromMap(raw, owned: true) adopts primitive collections from raw without copying")
+    p.add_argument('--lazy', action='store_true', help="fromMap keeps the map and decodes each field on first access. toMap / toJson reuse the map while nothing has been modified")
+    p.add_argument('--immutable', action='store_true', help="final fields, unmodifiable collections (dynamic values frozen deeply), copy() returns this. hashCode is cached, except on classes of scalars only: those get const constructors instead, and hash in O(fields)")
+    p.add_argument('--cow-copy', action='store_true', help="fromMap stores list / map fields copy-on-write, so copy() shares them until either side writes. collections passed in from outside are still copied. with --lean-frommap its lists are growable, not fixed-length")
+    p.add_argument('--hash-limit', type=int, help="hashCode looks at the length + first N elements of each list instead of all of them")
+    p.add_argument('--compact', action='store_true', help="add toList / fromList + toJsonCompact / fromJsonCompact: objects as json arrays in field order, documents tagged with a schema fingerprint")
     p.add_argument('--no-datetime', action='store_true', help="don't convert datetimes, treat them as strings instead")
+    p.add_argument('-j', '--jobs', type=int, default=1, help="render in a pool of this many processes (per module with --mods, per class otherwise)")
+    p.add_argument('--watch', action='store_true', help="keep running: poll the source files, regenerate outputs affected by changes")
+    p.add_argument('--cache', help="path to a render cache file. unchanged classes reuse cached output, unchanged files aren't rewritten")
+    p.add_argument('--dump-spec', action='store_true', help="write the loaded classes as a .json spec (which can be fed back in as a path) instead of dart")
+    p.add_argument('--timings', nargs='?', const='text', choices=('text', 'json'), help="report time + allocations per stage and per class, cache stats (text by default, or --timings=json)")
+    p.add_argument('--timings-file', help="write the --timings report here instead of stderr")
+    p.add_argument('--source', choices=('import', 'ast'), default='import', help="how to read .py files: import them (default), or parse them with ast without running them")
     args = p.parse_args()
 
     if args.no_ser:
         raise NotImplementedError("we don't know how to omit json methods")
     if args.no_datetime:
         raise NotImplementedError("no_datetime not supported yet")
+    if args.lazy and args.lean_frommap:
+        p.error("--lazy and --lean-frommap are exclusive")
+    if args.lazy and args.immutable:
+        p.error("--lazy and --immutable are exclusive")
 
-    classes = {}
+    if args.timings:
+        if args.watch:
+            raise ValueError("--timings doesn't work with --watch")
+        timings.TIMINGS = timings.Timings()
+
+    cache = RenderCache.load(args.cache) if args.cache else None
+    if args.dump_spec:
+        dump_spec(args)
+    elif args.watch:
+        if args.output == '-':
+            raise ValueError("can't use '-' with --watch")
+        watch(args, generate, cache)
+    else:
+        generate(args, cache=cache)
+
+    if args.timings:
+        report_caches(timings.TIMINGS, cache, args.jobs)
+        timings.TIMINGS.write(args.timings, args.timings_file)
+
+def report_caches(report: timings.Timings, cache: Optional[RenderCache], jobs: int):
+    "cache stats for --timings. memo stats only cover this process, so they're skipped when rendering in a pool"
+    from .parser import DartType, INTERNED
+    from .dartgen import SUBTREE_CACHE
+    if cache is not None:
+        report.caches['render cache'] = {'hits': cache.hits, 'misses': cache.misses}
+    report.caches['DartType.parse'] = timings.cache_info_dict(DartType.parse.cache_info())
+    report.caches['interned types'] = {'size': len(INTERNED)}
+    if 'dartjsonclass.pydantic_source' in sys.modules:
+        report.caches['dart_type'] = timings.cache_info_dict(sys.modules['dartjsonclass.pydantic_source'].dart_type.cache_info())
+    if jobs <= 1:
+        report.caches['subtrees'] = SUBTREE_CACHE.stats()
+
+def make_source(args):
+    "model source for args.source: something with models_in_module(path) -> [(key, module, name)] and to_dart(key)"
+    if args.source == 'ast':
+        # fresh per run so edited files get re-read; parsed modules are cached by mtime underneath
+        return StaticSource()
+    # imported lazily so ast runs don't pay for importing pydantic
+    from . import pydantic_source
+    return pydantic_source
+
+def load_classes(args, names: Optional[Set[str]] = None) -> List[Tuple[str, DartClass]]:
+    "read source paths, return (module, dart class) pairs after include / exclude (or only those in names, if given)"
+    source = None
+    # path -> [(key, module, name)], plus key -> DartClass for spec classes which come already converted
+    models = {}
+    specs = {}
     for path in args.paths:
         if path.endswith('.py'):
-            classes[path] = classes_in_module(path)
+            with timings.stage('load'):
+                source = source or make_source(args)
+                models[path] = source.models_in_module(path)
+        elif path.endswith('.json'):
+            models[path] = []
+            with timings.stage('load'), open(path) as stream:
+                for module, dart_cls in DartClass.parse_spec(json.load(stream)):
+                    key = (path, dart_cls.name)
+                    specs[key] = dart_cls
+                    models[path].append((key, DartClass.spec_module(path, module), dart_cls.name))
         elif path.endswith('.dart'):
-            # classes = DartClass.parse_file(open(args.path))
             raise NotImplementedError('todo: dart class parsing')
         else:
             raise ValueError(f'path {path} with unknown extension')
     by_name = {}
     prev = {}
-    for path, path_classes in classes.items():
-        for cls in path_classes:
-            if isinstance(cls, type) and issubclass(cls, pydantic.BaseSettings):
-                continue
-            if cls.__name__ in (args.exclude or ()) or (args.include and cls.__name__ not in args.include):
+    for path, path_models in models.items():
+        for key, module, name in path_models:
+            if names is not None:
+                if name not in names:
+                    continue
+            elif name in (args.exclude or ()) or (args.include and name not in args.include):
                 continue
-            if cls.__name__ in by_name and by_name[cls.__name__] is not cls:
-                raise KeyError(f'duplicate {cls.__name__} in {path} (previous {prev[cls.__name__]})')
-            by_name[cls.__name__] = cls
-            prev[cls.__name__] = path
-    del prev
-    dart_classes = []
-    for cls in by_name.values():
-        dart_classes.append(pydantic_to_dart(cls))
-    gen_cls = [
-        genclass(cls, meta=cls.name in (args.with_meta or ()), data=not args.no_data)
-        for cls in dart_classes
-    ]
+            if name in by_name and by_name[name][0] != key:
+                raise KeyError(f'duplicate {name} in {path} (previous {prev[name]})')
+            by_name[name] = (key, module)
+            prev[name] = path
+    ret = []
+    for name, (key, module) in by_name.items():
+        with timings.stage('convert', name):
+            ret.append((module, specs[key] if key in specs else source.to_dart(key)))
+    return ret
+
+def dump_spec(args):
+    "write loaded classes as a spec file, with modules so --mods works from the spec"
+    spec = json.dumps({dart_cls.name: dart_cls.dump(module) for module, dart_cls in load_classes(args)}, indent=2) + '\n'
+    if args.output == '-':
+        sys.stdout.write(spec)
+    else:
+        write_if_changed(args.output, spec)
+
+def compact_schemas(args, classes: List[Tuple[str, DartClass]]) -> Dict[str, str]:
+    """
+    --compact fingerprints. classes the output refers to but --include / --exclude dropped are loaded too, so the hash
+    covers the same set as compact.fingerprint_for on the python side
+    """
+    by_name = {dart_cls.name: dart_cls for _, dart_cls in classes}
+    refs = lambda: {ref for dart_cls in by_name.values() for field in dart_cls.fields for ref in compact.ext_names(field.dart_type)}
+    asked = set()
+    missing = refs() - by_name.keys()
+    while missing:
+        asked |= missing
+        by_name.update((dart_cls.name, dart_cls) for _, dart_cls in load_classes(args, missing))
+        # names that aren't in any source stay unresolved, schema_text hashes just the name
+        missing = refs() - by_name.keys() - asked
+    return {dart_cls.name: compact.fingerprint(dart_cls.name, by_name) for _, dart_cls in classes}
+
+def generate(args, only_modules: Optional[Set[str]] = None, cache: RenderCache = None) -> DepGraph:
+    """
+    Load, render and write everything in args. only_modules limits which output files get rendered with --mods
+    (the watcher uses this). Returns the dependency graph.
+    """
+    classes = load_classes(args)
+    with timings.stage('depgraph'):
+        graph = DepGraph(classes)
+    schemas = compact_schemas(args, classes) if args.compact else {}
+    flags = lambda cls: dict(meta=cls.name in (args.with_meta or ()), data=not args.no_data, lean_tomap=args.lean_tomap, lean_frommap=args.lean_frommap, lazy=args.lazy, immutable=args.immutable, cow_copy=args.cow_copy, hash_limit=args.hash_limit, compact=schemas.get(cls.name))
     if args.mods:
         # mods means create separate dart files per separate python files
         # todo: factor this out pls
         by_mod = collections.defaultdict(list)
-        for cls, exprs in zip(by_name.values(), gen_cls):
-            by_mod[cls.__module__].append((cls, exprs))
+        for mod, dart_cls in classes:
+            by_mod[mod].append(dart_cls)
         if args.output == '-':
             raise ValueError("can't use '-' with --mods")
         if os.path.exists(args.output) and not os.path.isdir(args.output):
             raise ValueError(f"output dir {args.output} isn't a directory")
         if not os.path.exists(args.output):
             os.makedirs(args.output)
-        shutil.copy(os.path.join(os.path.dirname(__file__), 'jsonbase.dart'), args.output)
-        for mod, pairs in by_mod.items():
+        with open(os.path.join(os.path.dirname(__file__), 'jsonbase.dart')) as jsonbase:
+            write_if_changed(os.path.join(args.output, 'jsonbase.dart'), jsonbase.read())
+        jobs = []
+        for mod, dart_classes in by_mod.items():
+            if only_modules is not None and mod not in only_modules:
+                if cache is not None:
+                    cache.retain(dart_cls.name for dart_cls in dart_classes)
+                continue
             # sorting so subsequent runs produce consistent diffs
-            pairs.sort(key=lambda pair: pair[0].__name__)
-            fname = mod_out_path(args.output, mod)
-            print('writing', fname)
-            with open(fname, 'w') as outfile:
-                write_preamble(outfile, local_imports(mod, (cls for cls, _ in pairs)))
-                for _, exprs in pairs:
-                    outfile.write('\n'.join(format_exprs(exprs.render())))
-                    outfile.write('\n\n')
+            dart_classes.sort(key=lambda dart_cls: dart_cls.name)
+            jobs.append((
+                mod_out_path(args.output, mod),
+                preamble(local_imports(graph, mod)),
+                [(dart_cls, flags(dart_cls), cache and cache.lookup(dart_cls, flags(dart_cls))) for dart_cls in dart_classes],
+                cache is not None,
+            ))
+        with timings.stage('output'):
+            for fname, written in render_modules(jobs, cache, args.jobs):
+                print('writing' if written else 'unchanged', fname)
     else:
-        outfile = sys.stdout if args.output == '-' else open(args.output, 'w')
-        write_preamble(outfile)
-        for exprs in gen_cls:
-            # todo: python source file + line
-            outfile.write('\n'.join(format_exprs(exprs.render())))
-            outfile.write('\n\n')
-
-def local_imports(current_module: str, classes: Sequence[pydantic.BaseModel]) -> List[str]:
-    "return list of local import statements using dep_classes() to find dependencies"
-    deps = {
-        depcls.__module__
-        for cls in classes
-        for depcls in dep_classes(cls)
-        if depcls.__module__ != current_module
-    }
+        chunks = itertools.chain((preamble(),), iter_classes([(cls, flags(cls)) for _, cls in classes], cache, args.jobs))
+        # output includes genclass / render / format of each class, since rendering streams into the write. its self_seconds don't
+        with timings.stage('output'):
+            if args.output == '-':
+                sys.stdout.writelines(chunks)
+            else:
+                write_if_changed(args.output, chunks)
+    if cache is not None:
+        cache.save()
+    return graph
+
+def local_imports(graph: DepGraph, current_module: str) -> List[str]:
+    "return list of local import statements for the modules that current_module's classes reference"
     return [
         f"import './{mod_out_path('', dep)}';"
-        for dep in deps
+        for dep in graph.module_deps[current_module]
     ]
 
-def write_preamble(outfile, extras=()):
+def preamble(extras=()) -> str:
+    "header for generated files"
     lines = [
         '// generated by dartjsonclass (todo date + dunamai version)',
         '// ignore_for_file: non_constant_identifier_names',
@@ -107,7 +221,7 @@ def write_preamble(outfile, extras=()):
         # note: sort extras for consistent diffs
         *sorted(extras),
     ]
-    outfile.write('\n'.join(lines) + '\n\n')
+    return '\n'.join(lines) + '\n\n'
 
 def mod_out_path(root: str, mod: str) -> str:
     "output path for module"
@@ -0,0 +1,359 @@
+"""
+use pydantic classes as a source without importing them.
+parses modules with ast and follows imports statically, produces the same DartClasses as pydantic_source.
+"""
+
+import ast, os, warnings
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from .parser import DartClass, DartField, DartType
+
+# (module, name) of a definition
+Symbol = Tuple[str, str]
+
+# re-exports we know about, so pydantic.main.BaseModel and pydantic.BaseModel are the same symbol
+CANONICAL_MODULES = {
+    'pydantic.main': 'pydantic',
+    'pydantic.env_settings': 'pydantic',
+    'pydantic.types': 'pydantic',
+    'pydantic.fields': 'pydantic',
+    'typing_extensions': 'typing',
+}
+BUILTINS = ('int', 'float', 'str', 'bool', 'list', 'dict', 'object')
+# symbol -> dart name for leaf types
+SIMPLE_TYPES = {
+    ('builtins', 'int'): 'int',
+    ('builtins', 'float'): 'double',
+    ('builtins', 'str'): 'String',
+    ('builtins', 'bool'): 'bool',
+    ('uuid', 'UUID'): 'String',
+    ('datetime', 'datetime'): 'DateTime',
+    ('pydantic', 'ConstrainedInt'): 'int',
+    ('pydantic', 'ConstrainedStr'): 'String',
+    # constrained type factories, for annotations like constr(max_length=10)
+    ('pydantic', 'conint'): 'int',
+    ('pydantic', 'constr'): 'String',
+    ('pydantic', 'confloat'): 'double',
+}
+LIST_TYPES = (('typing', 'List'), ('builtins', 'list'))
+DICT_TYPES = (('typing', 'Dict'), ('builtins', 'dict'))
+UNION_TYPES = (('typing', 'Union'), ('typing', 'Optional'))
+ENUM_BASES = {('enum', name) for name in ('Enum', 'IntEnum', 'StrEnum', 'Flag', 'IntFlag')}
+
+@dataclass
+class StaticModule:
+    "parsed module + its top-level names"
+    name: str
+    path: str
+    body: List[ast.stmt]
+    classes: Dict[str, ast.ClassDef]
+    # local name -> (module, attr) for `from x import attr`
+    imported_names: Dict[str, Symbol]
+    # local name -> module for `import x.y` and `import x.y as z`
+    imported_modules: Dict[str, str]
+    # module-level `Alias = SomeType`
+    aliases: Dict[str, ast.expr]
+
+    @classmethod
+    def parse(cls, name: str, path: str, is_package: bool) -> 'StaticModule':
+        with open(path) as src:
+            tree = ast.parse(src.read(), path)
+        package = name if is_package else name.rpartition('.')[0]
+        mod = cls(name, path, tree.body, {}, {}, {}, {})
+        for stmt in tree.body:
+            if isinstance(stmt, ast.ClassDef):
+                mod.classes[stmt.name] = stmt
+            elif isinstance(stmt, ast.ImportFrom):
+                source = resolve_relative(package, stmt.module, stmt.level)
+                for alias in stmt.names:
+                    mod.imported_names[alias.asname or alias.name] = (source, alias.name)
+            elif isinstance(stmt, ast.Import):
+                for alias in stmt.names:
+                    if alias.asname:
+                        mod.imported_modules[alias.asname] = alias.name
+                    else:
+                        top = alias.name.split('.')[0]
+                        mod.imported_modules[top] = top
+            elif isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name):
+                mod.aliases[stmt.targets[0].id] = stmt.value
+        return mod
+
+def resolve_relative(package: str, module: Optional[str], level: int) -> str:
+    "absolute module name for `from {'.' * level}{module} import ...` inside package"
+    if not level:
+        return module
+    parts = package.split('.') if package else []
+    if level > 1:
+        parts = parts[:len(parts) - level + 1]
+    return '.'.join(parts + ([module] if module else []))
+
+# parsed modules by (path, mtime), shared between StaticSource instances so warm runs in one process skip parsing
+PARSED: Dict[Tuple[str, float], StaticModule] = {}
+
+class StaticSource:
+    "finds pydantic models in source files without importing them. modules are looked up as files relative to root"
+
+    def __init__(self, root: str = '.'):
+        self.root = root
+        self.modules: Dict[str, Optional[StaticModule]] = {}
+        self.kinds: Dict[Symbol, Optional[str]] = {}
+        self.field_cache: Dict[Symbol, Dict[str, DartField]] = {}
+
+    def module(self, name: str) -> Optional[StaticModule]:
+        "parsed module, or None for modules that aren't source files under root (stdlib, installed packages)"
+        if name not in self.modules:
+            self.modules[name] = None
+            base = os.path.join(self.root, *name.split('.'))
+            for path, is_package in ((base + '.py', False), (os.path.join(base, '__init__.py'), True)):
+                if os.path.exists(path):
+                    key = (path, os.stat(path).st_mtime)
+                    if key not in PARSED:
+                        # an edited file replaces its old parse instead of piling up next to it
+                        for stale in [stale for stale in PARSED if stale[0] == path]:
+                            del PARSED[stale]
+                        PARSED[key] = StaticModule.parse(name, path, is_package)
+                    self.modules[name] = PARSED[key]
+                    break
+        return self.modules[name]
+
+    def find(self, module: str, name: str, seen: frozenset = frozenset()) -> Symbol:
+        "follow re-exports to where module.name is defined"
+        module = CANONICAL_MODULES.get(module, module)
+        mod = self.module(module)
+        if mod is None or name in mod.classes or name in mod.aliases or (module, name) in seen:
+            return (module, name)
+        if name in mod.imported_names:
+            return self.find(*mod.imported_names[name], seen | {(module, name)})
+        return (module, name)
+
+    def resolve(self, node: ast.expr, mod: StaticModule) -> Optional[Symbol]:
+        "symbol for a Name or dotted Attribute in mod, None if we can't tell"
+        if isinstance(node, ast.Name):
+            if node.id in mod.classes or node.id in mod.aliases:
+                return (mod.name, node.id)
+            if node.id in mod.imported_names:
+                return self.find(*mod.imported_names[node.id])
+            if node.id in BUILTINS:
+                return ('builtins', node.id)
+        elif isinstance(node, ast.Attribute):
+            module = self.resolve_module(node.value, mod)
+            if module is not None:
+                return self.find(module, node.attr)
+        return None
+
+    def resolve_module(self, node: ast.expr, mod: StaticModule) -> Optional[str]:
+        "dotted module name for the `x.y` in `x.y.Name`"
+        if isinstance(node, ast.Name):
+            if node.id in mod.imported_modules:
+                return mod.imported_modules[node.id]
+            if node.id in mod.imported_names:
+                # `from x import submodule`
+                return '.'.join(mod.imported_names[node.id])
+        elif isinstance(node, ast.Attribute):
+            base = self.resolve_module(node.value, mod)
+            return base and f'{base}.{node.attr}'
+        return None
+
+    def kind(self, sym: Symbol) -> Optional[str]:
+        "'model', 'settings', 'enum', a dart type name for constrained types, or None"
+        if sym in self.kinds:
+            return self.kinds[sym]
+        # placeholder guards against cyclic bases
+        self.kinds[sym] = None
+        ret = None
+        if sym == ('pydantic', 'BaseModel'):
+            ret = 'model'
+        elif sym == ('pydantic', 'BaseSettings'):
+            ret = 'settings'
+        elif sym in ENUM_BASES:
+            ret = 'enum'
+        elif sym in SIMPLE_TYPES:
+            ret = SIMPLE_TYPES[sym]
+        else:
+            mod = self.module(sym[0])
+            if mod is not None and sym[1] in mod.classes:
+                base_kinds = [self.kind(base) for base in self.bases(sym)]
+                # settings before model because BaseSettings is a BaseModel
+                ret = next((kind for kind in ('settings', 'model', 'enum', 'int', 'String') if kind in base_kinds), None)
+        self.kinds[sym] = ret
+        return ret
+
+    def bases(self, sym: Symbol) -> List[Symbol]:
+        mod = self.module(sym[0])
+        return [base for base in (self.resolve(node, mod) for node in mod.classes[sym[1]].bases) if base is not None]
+
+    def models_in_module(self, path: str) -> List[Tuple[Symbol, str, str]]:
+        "(symbol, module, name) for models in the module's namespace, defined or imported, skipping settings classes"
+        mod = self.module(path_to_module(path))
+        if mod is None:
+            raise FileNotFoundError(path)
+        found = {}
+        for stmt in mod.body:
+            if isinstance(stmt, ast.ClassDef):
+                found[stmt.name] = (mod.name, stmt.name)
+            elif isinstance(stmt, ast.ImportFrom):
+                for alias in stmt.names:
+                    found[alias.asname or alias.name] = self.find(*mod.imported_names[alias.asname or alias.name])
+        return [
+            (sym, sym[0], sym[1])
+            for sym in found.values()
+            # pydantic's own BaseModel isn't a user model
+            if self.kind(sym) == 'model' and self.module(sym[0]) is not None
+        ]
+
+    def to_dart(self, sym: Symbol) -> DartClass:
+        "DartClass for a model symbol"
+        return DartClass(name=sym[1], fields=list(self.fields(sym).values()))
+
+    def fields(self, sym: Symbol) -> Dict[str, DartField]:
+        "fields by name in pydantic's order: inherited fields first (last base first), then new ones"
+        if sym not in self.field_cache:
+            mod = self.module(sym[0])
+            ret = {}
+            for base in reversed(self.bases(sym)):
+                if self.kind(base) == 'model' and self.module(base[0]) is not None:
+                    ret.update(self.fields(base))
+            for stmt in mod.classes[sym[1]].body:
+                if not isinstance(stmt, ast.AnnAssign) or not isinstance(stmt.target, ast.Name):
+                    continue
+                name = stmt.target.id
+                # pydantic v1 ignores underscore names and ClassVars
+                if name.startswith('_') or self.is_classvar(stmt.annotation, mod):
+                    continue
+                ret[name] = DartField(self.field_type(stmt.annotation, stmt.value, mod), name)
+            self.field_cache[sym] = ret
+        return self.field_cache[sym]
+
+    def is_classvar(self, node: ast.expr, mod: StaticModule) -> bool:
+        target = node.value if isinstance(node, ast.Subscript) else node
+        return self.resolve(target, mod) == ('typing', 'ClassVar')
+
+    def field_type(self, node: ast.expr, default: Optional[ast.expr], mod: StaticModule) -> DartType:
+        "top-level annotation. nullability follows pydantic's allow_none: Optional / Union with None, or a None default"
+        node, mod = self.unwrap(node, mod)
+        nullable = self.is_none_default(default, mod)
+        members = self.union_members(node, mod)
+        if members is not None:
+            non_none = [(member, member_mod) for member, member_mod in members if not is_none(member)]
+            nullable = nullable or len(non_none) < len(members)
+            if len(non_none) != 1:
+                # todo: provide a way to parse the union
+                return DartType.simple('dynamic', nullable)
+            node, mod = non_none[0]
+        return self.dart_type(node, mod, nullable)
+
+    def unwrap(self, node: ast.expr, mod: StaticModule) -> Tuple[ast.expr, StaticModule]:
+        "strip string annotations, Annotated[] and module-level aliases"
+        while True:
+            if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                node = ast.parse(node.value, mode='eval').body
+            elif isinstance(node, ast.Subscript) and self.resolve(node.value, mod) == ('typing', 'Annotated'):
+                node = subscript_args(node)[0]
+            elif isinstance(node, (ast.Name, ast.Attribute)) and (sym := self.resolve(node, mod)) is not None \
+                    and (alias_mod := self.module(sym[0])) is not None and sym[1] in alias_mod.aliases:
+                node, mod = alias_mod.aliases[sym[1]], alias_mod
+            else:
+                return node, mod
+
+    def union_members(self, node: ast.expr, mod: StaticModule) -> Optional[List[Tuple[ast.expr, StaticModule]]]:
+        "flattened (member, module) list for Union / Optional / X | Y, None if node isn't a union"
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitOr):
+            parts = [node.left, node.right]
+        elif isinstance(node, ast.Subscript) and (origin := self.resolve(node.value, mod)) in UNION_TYPES:
+            parts = subscript_args(node)
+            if origin == ('typing', 'Optional'):
+                parts = parts + [ast.Constant(None)]
+        else:
+            return None
+        ret = []
+        for part in parts:
+            part, part_mod = self.unwrap(part, mod)
+            nested = self.union_members(part, part_mod)
+            ret.extend(nested if nested is not None else [(part, part_mod)])
+        return ret
+
+    def is_none_default(self, default: Optional[ast.expr], mod: StaticModule) -> bool:
+        "default is None or Field(None) / Field(default=None)"
+        if default is None:
+            return False
+        if isinstance(default, ast.Call) and self.resolve(default.func, mod) == ('pydantic', 'Field'):
+            if default.args:
+                return is_none(default.args[0])
+            return any(kw.arg == 'default' and is_none(kw.value) for kw in default.keywords)
+        return is_none(default)
+
+    def dart_type(self, node: ast.expr, mod: StaticModule, nullable: bool = False) -> DartType:
+        "mirror of pydantic_source.dart_type for annotation nodes"
+        node, mod = self.unwrap(node, mod)
+        if self.union_members(node, mod) is not None:
+            # nested Optional / Union, like List[Optional[int]]. pydantic_source also makes these dynamic
+            return DartType.simple('dynamic', nullable)
+        if isinstance(node, ast.Subscript):
+            origin = self.resolve(node.value, mod)
+            args = subscript_args(node)
+            if origin in LIST_TYPES:
+                assert len(args) == 1
+                return DartType.list_of(self.dart_type(args[0], mod), nullable)
+            elif origin in DICT_TYPES:
+                assert len(args) == 2
+                key, val = (self.dart_type(arg, mod) for arg in args)
+                assert key.full_type == 'String'
+                return DartType.map_of(key, val, nullable)
+            elif origin == ('typing', 'Literal'):
+                # todo: maybe enum here
+                return DartType.simple('String', nullable)
+            raise TypeError('unk collection type', ast.unparse(node), origin)
+        if isinstance(node, ast.Call):
+            sym = self.resolve(node.func, mod)
+            if sym in SIMPLE_TYPES:
+                return DartType.simple(SIMPLE_TYPES[sym], nullable)
+            raise NotImplementedError('unk whatever', ast.unparse(node))
+        sym = self.resolve(node, mod)
+        if sym in SIMPLE_TYPES:
+            return DartType.simple(SIMPLE_TYPES[sym], nullable)
+        elif sym in LIST_TYPES:
+            # todo: include source class in warning
+            warnings.warn('bare list, using List but this is probably bad')
+            return DartType.simple('List', nullable)
+        elif sym in DICT_TYPES:
+            # todo: include source class in warning
+            warnings.warn('bare dict, ideally type this')
+            return DartType.simple('Map<String, dynamic>', nullable)
+        kind = sym and self.kind(sym)
+        if kind == 'model':
+            return DartType.simple(sym[1], nullable, is_ext=True)
+        elif kind == 'enum':
+            # todo: register this globally so we know to generate an enum for it, then ref the type
+            return DartType.simple('String', nullable)
+        elif kind in ('int', 'String'):
+            return DartType.simple(kind, nullable)
+        raise NotImplementedError('unk whatever', ast.unparse(node))
+
+def static_importers(changed: Set[str], watched: Iterable[str], root: str = '.') -> Set[str]:
+    "ast version of watch.python_importers: watched modules that import from changed modules, transitively"
+    source = StaticSource(root)
+    imports = {}
+    for name in watched:
+        mod = source.module(name)
+        if mod is not None:
+            imports[name] = {module for module, _ in mod.imported_names.values()} | set(mod.imported_modules.values())
+    ret = set()
+    todo = list(changed)
+    while todo:
+        target = todo.pop()
+        for name, deps in imports.items():
+            if name not in ret and name not in changed and target in deps:
+                ret.add(name)
+                todo.append(name)
+    return ret
+
+def subscript_args(node: ast.Subscript) -> List[ast.expr]:
+    return list(node.slice.elts) if isinstance(node.slice, ast.Tuple) else [node.slice]
+
+def is_none(node: ast.expr) -> bool:
+    return isinstance(node, ast.Constant) and node.value is None
+
+def path_to_module(path: str) -> str:
+    "convert path to dotted module; same rule as pydantic_source.path_to_module"
+    assert not os.path.isabs(path)
+    return path.removesuffix('.py').replace('/', '.')
@@ -0,0 +1,111 @@
+"on-disk cache of rendered classes, so unchanged models skip codegen + unchanged files skip the write"
+
+import filecmp, hashlib, json, os
+from typing import Callable, Dict, Iterable, Optional, Union
+from .parser import DartClass
+
+# bump this if the cache file layout changes
+CACHE_FORMAT = 1
+# sources whose contents change the generated dart
+GENERATOR_SOURCES = ('codegen.py', 'dartgen.py', 'parser.py', 'cache.py', 'render.py')
+
+def generator_fingerprint() -> str:
+    "hash of the generator source, so cached text is dropped when the generator changes (this covers version bumps)"
+    digest = hashlib.sha256()
+    root = os.path.dirname(__file__)
+    for name in GENERATOR_SOURCES:
+        with open(os.path.join(root, name), 'rb') as src:
+            digest.update(src.read())
+    return digest.hexdigest()
+
+def class_fingerprint(cls: DartClass, flags: dict) -> str:
+    "fingerprint of everything that goes into rendering a class: name, fields, resolved types, genclass flags"
+    key = json.dumps([
+        cls.name,
+        [(field.name, repr(field.dart_type)) for field in cls.fields],
+        sorted(flags.items()),
+    ])
+    return hashlib.sha256(key.encode()).hexdigest()
+
+class RenderCache:
+    "maps class name -> (fingerprint, rendered text). only entries used in this run get saved"
+
+    def __init__(self, path: Optional[str], version: str, entries: Optional[Dict[str, dict]] = None):
+        self.path = path
+        self.version = version
+        self.entries = entries or {}
+        self.used = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, path: Optional[str]) -> 'RenderCache':
+        "load from path. missing, corrupt or stale caches come back empty. path None is an in-memory cache"
+        version = generator_fingerprint()
+        if path is None:
+            return cls(path, version)
+        try:
+            with open(path) as stream:
+                raw = json.load(stream)
+        except (OSError, ValueError):
+            return cls(path, version)
+        if raw.get('format') != CACHE_FORMAT or raw.get('version') != version:
+            return cls(path, version)
+        return cls(path, version, raw.get('classes'))
+
+    def lookup(self, cls: DartClass, flags: dict) -> Optional[str]:
+        "cached text for cls, or None on a miss"
+        entry = self.entries.get(cls.name)
+        if entry is not None and entry['key'] == class_fingerprint(cls, flags):
+            self.hits += 1
+            self.used[cls.name] = entry
+            return entry['text']
+        self.misses += 1
+        return None
+
+    def store(self, cls: DartClass, flags: dict, text: str):
+        "remember rendered text for cls"
+        self.used[cls.name] = {'key': class_fingerprint(cls, flags), 'text': text}
+
+    def get(self, cls: DartClass, flags: dict, render: Callable[[], str]) -> str:
+        "return cached text for cls, calling render() on a miss"
+        text = self.lookup(cls, flags)
+        if text is None:
+            text = render()
+            self.store(cls, flags, text)
+        return text
+
+    def retain(self, names: Iterable[str]):
+        "keep entries for classes that this run skipped on purpose (i.e. the watcher's untouched modules)"
+        for name in names:
+            if name in self.entries:
+                self.used[name] = self.entries[name]
+
+    def save(self):
+        "write the entries used in this run (if there's a path), and start a new run with them"
+        if self.path is not None:
+            write_if_changed(self.path, json.dumps({
+                'format': CACHE_FORMAT,
+                'version': self.version,
+                'classes': self.used,
+            }, sort_keys=True))
+        self.entries = self.used
+        self.used = {}
+
+def write_if_changed(path: str, chunks: Union[str, Iterable[str]]) -> bool:
+    "stream chunks to path unless the file already has exactly these bytes, so mtimes of unchanged outputs stay put. returns True if written"
+    if isinstance(chunks, str):
+        chunks = (chunks,)
+    # temp file in the same dir so the replace is atomic
+    tmp = f'{path}.djc-tmp'
+    try:
+        with open(tmp, 'w') as outfile:
+            for chunk in chunks:
+                outfile.write(chunk)
+        if os.path.exists(path) and filecmp.cmp(tmp, path, shallow=False):
+            return False
+        os.replace(tmp, path)
+        return True
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
@@ -1,63 +1,174 @@
 "misc reusable codegen stuff"
 import contextlib, itertools, functools
 from dataclasses import dataclass
-from typing import List, Literal
+from types import GeneratorType
+from typing import Callable, Hashable, Iterable, Iterator, List, Literal, Tuple
 from .parser import DartClass, DartType
 
 class CodegenError(Exception): pass
 
+# placeholder for template args that have no default
+MISSING = object()
+
+@dataclass(frozen=True)
+class Template:
+    "a TEMPLATES entry compiled once: arg order + defaults, so exprs store args as a tuple instead of a kwargs dict"
+    fn: Callable
+    names: Tuple[str, ...]
+    # one entry per name, MISSING for required args
+    defaults: tuple
+    nrequired: int
+
+    @classmethod
+    def compile(cls, fn: Callable) -> 'Template':
+        code = fn.__code__
+        names = code.co_varnames[:code.co_argcount]
+        fn_defaults = fn.__defaults__ or ()
+        nrequired = len(names) - len(fn_defaults)
+        return cls(fn, names, (MISSING,) * nrequired + fn_defaults, nrequired)
+
+    def bind(self, type_: str, args: tuple, kwargs: dict) -> tuple:
+        "positional args tuple for fn from call-style args + kwargs"
+        if not kwargs and self.nrequired <= len(args) <= len(self.names):
+            return args + self.defaults[len(args):]
+        if len(args) > len(self.names):
+            raise CodegenError(f"{type_} takes {len(self.names)} args, got {len(args)}")
+        values = list(args) + list(self.defaults[len(args):])
+        for key, val in kwargs.items():
+            try:
+                index = self.names.index(key)
+            except ValueError:
+                raise CodegenError(f"{type_} has no arg {key}, expected one of {self.names}") from None
+            values[index] = val
+        if MISSING in values:
+            raise CodegenError(f"{type_} missing required arg {self.names[values.index(MISSING)]}")
+        return tuple(values)
+
 def expr_fac(cls, name, fn):
     "function factory for expr"
     fn.__name__ = f'x_{name}'
+    template = cls.COMPILED[name]
     @functools.wraps(fn)
     def expr_fn(*args, **kwargs):
-        full_kwargs = {**dict(zip(fn.__code__.co_varnames, args)), **kwargs}
-        return cls(type=name, kwargs=full_kwargs)
+        return cls(name, template.bind(name, args, kwargs))
     return expr_fn
 
-@dataclass
 class Expr:
-    "AST lite"
-    type: str
-    kwargs: dict
+    "AST lite. slotted, with args stored positionally in template order"
+    __slots__ = ('type', 'args')
 
     TEMPLATES = {}
+    # TEMPLATES compiled by __init_subclass__
+    COMPILED = {}
+
+    def __init__(self, type: str, args: tuple):
+        self.type = type
+        self.args = args
 
     def __init_subclass__(cls, **kwargs):
         "creates classmethods from TEMPLATES for shortcuts, and in the hope that some code inference tools will find them"
-        super.__init_subclass__(**kwargs)
+        super().__init_subclass__(**kwargs)
         # todo: it seems like jedi is trying to get runtime type mutations? debug this. whole point of these helpers is code completion, use decorators instead of TEMPLATES if not possible
         # https://github.com/davidhalter/jedi/issues/1347 dynamic class methods
         # https://github.com/davidhalter/jedi/issues/1458 use annotations
         # https://github.com/davidhalter/jedi/pull/1461 PR to use annotations
         # todo: clear error here for all expr names which are not valid identifiers
+        cls.COMPILED = {name: Template.compile(fn) for name, fn in cls.TEMPLATES.items()}
         for name, fn in cls.TEMPLATES.items():
             setattr(cls, f'x_{name}', staticmethod(expr_fac(cls, name, fn)))
 
+    def __repr__(self):
+        return f'{type(self).__name__}({self.type!r}, {self.kwargs!r})'
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.type == other.type and self.args == other.args
+
+    @property
+    def kwargs(self) -> dict:
+        "template args by name"
+        return dict(zip(self.template().names, self.args))
+
     @staticmethod
     def maybe_render(item):
+        "Exprs and lists pass through for iflatten to render when it reaches them, everything else becomes a string"
         # note: intentional isinstance Expr, not classmethod, so different expr subclasses are compatible
-        # todo: I think this needs to walk sublists / exprs in list case
-        return item.render() if isinstance(item, Expr) else str(item)
+        return item if isinstance(item, (Expr, list, tuple)) else str(item)
+
+    @classmethod
+    def compiled(cls, type_: str) -> Template:
+        try:
+            return cls.COMPILED[type_]
+        except KeyError:
+            raise CodegenError(f"template not defined for type {type_} in {cls.__name__}") from None
 
     @classmethod
     def fac(cls, type_, **kwargs):
         "convenience factory"
-        return cls(type=type_, kwargs=kwargs)
+        return cls(type_, cls.compiled(type_).bind(type_, (), kwargs))
 
     @classmethod
     def fac2(cls, type_, *args):
-        "like fac() but infers kwargs from TEMPLATES"
-        template = cls.TEMPLATES[type_]
-        kwargs = dict(zip(template.__code__.co_varnames, args))
-        return cls.fac(type_, **kwargs)
+        "like fac() but takes args positionally, in template order"
+        return cls(type_, cls.compiled(type_).bind(type_, args, {}))
+
+    def template(self) -> Template:
+        return self.compiled(self.type)
+
+    def emit(self):
+        "run the template. returns nested lists of tokens + child exprs, which iflatten walks"
+        return self.template().fn(*self.args)
 
     def render(self) -> list:
         "returns list of tokens"
-        if self.type not in self.TEMPLATES:
-            raise CodegenError(f"template not defined for type {self.type} in {type(self).__name__}")
-        template = self.TEMPLATES[self.type]
-        return flatten(template(**self.kwargs))
+        return list(self.iter_render())
+
+    def iter_render(self) -> Iterator:
+        "yields tokens lazily; child exprs render as they are reached"
+        return iflatten((self,))
+
+class Tokens(tuple):
+    "pre-rendered tokens. composes with Expr trees because iflatten walks tuples, and renders like an Expr"
+
+    def render(self) -> list:
+        return list(self)
+
+    def iter_render(self) -> Iterator:
+        return iter(self)
+
+class SubtreeCache:
+    "memo for functions that build Expr subtrees. results are stored rendered, so a repeat costs a lookup instead of a rebuild"
+
+    def __init__(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def memo(self, key: Callable[..., Hashable]):
+        "decorator. key(*args) must capture everything the wrapped function's output depends on"
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args):
+                full_key = (fn.__name__, key(*args))
+                tokens = self.entries.get(full_key)
+                if tokens is None:
+                    self.misses += 1
+                    tokens = self.entries[full_key] = Tokens(iflatten((fn(*args),)))
+                else:
+                    self.hits += 1
+                return tokens
+            return wrapper
+        return decorator
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries)}
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = 0
+
+def value_key(value) -> Hashable:
+    "hashable form of a str-or-Expr value for SubtreeCache keys"
+    return value if isinstance(value, str) else Tokens(value.iter_render())
 
 class Token: pass
 class Nosp(Token): pass
@@ -66,14 +177,25 @@ class Endl(Token): pass
 class Indent(Endl): pass
 class Dedent(Endl): pass
 
-def flatten(seq):
-    ret = []
-    for x in seq:
-        if isinstance(x, (list, tuple)):
-            ret.extend(flatten(x))
+def flatten(seq) -> list:
+    return list(iflatten(seq))
+
+def iflatten(seq) -> Iterator:
+    "lazy flatten. walks lists, tuples and generators, renders any Exprs it finds"
+    # explicit stack instead of recursive yield from, so a token doesn't pass through one generator per level of nesting
+    stack = [iter(seq)]
+    while stack:
+        for x in stack[-1]:
+            if isinstance(x, (list, tuple, GeneratorType)):
+                stack.append(iter(x))
+                break
+            elif isinstance(x, Expr):
+                stack.append(iter(x.emit()))
+                break
+            else:
+                yield x
         else:
-            ret.append(x)
-    return ret
+            stack.pop()
 
 def extapend(arr: list, delim) -> list:
     "extend or append arr with delim. if delim is list or tuple, arr gets extended. helper for ajoin."
@@ -107,43 +229,72 @@ def flag(name, active, default=None):
     # wtf is this for, past me
     return name if active else default
 
-def format_exprs(tokens: list, indent='  ') -> List[str]:
+def format_exprs(tokens: Iterable, indent='  ') -> List[str]:
     "format list of tokens to a list of lines"
-    endl_dedents = [i for i, pair in enumerate(itertools.pairwise(tokens)) if pair == (Endl, Dedent)]
-    if endl_dedents:
-        # coalesce dedents
-        for i, index in enumerate(endl_dedents):
-            index -= i # because we are removing things
-            tokens[index:index + 2] = (Dedent,)
-    byline = [[]]
-    for tok in tokens:
-        if tok in (Indent, Dedent, Endl):
-            byline.append([tok])
-        else:
-            byline[-1].append(tok)
-    lines = []
+    return list(iter_lines(tokens, indent))
+
+def iter_lines(tokens: Iterable, indent='  ') -> Iterator[str]:
+    "format tokens to lines lazily, in one pass. only the current line is held in memory"
+    # Endl, Indent and Dedent start a new line. a word waits in `pending` until we see the next token on its line,
+    # because that decides whether it gets a trailing space
+    line = []
     nindent = 0
-    for linetok in byline:
-        line = []
-        # filter None here bc (tok, None, Nosp) breaks Nosp detection
-        linetok = list(filter(lambda x: x is not None, linetok))
-        for i, tok in enumerate(linetok):
-            # todo: get rid of '', but set up tests first
-            if tok in (Nosp, ''):
+    pending = None
+    for tok in _coalesce_dedents(tokens):
+        if tok is None:
+            # filter None here bc (tok, None, Nosp) breaks Nosp detection
+            continue
+        elif tok is Endl or tok is Indent or tok is Dedent:
+            if pending is not None:
+                line.append(pending)
+                pending = None
+            yield _join_line(line)
+            if tok is Indent:
+                nindent += 1
+            elif tok is Dedent:
+                nindent -= 1
+            line = [nindent * indent]
+        # todo: get rid of '', but set up tests first
+        elif tok is Nosp or tok == '':
+            if pending is not None:
+                line.append(pending)
+                if tok is not Nosp:
+                    line.append(' ')
+                pending = None
+        else:
+            if pending is not None:
+                line.extend((pending, ' '))
+            pending = tok
+    if pending is not None:
+        line.append(pending)
+    yield _join_line(line)
+
+def _coalesce_dedents(tokens: Iterable) -> Iterator:
+    "helper for iter_lines: replace each (Endl, Dedent) pair with Dedent"
+    held_endl = False
+    for tok in tokens:
+        if held_endl:
+            held_endl = False
+            if tok is Dedent:
+                yield Dedent
                 continue
-            elif tok in (Endl, Indent, Dedent):
-                if tok is Indent:
-                    nindent += 1
-                if tok is Dedent:
-                    nindent -= 1
-                line.append(nindent * indent)
-            elif i == len(linetok) - 1 or linetok[i + 1] is Nosp:
-                line.append(tok)
-            else:
-                line.extend((tok, ' '))
-        # todo: make these 'adjacent pair' rules linear + faster
-        while Nosemi in line:
-            index = line.index(Nosemi)
-            line[index:index + 2] = []
-        lines.append(''.join(line))
-    return lines
+            yield Endl
+        if tok is Endl:
+            held_endl = True
+        else:
+            yield tok
+    if held_endl:
+        yield Endl
+
+def _join_line(line: list) -> str:
+    "helper for iter_lines: join a line's pieces, dropping each Nosemi along with the piece after it"
+    if Nosemi not in line:
+        return ''.join(line)
+    kept = []
+    pieces = iter(line)
+    for piece in pieces:
+        if piece is Nosemi:
+            next(pieces, None)
+        else:
+            kept.append(piece)
+    return ''.join(kept)
@@ -0,0 +1,139 @@
+"""
+compact positional wire format (--compact): a model is a json array of its field values in declared order, nested
+models recursively the same. top-level documents are [schema fingerprint, body] so mismatched versions fail fast.
+this module has the fingerprint (used by codegen) and a python encoder / decoder for pydantic models.
+a fingerprint covers the class and every class its fields reach; the CLI loads those even when --include / --exclude
+leave them out of the output, so both sides hash the same set.
+"""
+import functools, hashlib, json, typing
+from typing import Dict, Iterable, List
+from .parser import DartClass, DartType
+
+def ext_names(dart_type: DartType) -> List[str]:
+    "names of the generated classes a type refers to"
+    if dart_type.children:
+        return [name for child in dart_type.children for name in ext_names(child)]
+    return [dart_type.base()] if dart_type.is_ext else []
+
+def schema_text(name: str, classes: Dict[str, DartClass]) -> str:
+    "canonical text of a class's positional layout: field types in order, with the classes they refer to expanded"
+    seen = set()
+    parts = []
+    pending = [name]
+    while pending:
+        name = pending.pop(0)
+        if name in seen:
+            continue
+        seen.add(name)
+        cls = classes.get(name)
+        if cls is None:
+            # not one of ours, all we know is the name
+            parts.append(name)
+            continue
+        # field names don't go over the wire, but a rename is still a schema change
+        parts.append(f"{name}({','.join(field.dump() for field in cls.fields)})")
+        pending.extend(ref for field in cls.fields for ref in ext_names(field.dart_type))
+    return ';'.join(parts)
+
+def fingerprint(name: str, classes: Dict[str, DartClass]) -> str:
+    "short hash of schema_text"
+    return hashlib.sha1(schema_text(name, classes).encode()).hexdigest()[:12]
+
+def fingerprints(classes: Iterable[DartClass]) -> Dict[str, str]:
+    "fingerprint per class name"
+    by_name = {cls.name: cls for cls in classes}
+    return {name: fingerprint(name, by_name) for name in by_name}
+
+# pydantic side
+
+def model_types(model_cls) -> list:
+    "model_cls and every model it refers to"
+    import pydantic
+    ret = [model_cls]
+    for cls in ret:
+        for field in cls.__fields__.values():
+            args = [field.outer_type_]
+            while args:
+                arg = args.pop()
+                if isinstance(arg, type) and issubclass(arg, pydantic.BaseModel) and arg not in ret:
+                    ret.append(arg)
+                args.extend(typing.get_args(arg))
+    return ret
+
+@functools.lru_cache(maxsize=None)
+def model_classes(model_cls) -> Dict[str, DartClass]:
+    "DartClasses for model_types(model_cls), by name. cached, don't modify"
+    from .pydantic_source import pydantic_to_dart
+    return {cls.__name__: pydantic_to_dart(cls) for cls in model_types(model_cls)}
+
+@functools.lru_cache(maxsize=None)
+def fingerprint_for(model_cls) -> str:
+    "the fingerprint the generated dart class for model_cls has as djc__schema"
+    return fingerprint(model_cls.__name__, model_classes(model_cls))
+
+def jsonable(value):
+    "value as plain json types, the way pydantic's .json() writes it"
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    from pydantic.json import pydantic_encoder
+    return json.loads(json.dumps(value, default=pydantic_encoder))
+
+def to_compact(dart_type: DartType, value, classes: Dict[str, DartClass]):
+    """
+    positional form of value, guided by the dart type like the generated toList. only fields typed as a generated class
+    become arrays; anything else (unions are dynamic in dart) stays the keyed json pydantic writes
+    """
+    if value is None:
+        return None
+    if dart_type.template_class == 'List':
+        return [to_compact(dart_type.children[0], elt, classes) for elt in value]
+    if dart_type.template_class == 'Map':
+        return {str(key): to_compact(dart_type.children[1], val, classes) for key, val in value.items()}
+    if dart_type.is_ext:
+        return [to_compact(field.dart_type, getattr(value, field.name), classes) for field in classes[dart_type.base()].fields]
+    return jsonable(value)
+
+def model_compact(model_cls, model):
+    "to_compact for an instance of model_cls"
+    return to_compact(DartType.simple(model_cls.__name__, is_ext=True), model, model_classes(model_cls))
+
+def dumps_compact(model) -> str:
+    "model as a compact json document, what the dart side's fromJsonCompact reads"
+    return json.dumps([fingerprint_for(type(model)), model_compact(type(model), model)], separators=(',', ':'))
+
+def dumps_compact_list(model_cls, models: Iterable) -> str:
+    "list of models as one compact document, what fromJsonCompactList reads"
+    return json.dumps([fingerprint_for(model_cls), [model_compact(model_cls, model) for model in models]], separators=(',', ':'))
+
+def from_compact(dart_type: DartType, value, classes: Dict[str, DartClass]):
+    "inverse of to_compact, guided by the dart type. returns dicts / lists that pydantic parses"
+    if value is None:
+        return None
+    if dart_type.template_class == 'List':
+        return [from_compact(dart_type.children[0], elt, classes) for elt in value]
+    if dart_type.template_class == 'Map':
+        return {key: from_compact(dart_type.children[1], val, classes) for key, val in value.items()}
+    if dart_type.is_ext:
+        cls = classes[dart_type.base()]
+        if len(value) != len(cls.fields):
+            raise ValueError(f'{cls.name} has {len(cls.fields)} fields, got {len(value)} values')
+        return {field.name: from_compact(field.dart_type, val, classes) for field, val in zip(cls.fields, value)}
+    return value
+
+def check_schema(model_cls, schema: str):
+    if schema != fingerprint_for(model_cls):
+        raise ValueError(f'compact schema mismatch for {model_cls.__name__}: got {schema}, expected {fingerprint_for(model_cls)}')
+
+def loads_compact(model_cls, raw: str):
+    "parse a dumps_compact document into model_cls. ValueError when the fingerprint doesn't match"
+    schema, body = json.loads(raw)
+    check_schema(model_cls, schema)
+    return model_cls.parse_obj(from_compact(DartType.simple(model_cls.__name__, is_ext=True), body, model_classes(model_cls)))
+
+def loads_compact_list(model_cls, raw: str) -> list:
+    "inverse of dumps_compact_list"
+    schema, body = json.loads(raw)
+    check_schema(model_cls, schema)
+    dart_type = DartType.simple(model_cls.__name__, is_ext=True)
+    classes = model_classes(model_cls)
+    return [model_cls.parse_obj(from_compact(dart_type, value, classes)) for value in body]
@@ -1,10 +1,12 @@
 "dart-specific codegen"
-import contextlib
-from typing import Callable, List
+import contextlib, dataclasses, functools
+from typing import Callable, Dict, List, Optional, Tuple
 from .parser import DartClass, DartType, DartField
-from .codegen import Expr, Nosp, Nosemi, flag, ajoin, Indent, Dedent, CodegenError, Endl
+from .codegen import Expr, Nosp, Nosemi, flag, ajoin, Indent, Dedent, CodegenError, Endl, SubtreeCache, value_key
 
 class DartExpr(Expr):
+    __slots__ = ()
+
     # todo: indentation awareness for lines; some kind of 'line preference' wrapper response
     # todo: make these decorated methods as well so they can be more complicated
     TEMPLATES = {
@@ -49,6 +51,10 @@ class DartExpr(Expr):
         'bin': lambda left, op, right: [Expr.maybe_render(left), op, Expr.maybe_render(right)],
         'decorate': lambda decorator, expr: ['@', Nosp, Expr.maybe_render(decorator), Endl, Expr.maybe_render(expr)],
         'ternary': lambda cond, ifyes, ifno='null': ['(', Nosp, Expr.maybe_render(cond), Nosp, ')', '?', Expr.maybe_render(ifyes), ':', Expr.maybe_render(ifno)],
+        # map literal entry
+        'entry': lambda key, val: [Expr.maybe_render(key), Nosp, ':', Expr.maybe_render(val)],
+        # collection-for element, i.e. the inside of [for (final e in x) f(e)]
+        'cfor': lambda var, iterable, body: ['for', '(', Nosp, 'final', var, 'in', Expr.maybe_render(iterable), Nosp, ')', Expr.maybe_render(body)],
     }
 
     # todo: replace both of these with fac-like wrap() on base class? hmm, 'child' is not standard though
@@ -71,8 +77,14 @@ def assert_known_type(name, cls, names):
 
 DART_LITERALS = ['String', 'int']
 
-def ffm_collectionify(dart_type: DartType, value: DartExpr):
-    "helper for field_from_map, handles nesting"
+# memo for the per-field subtree builders below. look at SUBTREE_CACHE.stats() to see how it does on a schema
+SUBTREE_CACHE = SubtreeCache()
+# cache key for functions that take a DartField
+field_key = lambda field: (field.name, field.dart_type.key())
+
+@SUBTREE_CACHE.memo(lambda dart_type, value, method='fromMap': (dart_type.key(), value_key(value), method))
+def ffm_collectionify(dart_type: DartType, value: DartExpr, method: str = 'fromMap'):
+    "helper for field_from_map, handles nesting. method is the constructor used for generated classes (fromList for --compact)"
     if dart_type.full_type == 'dynamic':
         # warning: I think 'dynamic?' can happen sometimes, won't be caught here
         return value
@@ -80,7 +92,7 @@ def ffm_collectionify(dart_type: DartType, value: DartExpr):
         base = dart_type.full_type.removesuffix('?')
         assert base not in DART_LITERALS
         return DartExpr.fac2('call',
-            f'{base}.fromMap',
+            f'{base}.{method}',
             DartExpr.fac2('list', [value]),
         )
     if dart_type.template_class == 'List':
@@ -94,7 +106,7 @@ def ffm_collectionify(dart_type: DartType, value: DartExpr):
                     args=DartExpr.fac('list', children=[
                         DartExpr.fac('arrow',
                             sig=DartExpr.fac('sig', args=DartExpr.fac('list', children=['elt'])),
-                            body=ffm_collectionify(dart_type.children[0], 'elt'),
+                            body=ffm_collectionify(dart_type.children[0], 'elt', method),
                         )
                     ])
                 ),
@@ -111,13 +123,63 @@ def ffm_collectionify(dart_type: DartType, value: DartExpr):
                 args=DartExpr.fac('list', children=[
                     DartExpr.fac('arrow',
                         sig=DartExpr.fac('sig', args=DartExpr.fac('list', children=['key', 'val'])),
-                        body=DartExpr.fac('call', name='MapEntry', args=DartExpr.fac('list', children=['key as String', ffm_collectionify(dart_type.children[1], 'val')])),
+                        body=DartExpr.fac('call', name='MapEntry', args=DartExpr.fac('list', children=['key as String', ffm_collectionify(dart_type.children[1], 'val', method)])),
                     )
                 ])
             )
     else:
         raise CodegenError(f'unk collection class {dart_type.template_class}')
 
+@SUBTREE_CACHE.memo(lambda dart_type, value, depth=0, growable=False: (dart_type.key(), value_key(value), depth, growable))
+def ffm_lean(dart_type: DartType, value: str, depth: int = 0, growable: bool = False) -> DartExpr:
+    """
+    fromMap expr for --lean-frommap. value has to be cheap to evaluate more than once (a local or an index into one).
+    lists come out fixed-length, sized from the source, unless growable (this level only). primitive collections are
+    adopted as cast views when the generated `owned` param is set, otherwise copied once. nested models decode in
+    List.generate / collection-for.
+    """
+    fixed = [] if growable else ['growable: false']
+    if dart_type.base() == 'dynamic':
+        return value
+    if dart_type.template_class == 'List':
+        child = dart_type.children[0]
+        if not child.children and is_plain(child):
+            expr = DartExpr.fac2('ternary', 'owned',
+                f'({value} as List).cast<{child.full_type}>()',
+                DartExpr.x_call(f'List<{child.full_type}>.from', DartExpr.list([value, *fixed])),
+            )
+        else:
+            var = f'i{depth}'
+            expr = DartExpr.x_call(f'List<{child.full_type}>.generate', DartExpr.list([
+                f'{value}.length',
+                DartExpr.fac2('arrow', f'({var})', ffm_lean(child, f'{value}[{var}]', depth + 1)),
+                *fixed,
+            ]))
+    elif dart_type.template_class == 'Map':
+        if dart_type.children[0].full_type != 'String':
+            raise CodegenError(f'maps have to have string keys, got {dart_type.children[0].full_type}')
+        child = dart_type.children[1]
+        if not child.children and is_plain(child):
+            expr = DartExpr.fac2('ternary', 'owned',
+                f'({value} as Map).cast<String, {child.full_type}>()',
+                DartExpr.x_call(f'Map<String, {child.full_type}>.from', DartExpr.list([value])),
+            )
+        else:
+            var = f'kv{depth}'
+            expr = DartExpr.fac2('listl', [DartExpr.fac2('cfor', var, DartExpr.x_dot(value, 'entries'), DartExpr.fac2('entry',
+                f'{var}.key',
+                ffm_lean(child, f'{var}.value', depth + 1),
+            ))], (f'<String, {child.full_type}>{{', '}'))
+    elif dart_type.template_class:
+        raise CodegenError(f'unk collection class {dart_type.template_class}')
+    elif dart_type.is_ext:
+        expr = DartExpr.x_call(f'{dart_type.base()}.fromMap', DartExpr.list([value, 'owned: owned']))
+    elif dart_type.base() == 'DateTime':
+        expr = DartExpr.x_call('DateTime.parse', value)
+    else:
+        return value
+    return arg_null_wrap(dart_type, expr, value)
+
 def arg_null_wrap(dart_type: DartType, expr: DartExpr, value: DartExpr):
     "turns f(x) with nullable x into: x != null ? f(x) : null"
     if dart_type.nullable:
@@ -125,10 +187,10 @@ def arg_null_wrap(dart_type: DartType, expr: DartExpr, value: DartExpr):
     else:
         return expr
 
-def field_from_map(field: DartField, cls: DartClass) -> DartExpr:
-    "generate fromMap expr for a field"
+def field_from_map(field: DartField, cls: DartClass, source: str = 'raw') -> DartExpr:
+    "generate fromMap expr for a field. source is the map expression to read it from"
     dart_type = field.dart_type
-    expr = DartExpr.fac('call', name='raw', args=DartExpr.fac('list', children=[f'"{field.name}"']), scope='[]')
+    expr = DartExpr.fac('call', name=source, args=DartExpr.fac('list', children=[f'"{field.name}"']), scope='[]')
     if dart_type.uses_extension_types() or dart_type.template_class in ('List', 'Map'):
         return arg_null_wrap(dart_type, ffm_collectionify(field.dart_type, expr), expr)
     elif dart_type.full_type in ('DateTime', 'DateTime?'):
@@ -137,6 +199,7 @@ def field_from_map(field: DartField, cls: DartClass) -> DartExpr:
     else:
         return expr if dart_type.nullable else expr.bang()
 
+@SUBTREE_CACHE.memo(field_key)
 def field_tomap(field: DartField) -> DartExpr:
     "toMap expr for a field"
     null_tail = '?' if field.dart_type.nullable else ''
@@ -172,55 +235,298 @@ def field_tomap(field: DartField) -> DartExpr:
     else:
         return field.name
 
-def field_equal(field: DartField) -> DartExpr:
-    "generate equality test for field"
-    # warning: nested collections, like List<Map>, List<List>, Map<String, List>, you get it, need to pass pred and will be always false for now
-    if (tmpclass := field.dart_type.template_class) in ('Map', 'List'):
-        return DartExpr.fac2('call', f'{tmpclass.lower()}Equal', DartExpr.list([field.name, f'x.{field.name}']))
+def is_plain(dart_type: DartType) -> bool:
+    "type tree that jsonEncode takes as-is: no generated classes or DateTimes anywhere in it"
+    if dart_type.children:
+        return all(map(is_plain, dart_type.children))
+    return not dart_type.is_ext and dart_type.base() != 'DateTime'
+
+@SUBTREE_CACHE.memo(lambda dart_type, value, depth=0, method='toMap': (dart_type.key(), value_key(value), depth, method))
+def tomap_lean(dart_type: DartType, value: str, depth: int = 0, method: str = 'toMap') -> DartExpr:
+    """
+    toMap expr for --lean-tomap. plain trees pass through uncopied, so the map shares them with the object.
+    collections of classes / DateTimes convert in collection-for literals instead of map() + closure + toList().
+    depth keeps loop variables of nested collections distinct. method is what generated classes are converted with
+    (toList for --compact).
+    """
+    if is_plain(dart_type):
+        return value
+    if dart_type.template_class == 'List':
+        var = f'e{depth}'
+        expr = DartExpr.fac2('listl', [DartExpr.fac2('cfor', var, value + dart_type.bang_tail(), tomap_lean(dart_type.children[0], var, depth + 1, method))])
+    elif dart_type.template_class == 'Map':
+        var = f'kv{depth}'
+        expr = DartExpr.fac2('listl', [DartExpr.fac2('cfor', var, DartExpr.x_dot(value + dart_type.bang_tail(), 'entries'), DartExpr.fac2('entry',
+            f'{var}.key',
+            tomap_lean(dart_type.children[1], f'{var}.value', depth + 1, method),
+        ))], '{}')
+    elif dart_type.template_class:
+        raise NotImplementedError('unhandled template class', dart_type.template_class)
+    elif dart_type.is_ext:
+        return DartExpr.x_call(DartExpr.x_dot(value, method, elvis=dart_type.nullable))
+    else:
+        # DateTime
+        return DartExpr.x_call(DartExpr.x_dot(value, 'toIso8601String', elvis=dart_type.nullable))
+    return arg_null_wrap(dart_type, expr, value)
+
+@functools.lru_cache(maxsize=None)
+def json_writer(dart_type: DartType) -> str:
+    "dart function value that writes one dart_type value to a sink, for writeJsonList / writeJsonMap in jsonbase.dart"
+    if dart_type.template_class in ('List', 'Map'):
+        # parameters typed: language 2.12 doesn't infer a closure's parameters from the other arguments
+        return f'(StringSink sink, {dart_type.full_type} e) => {collection_writejson(dart_type, "e")}'
+    elif dart_type.is_ext:
+        return 'writeJsonOpt'
+    elif dart_type.base() == 'DateTime':
+        return 'writeJsonDateTime'
+    elif dart_type.full_type == 'String':
+        return 'writeJsonString'
+    elif dart_type.full_type in ('int', 'double', 'num'):
+        return 'writeJsonNum'
+    return 'writeJsonValue'
+
+def collection_writejson(dart_type: DartType, value: str) -> str:
+    "writeJsonList / writeJsonMap call for a List / Map value, with the element type spelled out for nested writers"
+    if dart_type.template_class == 'List':
+        return f'writeJsonList<{dart_type.children[0].full_type}>(sink, {value}, {json_writer(dart_type.children[0])})'
+    return f'writeJsonMap<{dart_type.children[1].full_type}>(sink, {value}, {json_writer(dart_type.children[1])})'
+
+def field_writejson(field: DartField) -> str:
+    "writeJson statement for a field's value"
+    dart_type = field.dart_type
+    if dart_type.template_class in ('List', 'Map'):
+        return collection_writejson(dart_type, field.name)
+    elif dart_type.is_ext and not dart_type.nullable:
+        return f'{field.name}.writeJson(sink)'
+    elif dart_type.base() in ('int', 'bool'):
+        # always finite, and write() gives null for null
+        return f'sink.write({field.name})'
+    return f'{json_writer(dart_type)}(sink, {field.name})'
+
+def write_json(cls: DartClass, lazy: bool = False) -> DartExpr:
+    "writeJson method: fields written straight to the sink, no toMap() tree"
+    stmts = []
+    if lazy:
+        stmts.append(f'if ({LAZY_RAW} != null && !{LAZY_TOUCHED}) return writeJsonValue(sink, {LAZY_RAW})')
+    for i, field in enumerate(cls.fields):
+        # field names are identifiers, so keys never need escaping
+        stmts.append(f"""sink.write('{'{' if i == 0 else ','}"{field.name}":')""")
+        stmts.append(field_writejson(field))
+    stmts.append("sink.write('}')" if cls.fields else "sink.write('{}')")
+    return DartExpr.fac('block',
+        sig=DartExpr.fac2('decorate', 'override', DartExpr.fac('sig', name='writeJson', ret='void', args=DartExpr.list(['StringSink sink']))),
+        children=stmts,
+        nosemi=Nosemi,
+    )
+
+@SUBTREE_CACHE.memo(lambda field, helpers=None: (field_key(field), (helpers or {}).get(field.dart_type)))
+def field_equal(field: DartField, helpers: Dict[DartType, str] = None) -> DartExpr:
+    "generate equality test for field. helpers are the names of the class's equality_helpers()"
+    if field.dart_type.template_class in ('Map', 'List'):
+        return DartExpr.x_call(helpers[field.dart_type], DartExpr.list([field.name, f'x.{field.name}']))
     else:
         return DartExpr.fac2('bin', field.name, '==', f'x.{field.name}')
 
-def genclass(cls: DartClass, all_type_names = (), jsonbase: bool = True, meta: bool = True, data: bool = True) -> DartExpr:
-    "generate dart code for DartClass"
-    members = []
+def field_from_list(field: DartField, index: int) -> DartExpr:
+    "fromList expr for a field: field_from_map, but positional"
+    dart_type = field.dart_type
+    expr = f'raw[{index}]'
+    if dart_type.is_ext or dart_type.template_class in ('List', 'Map'):
+        return arg_null_wrap(dart_type, ffm_collectionify(dart_type, expr, 'fromList'), expr)
+    elif dart_type.base() == 'DateTime':
+        return arg_null_wrap(dart_type, DartExpr.x_call('DateTime.parse', expr), expr)
+    return expr
+
+def compact_members(cls: DartClass, schema: str) -> List[DartExpr]:
+    """
+    --compact: the object as a json array of its field values in declared order (toList / fromList, recursive), and
+    documents of the form [schema, body] (toJsonCompact / fromJsonCompact) that refuse a body written for another schema
+    """
+    return [
+        DartExpr.fac2('member', 'static const String', 'djc__schema', f'"{schema}"'),
+        DartExpr.fac('arrow',
+            sig=DartExpr.fac('sig', name=f'{cls.name}.fromList', args=DartExpr.list(['List<dynamic> raw']), factory=True),
+            body=DartExpr.x_call(cls.name, DartExpr.list([field_from_list(field, i) for i, field in enumerate(cls.fields)])),
+        ),
+        DartExpr.fac('arrow',
+            sig=DartExpr.fac('sig', name=f'{cls.name}.fromJsonCompact', args=DartExpr.list(['String raw']), factory=True),
+            body=f'{cls.name}.fromList(compactBody(jsonDecode(raw), djc__schema))',
+        ),
+        DartExpr.fac('arrow',
+            sig=DartExpr.fac('sig', name='fromJsonCompactList', ret=f'static List<{cls.name}>', args=DartExpr.list(['String raw'])),
+            body=f'[for (final e in compactBody(jsonDecode(raw), djc__schema)) {cls.name}.fromList(e)]',
+        ),
+        DartExpr.fac('arrow',
+            sig=DartExpr.fac('sig', name='toList', ret='List<dynamic>'),
+            body=DartExpr.fac2('listl', [tomap_lean(field.dart_type, field.name, 0, 'toList') for field in cls.fields]),
+        ),
+        DartExpr.fac('arrow',
+            sig=DartExpr.fac('sig', name='toJsonCompact', ret='String'),
+            body='jsonEncode([djc__schema, toList()])',
+        ),
+        DartExpr.fac('arrow',
+            sig=DartExpr.fac('sig', name='toJsonCompactList', ret='static String', args=DartExpr.list([f'Iterable<{cls.name}> items'])),
+            body='jsonEncode([djc__schema, [for (final e in items) e.toList()]])',
+        ),
+    ]
+
+def equality_helpers(cls: DartClass) -> Tuple[Dict[DartType, str], List[DartExpr]]:
+    """
+    one static equality function per collection type in cls's fields, nested ones included. they call each other
+    for nested collections instead of taking a pred closure. returns ({type: function name}, [functions])
+    """
+    names: Dict[DartType, str] = {}
+    def visit(dart_type: DartType):
+        if dart_type.template_class in ('List', 'Map') and dart_type not in names:
+            names[dart_type] = f'_djc__eq{len(names)}'
+            visit(dart_type.children[-1])
     for field in cls.fields:
-        members.append(DartExpr.fac('member', type=field.dart_type.full_type, name=field.name))
+        visit(field.dart_type)
+    return names, [equality_helper(dart_type, names) for dart_type in names]
 
-    # constructor
-    members.append(DartExpr.fac('sig', name=cls.name, args=DartExpr.fac('list', children=[f'this.{field.name}' for field in cls.fields])))
+def element_equal(dart_type: DartType, a: str, b: str, names: Dict[DartType, str]) -> str:
+    "inequality test for two collection elements"
+    if dart_type in names:
+        return f'!{names[dart_type]}({a}, {b})'
+    return f'{a} != {b}'
 
-    # fromMap factory
-    members.append(DartExpr.fac('arrow',
-        sig=DartExpr.fac('sig', name=f"{cls.name}.fromMap", args=DartExpr.list(['Map<String, dynamic> raw']), factory=True),
-        body=DartExpr.fac2('call', cls.name, DartExpr.list([
-            field_from_map(field, cls)
+def equality_helper(dart_type: DartType, names: Dict[DartType, str]) -> DartExpr:
+    "identical() and length checks, then an indexed loop (lists) or key loop (maps) with no closures"
+    child = dart_type.children[-1]
+    stmts = ['if (identical(a, b)) return true']
+    if dart_type.nullable:
+        stmts.append('if (a == null || b == null) return false')
+    stmts.append('if (a.length != b.length) return false')
+    if dart_type.template_class == 'List':
+        loop = DartExpr.fac('block', sig='for (var i = 0; i < a.length; i++)', children=[
+            f"if ({element_equal(child, 'a[i]', 'b[i]', names)}) return false",
+        ], nosemi=Nosemi)
+    elif child.nullable or child.base() == 'dynamic':
+        # null values have to be told apart from missing keys
+        loop = DartExpr.fac('block', sig='for (final key in a.keys)', children=[
+            f"if (!b.containsKey(key) || {element_equal(child, 'a[key]', 'b[key]', names)}) return false",
+        ], nosemi=Nosemi)
+    elif child in names:
+        loop = DartExpr.fac('block', sig='for (final key in a.keys)', children=[
+            'final value = b[key]',
+            f"if (value == null || {element_equal(child, 'a[key]!', 'value', names)}) return false",
+        ], nosemi=Nosemi)
+    else:
+        # a missing key reads as null, which never equals a non-nullable value
+        loop = DartExpr.fac('block', sig='for (final key in a.keys)', children=[
+            f"if (a[key] != b[key]) return false",
+        ], nosemi=Nosemi)
+    stmts.extend([loop, 'return true'])
+    return DartExpr.fac('block',
+        sig=DartExpr.fac('sig', name=names[dart_type], ret='static bool', args=DartExpr.list([f'{dart_type.full_type} a', f'{dart_type.full_type} b'])),
+        children=stmts,
+        nosemi=Nosemi,
+    )
+
+def genclass(cls: DartClass, all_type_names = (), jsonbase: bool = True, meta: bool = True, data: bool = True, lean_tomap: bool = False, lean_frommap: bool = False, lazy: bool = False, immutable: bool = False, cow_copy: bool = False, hash_limit: Optional[int] = None, compact: Optional[str] = None) -> DartExpr:
+    """
+    generate dart code for DartClass. lean_tomap and lean_frommap emit the allocation-lean toMap / fromMap, see tomap_lean() and ffm_lean().
+    lazy keeps the source map and decodes fields on first access, see lazy_members().
+    immutable makes final fields + unmodifiable collections, so hashCode can be cached and copy() can return this.
+    cow_copy makes copy() share collections copy-on-write, see cow_copy_field().
+    hash_limit bounds how much of a list hashCode looks at, see hash_field().
+    compact is a schema fingerprint (compact.fingerprint); when set, the positional methods from compact_members() are added
+    """
+    if lazy and lean_frommap:
+        raise CodegenError('lazy and lean_frommap are exclusive')
+    if lazy and immutable:
+        raise CodegenError('lazy and immutable are exclusive')
+    members = []
+    # immutable collection + dynamic fields, which the constructor wraps
+    frozen = [field for field in cls.fields if needs_freeze(field.dart_type)] if immutable else []
+    # immutable classes whose hash walks other objects cache it. the rest, all scalars, get a const constructor instead:
+    # const classes can't have late fields, and their hash is O(fields) anyway
+    cache_hash = immutable and any(is_mutable(field.dart_type) for field in cls.fields)
+    if lazy:
+        members.extend(lazy_members(cls))
+    else:
+        for field in cls.fields:
+            members.append(DartExpr.fac('member', type=('final ' if immutable else '') + field.dart_type.full_type, name=field.name))
+
+        # constructor
+        members.append(DartExpr.fac('sig', name=cls.name, ret='const' if immutable and not cache_hash else None, args=DartExpr.fac('list', children=[
+            f'{field.dart_type.full_type} {field.name}' if field in frozen else f'this.{field.name}'
             for field in cls.fields
-        ])),
-    ))
+        ])))
+        if frozen:
+            members[-1] = DartExpr.fac2('bin', members[-1], ':', DartExpr.list([
+                DartExpr.fac2('assign', field.name, unmodifiable(field.dart_type, field.name))
+                for field in frozen
+            ]))
+            # for copyWith, takes collections that are already unmodifiable
+            members.append(DartExpr.fac('sig', name=f'{cls.name}.{SHARED_CTOR}', args=DartExpr.list([f'this.{field.name}' for field in cls.fields])))
+
+    # fromMap factory. lazy has its fromMap constructor in lazy_members
+    if lean_frommap:
+        members.append(lean_from_map(cls, cow_copy))
+    elif not lazy:
+        members.append(DartExpr.fac('arrow',
+            sig=DartExpr.fac('sig', name=f"{cls.name}.fromMap", args=DartExpr.list(['Map<String, dynamic> raw']), factory=True),
+            body=DartExpr.fac2('call', cls.name, DartExpr.list([
+                cow_own(field, field_from_map(field, cls)) if cow_copy else field_from_map(field, cls)
+                for field in cls.fields
+            ])),
+        ))
 
     members.append(DartExpr.fac('arrow',
         sig=DartExpr.fac('sig', name=f"{cls.name}.fromJson", args=DartExpr.list(['String raw']), factory=True),
         body=DartExpr.fac2('call', f"{cls.name}.fromMap", DartExpr.list([
             DartExpr.fac2('call', 'jsonDecode', DartExpr.list(['raw'])),
+            # nothing else holds the decoded map, so its collections can be adopted
+            *(['owned: true'] if lean_frommap else []),
         ])),
     ))
 
-    # toMap function
+    # decode a top-level json array one element at a time
     members.append(DartExpr.fac('arrow',
-        sig=DartExpr.fac2('decorate', 'override', DartExpr.fac('sig', name="toMap", ret='Map<String, dynamic>')),
-        body=DartExpr.fac2('call', 'Map.fromEntries', DartExpr.fac2('listl', [
+        sig=DartExpr.fac('sig', name='fromJsonStream', ret=f'static Stream<{cls.name}>', args=DartExpr.list(['Stream<List<int>> bytes'])),
+        body=DartExpr.x_call('fromJsonStringStream', DartExpr.x_call(DartExpr.x_dot('bytes', 'transform'), 'utf8.decoder')),
+    ))
+    members.append(DartExpr.fac('arrow',
+        sig=DartExpr.fac('sig', name='fromJsonStringStream', ret=f'static Stream<{cls.name}>', args=DartExpr.list(['Stream<String> chunks'])),
+        body=f'chunks.transform(const JsonArraySplitter()).expand((elements) => elements).map((raw) => {cls.name}.fromJson(raw))',
+    ))
+
+    # toMap function
+    tomap_body = DartExpr.fac2('listl', [
+            DartExpr.fac2('entry', f'"{field.name}"', tomap_lean(field.dart_type, field.name))
+            for field in cls.fields
+        ], '{}') if lean_tomap else DartExpr.fac2('call', 'Map.fromEntries', DartExpr.fac2('listl', [
             DartExpr.fac2('call', 'MapEntry', DartExpr.list([
                 f'"{field.name}"',
                 field_tomap(field)
             ]))
             for field in cls.fields
-        ])),
+        ]))
+    if lazy:
+        # untouched: the source map itself, O(1). read-only at the top, nested values are shared like fromMap shares them
+        tomap_body = DartExpr.fac2('ternary', f'{LAZY_RAW} != null && !{LAZY_TOUCHED}', f'jsonView({LAZY_RAW}!)', tomap_body)
+    members.append(DartExpr.fac('arrow',
+        sig=DartExpr.fac2('decorate', 'override', DartExpr.fac('sig', name="toMap", ret='Map<String, dynamic>')),
+        body=tomap_body,
     ))
 
+    members.append(write_json(cls, lazy))
+
+    if compact is not None:
+        members.extend(compact_members(cls, compact))
+
     if meta:
-        members.append(DartExpr.fac2('member', 'static List<String>', 'djc__fields', DartExpr.fac2('listl', [
+        members.append(DartExpr.fac2('member', 'static const List<String>', 'djc__fields', DartExpr.fac2('listl', [
             f'"{field.name}"' for field in cls.fields
         ])))
+        members.append(DartExpr.fac2('member', 'static const Map<String, int>', 'djc__index', DartExpr.fac2('listl', [
+            DartExpr.fac2('entry', f'"{field.name}"', str(i)) for i, field in enumerate(cls.fields)
+        ], '{}')))
+        members.append(DartExpr.fac('arrow',
+            sig=DartExpr.fac2('decorate', 'override', DartExpr.fac('sig', name='fieldIndex', ret='int', args=DartExpr.list(['String name']))),
+            body='djc__index[name] ?? (throw ArgumentError("Unknown field ${name}"))',
+        ))
         members.append(getattr_setattr(
             cls,
             DartExpr.fac('sig', name='getAttr', args=DartExpr.list(['String name'])),
@@ -232,33 +538,69 @@ def genclass(cls: DartClass, all_type_names = (), jsonbase: bool = True, meta: b
             DartExpr.fac('sig', name='setAttr', ret='void', args=DartExpr.list(['String name', 'dynamic val'])),
             lambda field: DartExpr.fac2('assign', maybe_mask(['name', 'val'], field.name), 'val'),
             False,
+        ) if not immutable else DartExpr.fac('arrow',
+            sig=DartExpr.fac2('decorate', 'override', DartExpr.fac('sig', name='setAttr', ret='void', args=DartExpr.list(['String name', 'dynamic val']))),
+            body=f'throw UnsupportedError("{cls.name} is immutable")',
+        ))
+        # same again by position, for callers that resolve a name once with fieldIndex()
+        members.append(getattr_setattr(
+            cls,
+            DartExpr.fac('sig', name='getAt', args=DartExpr.list(['int index'])),
+            lambda field: DartExpr.fac2('kw', 'return', maybe_mask(['index'], field.name)),
+            True,
+            by_index=True,
+        ))
+        members.append(getattr_setattr(
+            cls,
+            DartExpr.fac('sig', name='setAt', ret='void', args=DartExpr.list(['int index', 'dynamic val'])),
+            lambda field: DartExpr.fac2('assign', maybe_mask(['index', 'val'], field.name), 'val'),
+            False,
+            by_index=True,
+        ) if not immutable else DartExpr.fac('arrow',
+            sig=DartExpr.fac2('decorate', 'override', DartExpr.fac('sig', name='setAt', ret='void', args=DartExpr.list(['int index', 'dynamic val']))),
+            body=f'throw UnsupportedError("{cls.name} is immutable")',
         ))
 
     if data:
+        # the data methods read fields without handing them out, so on --lazy classes they don't spend the raw map
+        data_fields = [lazy_peek(field) for field in cls.fields] if lazy else cls.fields
+        eq_names, eq_helpers = equality_helpers(cls)
         members.append(DartExpr.fac('block',
             # note this isn't Object by choice, dart doesn't want to give you this
             sig=DartExpr.fac2('decorate', 'override', DartExpr.fac2('sig', 'operator ==', 'bool', DartExpr.list([f'Object other']))),
             children=[
+                'if (identical(this, other)) return true',
                 f'if (other is! {cls.name}) return false',
                 # todo: 'other as {cls}' is necessary in raw dart (I think), linted as superfluous in flutter. find out why and make this optional
                 f'var x = other as {cls.name}',
+                # cached, so a cheap way out for most unequal pairs
+                *(['if (hashCode != x.hashCode) return false'] if cache_hash else []),
                 # todo: collection customizations
-                DartExpr.fac2('kw', 'return', DartExpr.fac2('list', map(field_equal, cls.fields), ('&&',))),
+                DartExpr.fac2('kw', 'return', DartExpr.fac2('list', [field_equal(field, eq_names) for field in data_fields], ('&&',))),
             ],
             nosemi=Nosemi,
         ))
+        members.extend(eq_helpers)
         assert len(cls.fields) > 0, f"empty class {cls.name}" # body below is wrong otherwise
-        members.append(DartExpr.x_arrow(
-            sig=DartExpr.fac2('decorate', 'override', 'int get hashCode'),
-            body=hash_field(cls.fields[0], True) if len(cls.fields) == 1 else DartExpr.fac2('call', 'Object.hash', DartExpr.list(
-                map(hash_field, cls.fields),
-            ))
+        hash_body = hash_field(data_fields[0], True, hash_limit) if len(cls.fields) == 1 else DartExpr.fac2('call', 'Object.hash', DartExpr.list(
+            [hash_field(field, limit=hash_limit) for field in data_fields],
         ))
+        if cache_hash:
+            # computed on first use
+            members.append(DartExpr.fac2('decorate', 'override', DartExpr.fac('member', type='late final int', name='hashCode', init=hash_body)))
+        else:
+            members.append(DartExpr.x_arrow(sig=DartExpr.fac2('decorate', 'override', 'int get hashCode'), body=hash_body))
+        copy_body = 'this' if immutable else DartExpr.fac2('call', cls.name, DartExpr.list([
+            (cow_copy_field if cow_copy else copy_field)(field) for field in data_fields
+        ]))
+        if lazy:
+            # nothing writes to the source map, so an untouched copy can decode from the same one
+            copy_body = DartExpr.fac2('ternary', f'{LAZY_RAW} != null && !{LAZY_TOUCHED}', f'{cls.name}.fromMap({LAZY_RAW}!)', copy_body)
         members.append(DartExpr.fac('arrow',
             sig=DartExpr.fac2('decorate', 'override', f'{cls.name} copy()'),
-            body=DartExpr.fac2('call', cls.name, DartExpr.list(map(copy_field, cls.fields))),
+            body=copy_body,
         ))
-        # todo: copyWith
+        members.append(copy_with(cls, frozen))
         # todo: whatever makes stable sorting
 
     return DartExpr.x_block(
@@ -266,13 +608,186 @@ def genclass(cls: DartClass, all_type_names = (), jsonbase: bool = True, meta: b
         children=members,
     )
 
-def hash_field(field: DartField, solitary: bool = False) -> DartExpr:
-    "solitary means this class has 1 field and .hashCode is necessary for non-collections"
-    return f'hashcodeList({field.name})' if field.dart_type.template_class == 'List' else \
-        f'hashcodeMap({field.name})' if field.dart_type.template_class == 'Map' else \
+# private constructor of --immutable classes with collections, which doesn't copy them
+SHARED_CTOR = '_djc__shared'
+
+def copy_with(cls: DartClass, frozen: List[DartField] = ()) -> DartExpr:
+    """
+    copyWith method. unchanged fields are passed by reference, so an edit costs O(changed fields).
+    nullable params default to the djcUnset sentinel so null can be passed as a value. frozen are the collection
+    and dynamic fields of an --immutable class, which are made unmodifiable when they change
+    """
+    params = []
+    args = []
+    for field in cls.fields:
+        dart_type = field.dart_type
+        nullable = dart_type.nullable or dart_type.base() == 'dynamic'
+        if nullable:
+            params.append(f'Object? {field.name} = djcUnset')
+            new = field.name if dart_type.base() == 'dynamic' else f'({field.name} as {dart_type.full_type})'
+        else:
+            params.append(f'{dart_type.full_type}? {field.name}')
+            new = field.name
+        if field in frozen:
+            new = unmodifiable(dart_type, new)
+        elif not nullable:
+            args.append(DartExpr.fac2('bin', field.name, '??', f'this.{field.name}'))
+            continue
+        cond = f'identical({field.name}, djcUnset)' if nullable else f'{field.name} == null'
+        args.append(DartExpr.fac2('ternary', cond, f'this.{field.name}', new))
+    return DartExpr.fac('arrow',
+        sig=DartExpr.fac('sig', name='copyWith', ret=cls.name, args=DartExpr.fac2('listl', params, '{}')),
+        body=DartExpr.x_call(f'{cls.name}.{SHARED_CTOR}' if frozen else cls.name, DartExpr.list(args)),
+    )
+
+def needs_freeze(dart_type: DartType) -> bool:
+    "values an --immutable constructor has to copy: collections, and dynamic, which can hold decoded json lists + maps"
+    return bool(dart_type.template_class) or dart_type.base() == 'dynamic'
+
+@SUBTREE_CACHE.memo(lambda dart_type, value, depth=0: (dart_type.key(), value_key(value), depth))
+def unmodifiable(dart_type: DartType, value: str, depth: int = 0) -> DartExpr:
+    """
+    unmodifiable copy of a collection for --immutable, nested collections included. dynamic values go through jsonFreeze
+    at runtime. depth keeps loop variables distinct
+    """
+    if dart_type.base() == 'dynamic':
+        return DartExpr.x_call('jsonFreeze', value)
+    if dart_type.template_class == 'List':
+        child = dart_type.children[0]
+        source = value + dart_type.bang_tail()
+        if needs_freeze(child):
+            var = f'e{depth}'
+            source = DartExpr.x_call(DartExpr.x_dot(source, 'map'), DartExpr.fac2('arrow', f'({var})', unmodifiable(child, var, depth + 1)))
+        expr = DartExpr.x_call(f'List<{child.full_type}>.unmodifiable', source)
+    elif dart_type.template_class == 'Map':
+        child = dart_type.children[1]
+        source = value + dart_type.bang_tail()
+        if needs_freeze(child):
+            var = f'kv{depth}'
+            source = DartExpr.fac2('listl', [DartExpr.fac2('cfor', var, DartExpr.x_dot(source, 'entries'), DartExpr.fac2('entry',
+                f'{var}.key',
+                unmodifiable(child, f'{var}.value', depth + 1),
+            ))], '{}')
+        expr = DartExpr.x_call(f'Map<String, {child.full_type}>.unmodifiable', source)
+    else:
+        return value
+    return arg_null_wrap(dart_type, expr, value)
+
+def lean_from_map(cls: DartClass, cow_copy: bool = False) -> DartExpr:
+    """
+    fromMap factory for --lean-frommap. collection fields are read out of raw once, into locals. cow_copy as in cow_own();
+    its list fields are growable, since a CowList's first write after copy() makes growable storage anyway
+    """
+    sources = {
+        field.name: f'{field.name}_raw'
+        for field in cls.fields
+        if field.dart_type.template_class
+    }
+    sig = DartExpr.fac('sig', name=f"{cls.name}.fromMap", args=DartExpr.list(['Map<String, dynamic> raw', '{bool owned = false}']), factory=True)
+    values = [
+        ffm_lean(field.dart_type, sources[field.name], 0, cow_copy) if field.name in sources else
+        ffm_lean(field.dart_type, f'raw["{field.name}"]') if field.dart_type.is_ext else
+        field_from_map(field, cls)
+        for field in cls.fields
+    ]
+    if cow_copy:
+        # fresh lists + maps, or adopted ones with owned
+        values = [cow_own(field, value) for field, value in zip(cls.fields, values)]
+    body = DartExpr.fac2('call', cls.name, DartExpr.list(values))
+    if not sources:
+        return DartExpr.fac('arrow', sig=sig, body=body)
+    return DartExpr.fac('block',
+        sig=sig,
+        children=[
+            *(f'final {local} = raw["{name}"]' for name, local in sources.items()),
+            DartExpr.fac2('kw', 'return', body),
+        ],
+        nosemi=Nosemi,
+    )
+
+# state of --lazy classes. djc__ so it can't collide with the _name backing fields
+LAZY_RAW = '_djc__raw'
+LAZY_TOUCHED = '_djc__touched'
+LAZY_DECODE_ALL = '_djc__decodeAll'
+# prefix of the getters that decode a mutable field without counting it as handed out, for the data methods
+LAZY_PEEK = '_djc__peek_'
+
+def is_mutable(dart_type: DartType) -> bool:
+    "values that can be changed in place after a getter hands them out"
+    return bool(dart_type.template_class) or dart_type.is_ext or dart_type.base() == 'dynamic'
+
+def lazy_members(cls: DartClass) -> List[DartExpr]:
+    """
+    state, constructors and accessors for --lazy. fromMap keeps the source map, each getter decodes + caches its field on
+    first read. writeJson writes the source map (toMap returns a read-only view of it) until a setter runs or a public getter has handed out
+    a mutable field (collection, model), because that can be modified in place. ==, hashCode and copy() read mutable
+    fields through private peek getters, which don't count. setters decode everything first and drop the map.
+    """
+    members = [
+        DartExpr.fac('member', type='Map<String, dynamic>?', name=LAZY_RAW),
+        DartExpr.fac('member', type='bool', name=LAZY_TOUCHED, init='false'),
+    ]
+    for field in cls.fields:
+        dart_type = field.dart_type
+        members.append(DartExpr.fac('member', type='dynamic' if dart_type.base() == 'dynamic' else dart_type.base() + '?', name=f'_{field.name}'))
+    members.append(DartExpr.fac2('bin',
+        DartExpr.fac('sig', name=cls.name, args=DartExpr.list([f'{field.dart_type.full_type} {field.name}' for field in cls.fields])),
+        ':',
+        DartExpr.list([f'_{field.name} = {field.name}' for field in cls.fields]),
+    ))
+    members.append(DartExpr.fac2('bin',
+        DartExpr.fac('sig', name=f'{cls.name}.fromMap', args=DartExpr.list(['Map<String, dynamic> raw'])),
+        ':',
+        f'{LAZY_RAW} = raw',
+    ))
+    for field in cls.fields:
+        dart_type = field.dart_type
+        value = DartExpr.fac2('bin', f'_{field.name}', '??=', field_from_map(field, cls, f'{LAZY_RAW}!'))
+        if dart_type.nullable or dart_type.base() == 'dynamic':
+            # a nullable field can hold a real null once the map is gone, so ??= alone can't mean 'not decoded yet'
+            value = DartExpr.fac2('ternary', f'{LAZY_RAW} == null', f'_{field.name}', value)
+        # getters have no parens, so no sig template
+        sig = f'{dart_type.full_type} get {field.name}'
+        if is_mutable(dart_type):
+            members.append(DartExpr.fac('arrow', sig=f'{dart_type.full_type} get {LAZY_PEEK}{field.name}', body=value))
+            members.append(DartExpr.fac('block', sig=sig, children=[
+                f'{LAZY_TOUCHED} = true',
+                DartExpr.fac2('kw', 'return', f'{LAZY_PEEK}{field.name}'),
+            ], nosemi=Nosemi))
+        else:
+            members.append(DartExpr.fac('arrow', sig=sig, body=value))
+        members.append(DartExpr.fac('block',
+            sig=DartExpr.fac('sig', name=f'set {field.name}', args=DartExpr.list([f'{dart_type.full_type} value'])),
+            children=[f'{LAZY_DECODE_ALL}()', f'_{field.name} = value'],
+            nosemi=Nosemi,
+        ))
+    members.append(DartExpr.fac('block',
+        sig=DartExpr.fac('sig', name=LAZY_DECODE_ALL, ret='void'),
+        children=[
+            f'if ({LAZY_RAW} == null) return',
+            *(f'_{field.name} = {lazy_peek(field).name}' for field in cls.fields),
+            f'{LAZY_RAW} = null',
+        ],
+        nosemi=Nosemi,
+    ))
+    return members
+
+def lazy_peek(field: DartField) -> DartField:
+    "field as the data methods of a --lazy class read it: mutable fields through their peek getter"
+    return dataclasses.replace(field, name=LAZY_PEEK + field.name) if is_mutable(field.dart_type) else field
+
+def hash_field(field: DartField, solitary: bool = False, limit: Optional[int] = None) -> DartExpr:
+    """
+    solitary means this class has 1 field and .hashCode is necessary for non-collections.
+    limit caps how many elements of each list get hashed, see hashcodeList in jsonbase.dart
+    """
+    args = field.name if limit is None else f'{field.name}, limit: {limit}'
+    return f'hashcodeList({args})' if field.dart_type.template_class == 'List' else \
+        f'hashcodeMap({args})' if field.dart_type.template_class == 'Map' else \
         f'{field.name}.hashCode' if solitary else \
         field.name
 
+@SUBTREE_CACHE.memo(field_key)
 def copy_field(field: DartField) -> DartExpr:
     "field initializer for deep copy"
     # warning: more aggressive deep copy; recurse this on child type
@@ -286,20 +801,49 @@ def copy_field(field: DartField) -> DartExpr:
     else:
         return field.name
 
-def getattr_setattr(cls: DartClass, sig: DartExpr, stmt: Callable[[DartField], DartExpr], nobreak=True):
-    "common wrapper for getAttr / setAttr type switch functions"
+@SUBTREE_CACHE.memo(field_key)
+def cow_copy_field(field: DartField) -> DartExpr:
+    """
+    field initializer for copy() with --cow-copy. a CowList / CowMap (from fromMap, or an earlier copy) is forked, O(1)
+    until someone writes. anything else was passed in from outside and is copied eagerly, like copy_field does
+    """
+    dart_type = field.dart_type
+    if dart_type.template_class in ('List', 'Map'):
+        fn = 'cowCopyList' if dart_type.template_class == 'List' else 'cowCopyMap'
+        return arg_null_wrap(dart_type, DartExpr.x_call(fn, field.name + dart_type.bang_tail()), field.name)
+    return copy_field(field)
+
+def cow_own(field: DartField, value: DartExpr) -> DartExpr:
+    "fromMap value of a field with --cow-copy: collections decoded into fresh storage are stored as CowList / CowMap"
+    dart_type = field.dart_type
+    if dart_type.template_class == 'List':
+        elt = dart_type.children[0].full_type
+        return DartExpr.x_call(f'cowOwnedList<{elt}>' if dart_type.nullable else f'CowList<{elt}>.owned', value)
+    elif dart_type.template_class == 'Map':
+        val = dart_type.children[1].full_type
+        return DartExpr.x_call(f'cowOwnedMap<{val}>' if dart_type.nullable else f'CowMap<String, {val}>.owned', value)
+    return value
+
+def getattr_setattr(cls: DartClass, sig: DartExpr, stmt: Callable[[DartField], DartExpr], nobreak=True, by_index: bool = False):
+    "common wrapper for getAttr / setAttr type switch functions. by_index switches on the field's position (getAt / setAt) instead of its name"
+    if by_index:
+        switch = 'index'
+        labels = [str(i) for i in range(len(cls.fields))]
+        default = DartExpr.x_call('RangeError.index', DartExpr.list(['index', 'djc__fields']))
+    else:
+        switch = 'name'
+        labels = [f'"{field.name}"' for field in cls.fields]
+        default = DartExpr.fac2('call', 'ArgumentError', '"Unknown field ${name}"')
     return DartExpr.fac('block',
         # note: this intentionally doesn't return dynamic -- like maybe the language will infer e.g. String return if all members are Strings
         sig=DartExpr.fac2('decorate', 'override', sig),
         children=[
-            DartExpr.fac2('block', DartExpr.fac2('call', 'switch', DartExpr.list(['name'])), [
-                DartExpr.fac2('case', f'"{field.name}"', [stmt(field)], nobreak)
-                for field in cls.fields
+            DartExpr.fac2('block', DartExpr.fac2('call', 'switch', DartExpr.list([switch])), [
+                DartExpr.fac2('case', label, [stmt(field)], nobreak)
+                for label, field in zip(labels, cls.fields)
             ] + [
                 # default case
-                DartExpr.fac2('case', None, [
-                    DartExpr.fac2('kw', 'throw', DartExpr.fac2('call', 'ArgumentError', '"Unknown field ${name}"'))
-                ], True),
+                DartExpr.fac2('case', None, [DartExpr.fac2('kw', 'throw', default)], True),
             ], (), (), Nosemi),
         ],
         nosemi=Nosemi,
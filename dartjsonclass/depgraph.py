@@ -0,0 +1,108 @@
+"whole-schema dependency graph, built once per run from resolved DartTypes"
+
+import functools, warnings
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+from .parser import DartClass, DartType
+
+@functools.lru_cache(maxsize=None)
+def type_refs(dart_type: DartType) -> FrozenSet[str]:
+    "names of classes referenced anywhere in a type tree, including inside List / Map. cached per interned type"
+    if dart_type.children:
+        return frozenset().union(*map(type_refs, dart_type.children))
+    return frozenset((dart_type.base(),)) if dart_type.is_ext else frozenset()
+
+class DepGraph:
+    """
+    Class + module dependency graph. Edges come from field DartTypes, so they cover types nested in collections.
+    Unions become dynamic and don't need imports, so they don't make edges.
+    """
+
+    def __init__(self, classes: Iterable[Tuple[str, DartClass]]):
+        "classes is (module, class) pairs"
+        self.module: Dict[str, str] = {}
+        self.classes: Dict[str, DartClass] = {}
+        for module, cls in classes:
+            self.module[cls.name] = module
+            self.classes[cls.name] = cls
+        self.deps: Dict[str, List[str]] = {}
+        # module -> modules it needs to import
+        self.module_deps: Dict[str, Set[str]] = {module: set() for module in self.module.values()}
+        missing = set()
+        for name, cls in self.classes.items():
+            refs = set().union(*(type_refs(field.dart_type) for field in cls.fields))
+            missing.update(refs - self.classes.keys())
+            # sorted so traversal order (and anything built on it) is stable between runs
+            self.deps[name] = sorted(refs & self.classes.keys())
+            for dep in self.deps[name]:
+                if self.module[dep] != self.module[name]:
+                    self.module_deps[self.module[name]].add(self.module[dep])
+        if missing:
+            warnings.warn(f'classes referenced but not generated: {sorted(missing)}')
+
+    def sccs(self) -> List[List[str]]:
+        "strongly connected components, dependencies before dependents (Tarjan, iterative so deep schemas don't hit the recursion limit)"
+        index: Dict[str, int] = {}
+        lowlink: Dict[str, int] = {}
+        stack: List[str] = []
+        on_stack: Set[str] = set()
+        ret = []
+        for root in self.classes:
+            if root in index:
+                continue
+            # (node, iterator over its deps)
+            work = [(root, iter(self.deps[root]))]
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, deps = work[-1]
+                for dep in deps:
+                    if dep not in index:
+                        index[dep] = lowlink[dep] = len(index)
+                        stack.append(dep)
+                        on_stack.add(dep)
+                        work.append((dep, iter(self.deps[dep])))
+                        break
+                    elif dep in on_stack:
+                        lowlink[node] = min(lowlink[node], index[dep])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    if lowlink[node] == index[node]:
+                        scc = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            scc.append(member)
+                            if member == node:
+                                break
+                        ret.append(scc)
+        return ret
+
+    def toposort(self) -> List[str]:
+        "class names with dependencies first. members of a cycle come out adjacent, in no particular order"
+        return [name for scc in self.sccs() for name in scc]
+
+    def cycles(self) -> List[List[str]]:
+        "groups of classes that reference each other, including classes that reference themselves"
+        return [
+            sorted(scc) for scc in self.sccs()
+            if len(scc) > 1 or scc[0] in self.deps[scc[0]]
+        ]
+
+    def dependents(self, modules: Iterable[str]) -> Set[str]:
+        "modules which import any of modules, directly or transitively (not including modules themselves unless cyclic)"
+        importers: Dict[str, Set[str]] = {}
+        for module, deps in self.module_deps.items():
+            for dep in deps:
+                importers.setdefault(dep, set()).add(module)
+        ret = set()
+        todo = list(modules)
+        while todo:
+            for importer in importers.get(todo.pop(), ()):
+                if importer not in ret:
+                    ret.add(importer)
+                    todo.append(importer)
+        return ret
@@ -1,12 +1,29 @@
 // from dartjsonclass (package version)
 // todo: make json optional; from/to map is the more useful feature bc clients are doing their own serialization
+import 'dart:collection';
 import 'dart:convert';
 
+/// anything that can write itself as json
+abstract class JsonWritable {
+  void writeJson(StringSink sink);
+}
+
 /// base class for json messages
-abstract class JsonBase<T> {
+abstract class JsonBase<T> implements JsonWritable {
+  // const so --immutable classes can have const constructors
+  const JsonBase();
+
   Map<String, dynamic> toMap();
 
-  String toJson() => jsonEncode(toMap());
+  /// write json straight to sink without building the toMap() tree. generated classes override this
+  @override
+  void writeJson(StringSink sink) => sink.write(jsonEncode(toMap()));
+
+  String toJson() {
+    final buffer = StringBuffer();
+    writeJson(buffer);
+    return buffer.toString();
+  }
 
   // dart why won't you love me
   // static JsonBase fromMap(Map<String, dynamic> map) => throw UnimplementedError("I'm abstract even though that's not allowed");
@@ -17,10 +34,20 @@ abstract class JsonBase<T> {
 
 /// base class with metaprogramming
 /// ideally this would be a combine-able interface, but multiple inheritance in dart is painful
-abstract class JsonBaseMeta<T> {
+abstract class JsonBaseMeta<T> implements JsonWritable {
+  const JsonBaseMeta();
+
   Map<String, dynamic> toMap();
 
-  String toJson() => jsonEncode(toMap());
+  /// write json straight to sink without building the toMap() tree. generated classes override this
+  @override
+  void writeJson(StringSink sink) => sink.write(jsonEncode(toMap()));
+
+  String toJson() {
+    final buffer = StringBuffer();
+    writeJson(buffer);
+    return buffer.toString();
+  }
 
   // dart why won't you love me
   // static JsonBase fromMap(Map<String, dynamic> map) => throw UnimplementedError("I'm abstract even though that's not allowed");
@@ -31,12 +58,58 @@ abstract class JsonBaseMeta<T> {
   // metaprogramming section
   dynamic getAttr(String name) => throw UnimplementedError("class generated without metaprogramming");
   void setAttr(String name, dynamic val) => throw UnimplementedError("class generated without metaprogramming");
+
+  /// position of a field in djc__fields, for getAt / setAt. resolve a name once, then read by index
+  int fieldIndex(String name);
+  dynamic getAt(int index);
+  void setAt(int index, dynamic val);
+}
+
+// hashing. collections hash by content all the way down, so hashes agree with the generated deep ==
+
+/// mix value into hash (jenkins one-at-a-time, the scheme Object.hash uses)
+int hashCombine(int hash, int value) {
+  hash = 0x1fffffff & (hash + value);
+  hash = 0x1fffffff & (hash + ((0x0007ffff & hash) << 10));
+  return hash ^ (hash >> 6);
+}
+
+int hashFinish(int hash) {
+  hash = 0x1fffffff & (hash + ((0x03ffffff & hash) << 3));
+  hash = hash ^ (hash >> 11);
+  return 0x1fffffff & (hash + ((0x00003fff & hash) << 15));
 }
 
-int hashcodeList(List? list) => list == null ? list.hashCode : Object.hashAll(list);
+/// hashCode, except lists and maps hash by content. limit is passed down to nested lists
+int hashcodeValue(Object? value, {int? limit}) {
+  if (value is List) return hashcodeList(value, limit: limit);
+  if (value is Map) return hashcodeMap(value, limit: limit);
+  return value.hashCode;
+}
 
-// sigh yes Object.hashAll(map.entries) seems to not work
-int hashcodeMap(Map? map) => map == null ? map.hashCode : Object.hash(Object.hashAll(map.keys), Object.hashAll(map.values));
+/// length + elements in order. with limit, only the first limit elements are hashed; equal lists still hash the same
+int hashcodeList(List? list, {int? limit}) {
+  if (list == null) return list.hashCode;
+  final count = limit != null && limit < list.length ? limit : list.length;
+  var hash = hashCombine(0, list.length);
+  for (var i = 0; i < count; i++) {
+    hash = hashCombine(hash, hashcodeValue(list[i], limit: limit));
+  }
+  return hashFinish(hash);
+}
+
+/// order-independent, like mapEqual: a sum of per-entry hashes. always hashes every entry, because there's no
+/// subset of a map's entries that two equal maps are sure to agree on without looking at all of them.
+/// forEach hands over key + value without a second lookup or a MapEntry per entry; what's left is one closure (and
+/// its context for sum) per call
+int hashcodeMap(Map? map, {int? limit}) {
+  if (map == null) return map.hashCode;
+  var sum = 0;
+  map.forEach((key, value) {
+    sum = 0x1fffffff & (sum + hashFinish(hashCombine(hashCombine(0, key.hashCode), hashcodeValue(value, limit: limit))));
+  });
+  return hashFinish(hashCombine(hashCombine(0, map.length), sum));
+}
 
 bool listEqual<T>(List<T>? a, List<T>? b, {bool Function(T?, T?)? pred}) {
   // this exists in flutter:collection, and seemingly *used to* exist in dart?
@@ -61,3 +134,350 @@ bool mapEqual<T>(Map<String, T>? a, Map<String, T>? b, {bool Function(T?, T?)? p
   }
   return true;
 }
+
+// copyWith helpers
+
+class _DjcUnset {
+  const _DjcUnset();
+}
+
+/// default for nullable copyWith params, so passing null can mean 'set to null'
+const Object djcUnset = _DjcUnset();
+
+/// copy of list with list[index] replaced by update(list[index]). the other elements are shared, not copied
+List<T> listWith<T>(List<T> list, int index, T Function(T) update) {
+  final ret = List<T>.of(list, growable: false);
+  ret[index] = update(list[index]);
+  return ret;
+}
+
+/// copy of map with map[key] replaced by update(map[key]) (null when absent). the other values are shared
+Map<String, T> mapWith<T>(Map<String, T> map, String key, T Function(T?) update) => {...map, key: update(map[key])};
+
+// copy-on-write collections, for --cow-copy. fromMap stores the collections it decodes in these, so copy() can give
+// the copy a wrapper on the same storage, and whichever side writes first copies it. the storage of a CowList is only
+// reachable through CowLists, which is what makes sharing it safe. the elements themselves are shared, same as the
+// spread copy
+
+/// list that shares its storage with its forks until the first write
+class CowList<E> extends ListBase<E> {
+  List<E> _source;
+  // another CowList has _source
+  bool _shared;
+
+  /// wrap a list nothing else holds
+  CowList.owned(List<E> source) : _source = source, _shared = false;
+
+  CowList._fork(List<E> source) : _source = source, _shared = true;
+
+  /// another wrapper on the same storage. both copy before their next write
+  CowList<E> fork() {
+    _shared = true;
+    return CowList<E>._fork(_source);
+  }
+
+  List<E> get _owned {
+    if (_shared) {
+      _source = List<E>.of(_source);
+      _shared = false;
+    }
+    return _source;
+  }
+
+  @override
+  int get length => _source.length;
+
+  @override
+  set length(int length) => _owned.length = length;
+
+  @override
+  E operator [](int index) => _source[index];
+
+  @override
+  void operator []=(int index, E value) => _owned[index] = value;
+
+  @override
+  Iterator<E> get iterator => _source.iterator;
+
+  // ListBase grows through length++, which doesn't work for non-nullable E
+  @override
+  void add(E element) => _owned.add(element);
+
+  @override
+  void addAll(Iterable<E> iterable) => _owned.addAll(iterable);
+
+  @override
+  void insert(int index, E element) => _owned.insert(index, element);
+
+  @override
+  void insertAll(int index, Iterable<E> iterable) => _owned.insertAll(index, iterable);
+
+  @override
+  E removeAt(int index) => _owned.removeAt(index);
+
+  @override
+  void clear() => _owned.clear();
+}
+
+/// map that shares its storage with its forks until the first write
+class CowMap<K, V> extends MapBase<K, V> {
+  Map<K, V> _source;
+  bool _shared;
+
+  /// wrap a map nothing else holds
+  CowMap.owned(Map<K, V> source) : _source = source, _shared = false;
+
+  CowMap._fork(Map<K, V> source) : _source = source, _shared = true;
+
+  /// another wrapper on the same storage. both copy before their next write
+  CowMap<K, V> fork() {
+    _shared = true;
+    return CowMap<K, V>._fork(_source);
+  }
+
+  Map<K, V> get _owned {
+    if (_shared) {
+      _source = Map<K, V>.of(_source);
+      _shared = false;
+    }
+    return _source;
+  }
+
+  @override
+  V? operator [](Object? key) => _source[key];
+
+  @override
+  void operator []=(K key, V value) => _owned[key] = value;
+
+  @override
+  Iterable<K> get keys => _source.keys;
+
+  @override
+  int get length => _source.length;
+
+  @override
+  bool containsKey(Object? key) => _source.containsKey(key);
+
+  @override
+  V? remove(Object? key) => _owned.remove(key);
+
+  @override
+  void clear() => _owned.clear();
+}
+
+/// CowList.owned for a nullable field
+List<E>? cowOwnedList<E>(List<E>? list) => list == null ? null : CowList<E>.owned(list);
+
+/// CowMap.owned for a nullable field
+Map<String, V>? cowOwnedMap<V>(Map<String, V>? map) => map == null ? null : CowMap<String, V>.owned(map);
+
+/// copy of a list for copy(): a fork if it's a CowList, otherwise an eager copy, since whoever passed in a plain list
+/// may still write to it
+List<E> cowCopyList<E>(List<E> list) => list is CowList<E> ? list.fork() : CowList<E>.owned(List<E>.of(list));
+
+/// cowCopyList for maps
+Map<String, V> cowCopyMap<V>(Map<String, V> map) => map is CowMap<String, V> ? map.fork() : CowMap<String, V>.owned(Map<String, V>.of(map));
+
+/// read-only view of a --lazy class's source map, for toMap. nested values are the source's own, like after fromMap
+Map<String, dynamic> jsonView(Map<String, dynamic> map) => UnmodifiableMapView(map);
+
+/// deep unmodifiable copy of a decoded json value, for the dynamic fields of an --immutable class
+dynamic jsonFreeze(dynamic value) {
+  if (value is Map) return Map<String, dynamic>.unmodifiable({for (final entry in value.entries) entry.key as String: jsonFreeze(entry.value)});
+  if (value is List) return List<dynamic>.unmodifiable([for (final elt in value) jsonFreeze(elt)]);
+  return value;
+}
+
+/// body of a compact document ([schema, body], see --compact), after checking it was written for this schema
+List<dynamic> compactBody(Object? decoded, String schema) {
+  if (decoded is! List || decoded.length != 2) throw FormatException('not a compact json document');
+  if (decoded[0] != schema) throw FormatException('compact schema mismatch: got ${decoded[0]}, expected $schema');
+  return decoded[1] as List<dynamic>;
+}
+
+// writeJson helpers. output matches jsonEncode byte for byte
+
+const _shortEscapes = {0x08: r'\b', 0x09: r'\t', 0x0a: r'\n', 0x0c: r'\f', 0x0d: r'\r', 0x22: r'\"', 0x5c: r'\\'};
+
+String _hex4(int c) => c.toRadixString(16).padLeft(4, '0');
+
+/// write s as a json string literal, escaped the way jsonEncode escapes it
+void writeJsonString(StringSink sink, String s) {
+  sink.write('"');
+  // unescaped runs are written as one slice
+  var start = 0;
+  for (var i = 0; i < s.length; i++) {
+    final c = s.codeUnitAt(i);
+    String? escaped;
+    if (c < 0x20 || c == 0x22 || c == 0x5c) {
+      escaped = _shortEscapes[c] ?? '\\u${_hex4(c)}';
+    } else if (c & 0xf800 == 0xd800) {
+      // surrogate pairs pass through, lone surrogates are escaped
+      if (c < 0xdc00 && i + 1 < s.length && s.codeUnitAt(i + 1) & 0xfc00 == 0xdc00) {
+        i++;
+        continue;
+      }
+      escaped = '\\u${_hex4(c)}';
+    }
+    if (escaped != null) {
+      if (i > start) sink.write(s.substring(start, i));
+      sink.write(escaped);
+      start = i + 1;
+    }
+  }
+  sink.write(start == 0 ? s : s.substring(start));
+  sink.write('"');
+}
+
+/// numbers, which jsonEncode refuses when they're NaN or infinite
+void writeJsonNum(StringSink sink, num n) {
+  if (!n.isFinite) throw JsonUnsupportedObjectError(n);
+  sink.write(n);
+}
+
+void writeJsonDateTime(StringSink sink, DateTime? dt) => dt == null ? sink.write('null') : writeJsonString(sink, dt.toIso8601String());
+
+/// nested model, or null
+void writeJsonOpt(StringSink sink, JsonWritable? value) => value == null ? sink.write('null') : value.writeJson(sink);
+
+/// anything; scalars written directly, everything else through jsonEncode (i.e. union-typed fields)
+void writeJsonValue(StringSink sink, Object? value) {
+  if (value == null || value is bool) {
+    sink.write(value);
+  } else if (value is num) {
+    writeJsonNum(sink, value);
+  } else if (value is String) {
+    writeJsonString(sink, value);
+  } else {
+    sink.write(jsonEncode(value));
+  }
+}
+
+void writeJsonList<T>(StringSink sink, List<T>? list, void Function(StringSink, T) write) {
+  if (list == null) return sink.write('null');
+  sink.write('[');
+  for (var i = 0; i < list.length; i++) {
+    if (i > 0) sink.write(',');
+    write(sink, list[i]);
+  }
+  sink.write(']');
+}
+
+void writeJsonMap<T>(StringSink sink, Map<String, T>? map, void Function(StringSink, T) write) {
+  if (map == null) return sink.write('null');
+  sink.write('{');
+  var first = true;
+  map.forEach((key, value) {
+    if (!first) sink.write(',');
+    first = false;
+    writeJsonString(sink, key);
+    sink.write(':');
+    write(sink, value);
+  });
+  sink.write('}');
+}
+
+/// splits a top-level json array into the source text of its elements, chunk by chunk, so a long array can be
+/// decoded one element at a time. only the current element is buffered. each chunk of input gives a (maybe empty)
+/// list of the elements that finished in it
+class JsonArraySplitter extends Converter<String, List<String>> {
+  const JsonArraySplitter();
+
+  @override
+  List<String> convert(String input) {
+    final elements = <String>[];
+    final sink = startChunkedConversion(ChunkedConversionSink<List<String>>.withCallback((chunks) {
+      for (final chunk in chunks) {
+        elements.addAll(chunk);
+      }
+    }));
+    sink.add(input);
+    sink.close();
+    return elements;
+  }
+
+  @override
+  StringConversionSink startChunkedConversion(Sink<List<String>> sink) => _JsonArraySplitterSink(sink);
+}
+
+class _JsonArraySplitterSink extends StringConversionSinkBase {
+  final Sink<List<String>> _sink;
+  // start of the current element, from earlier chunks
+  final _pending = StringBuffer();
+  bool _inElement = false;
+  // 0 before the opening '[', 1 between elements, more inside an element
+  int _depth = 0;
+  bool _inString = false;
+  bool _escaped = false;
+  bool _afterComma = false;
+  bool _done = false;
+
+  _JsonArraySplitterSink(this._sink);
+
+  @override
+  void addSlice(String chunk, int start, int end, bool isLast) {
+    final elements = <String>[];
+    var elementStart = start;
+    for (var i = start; i < end; i++) {
+      final c = chunk.codeUnitAt(i);
+      if (_inString) {
+        if (_escaped) {
+          _escaped = false;
+        } else if (c == 0x5c) {
+          _escaped = true;
+        } else if (c == 0x22) {
+          _inString = false;
+        }
+        continue;
+      }
+      if (c == 0x20 || c == 0x09 || c == 0x0a || c == 0x0d) continue;
+      if (_done) throw FormatException('data after the end of the array', chunk, i);
+      if (_depth == 0) {
+        if (c != 0x5b) throw FormatException('expected a json array', chunk, i);
+        _depth = 1;
+        continue;
+      }
+      if (_depth == 1 && (c == 0x2c || c == 0x5d)) {
+        if (_inElement) {
+          elements.add(_take(chunk, elementStart, i));
+          _inElement = false;
+        } else if (c == 0x2c || _afterComma) {
+          throw FormatException('missing array element', chunk, i);
+        }
+        _afterComma = c == 0x2c;
+        if (c == 0x5d) _done = true;
+        continue;
+      }
+      if (!_inElement) {
+        _inElement = true;
+        elementStart = i;
+      }
+      if (c == 0x22) {
+        _inString = true;
+      } else if (c == 0x5b || c == 0x7b) {
+        _depth++;
+      } else if (c == 0x5d || c == 0x7d) {
+        _depth--;
+      }
+    }
+    if (_inElement) _pending.write(chunk.substring(elementStart, end));
+    if (elements.isNotEmpty) _sink.add(elements);
+    if (isLast) close();
+  }
+
+  /// text of the element ending at end: carried-over start + this chunk's part, without trailing whitespace
+  String _take(String chunk, int start, int end) {
+    var text = chunk.substring(start, end);
+    if (_pending.isNotEmpty) {
+      text = '$_pending$text';
+      _pending.clear();
+    }
+    return text.trimRight();
+  }
+
+  @override
+  void close() {
+    if (!_done) throw FormatException('unterminated json array');
+    _sink.close();
+  }
+}
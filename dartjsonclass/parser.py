@@ -1,6 +1,5 @@
-import json, re
-from typing import List, Optional, Literal
-import dataclasses
+import functools, json, os, re
+from typing import Dict, Iterable, List, Optional, Literal, Tuple
 from dataclasses import dataclass
 
 class ParseError(Exception): pass
@@ -11,38 +10,58 @@ RE_TEMPLATE = re.compile(r'(\w+)(<.+>)?(\?)?')
 # note: List is on the literals list as a way to hack the thing to accept untyped lists, pending the nesting system working fully. for like Map<String, List>
 DART_LITERALS = Literal['String', 'Int', 'dynamic', 'List']
 DART_COLLECTIONS = Literal['List', 'Map']
+# leaf types that aren't generated classes. anything else in a spec is assumed to be one of ours (is_ext)
+DART_BUILTINS = ('String', 'int', 'double', 'num', 'bool', 'DateTime', 'dynamic', 'Object', 'List', 'Map')
 
 def scoped_split(raw: str, left: str = '<', right: str = '>', delim = ',') -> List[str]:
     "split by comma with scope awareness (<>, (), [] sort of thing). see test_parser.py for examples"
     scope = 0
     sections = []
-    i = 0
-    while i < len(raw):
-        char = raw[i]
+    start = 0
+    for i, char in enumerate(raw):
         if char == left:
             scope += 1
         elif char == right:
             scope -= 1
             assert scope >= 0
         elif char == delim and scope == 0:
-            sections.append(raw[:i])
-            raw = raw[i + 1:]
-            i = 0
-        i += 1
+            sections.append(raw[start:i])
+            start = i + 1
     assert scope == 0
-    if len(raw):
-        sections.append(raw)
+    if start < len(raw):
+        sections.append(raw[start:])
     return [sec.strip() for sec in sections]
 
-@dataclass
+# one DartType per distinct (full_type, nullable, template_class, children, is_ext)
+INTERNED: Dict[tuple, 'DartType'] = {}
+
+@dataclass(frozen=True, eq=False, init=False)
 class DartType:
-    "with template tree support"
+    """
+    With template tree support.
+    Interned: constructing a type that already exists returns the existing instance. Children are interned too,
+    so equal types are the same object, and == / hash are identity.
+    """
     full_type: str
     nullable: bool = False
     template_class: Optional[str] = None
-    children: List['DartType'] = dataclasses.field(default_factory=list)
+    children: Tuple['DartType', ...] = ()
     is_ext: bool = False
 
+    def __new__(cls, full_type: str, nullable: bool = False, template_class: Optional[str] = None, children: Iterable['DartType'] = (), is_ext: bool = False):
+        key = (full_type, nullable, template_class, tuple(children), is_ext)
+        self = INTERNED.get(key)
+        if self is None:
+            self = super().__new__(cls)
+            for name, val in zip(('full_type', 'nullable', 'template_class', 'children', 'is_ext'), key):
+                object.__setattr__(self, name, val)
+            INTERNED[key] = self
+        return self
+
+    def __reduce__(self):
+        # re-intern on unpickle (i.e. in --jobs workers)
+        return (DartType, (self.full_type, self.nullable, self.template_class, self.children, self.is_ext))
+
     def __str__(self):
         return self.full_type
 
@@ -57,18 +76,41 @@ class DartType:
         return '!' if self.nullable else ''
 
     @classmethod
+    def simple(cls, name: str, nullable: bool = False, is_ext: bool = False) -> 'DartType':
+        "non-template type, gets ? when nullable"
+        return cls(name + ('?' if nullable else ''), nullable, is_ext=is_ext)
+
+    @classmethod
+    def list_of(cls, inner: 'DartType', nullable: bool = False) -> 'DartType':
+        return cls(f'List<{inner.full_type}>' + ('?' if nullable else ''), nullable, 'List', (inner,), is_ext=inner.is_ext)
+
+    @classmethod
+    def map_of(cls, key: 'DartType', val: 'DartType', nullable: bool = False) -> 'DartType':
+        # is this right? or should it be val
+        return cls(f'Map<{key.full_type}, {val.full_type}>' + ('?' if nullable else ''), nullable, 'Map', (key, val), is_ext=val.is_ext)
+
+    @classmethod
+    @functools.lru_cache(maxsize=None)
     def parse(cls, raw: str):
         base, template, optional = RE_TEMPLATE.match(raw).groups()
-        children = []
+        children = ()
         if template:
             subtypes = scoped_split(template[1:-1])
             children = [cls.parse(st) for st in subtypes]
-        return cls(full_type=raw, template_class=base if template else None, nullable=bool(optional), children=children)
+            # same rule as list_of / map_of: a collection is ext if its (value) type is
+            is_ext = children[-1].is_ext
+        else:
+            is_ext = base not in DART_BUILTINS
+        return cls(full_type=raw, template_class=base if template else None, nullable=bool(optional), children=children, is_ext=is_ext)
 
     def base(self):
         "full_type ignoring nullability"
         return self.full_type.removesuffix('?')
 
+    def key(self) -> 'DartType':
+        "canonical hashable form of the whole type tree. interning makes that the type itself"
+        return self
+
 @dataclass
 class DartField:
     "parser / model for fields"
@@ -83,6 +125,10 @@ class DartField:
             raise ParseError(f'problem splitting field {raw}')
         return DartField(dart_type=DartType.parse(dtype), name=fname)
 
+    def dump(self) -> str:
+        "inverse of parse"
+        return f'{self.dart_type.full_type} {self.name}'
+
 @dataclass
 class DartClass:
     "parser / model for classes"
@@ -99,13 +145,30 @@ class DartClass:
     @classmethod
     def parse_file(cls, stream):
         "entrypoint for parsing. takes an open file"
+        return [dart_cls for _module, dart_cls in cls.parse_spec(json.load(stream))]
+
+    @classmethod
+    def parse_spec(cls, raw: dict) -> List[Tuple[Optional[str], 'DartClass']]:
+        "parse a loaded spec file into (module, class) pairs. module is the optional 'module' key of each class, used by --mods"
         classes = []
-        for key, val in json.load(stream).items():
+        for key, val in raw.items():
             if key == '_djcmeta':
                 raise NotImplementedError('todo: special meta field')
-            classes.append(cls.parse(key, val))
+            classes.append((val.get('module'), cls.parse(key, val)))
         return classes
 
+    @staticmethod
+    def spec_module(path: str, module: Optional[str]) -> str:
+        "module for a class from spec file path: its 'module' key, else the file's basename"
+        return module or os.path.basename(path).removesuffix('.json')
+
+    def dump(self, module: Optional[str] = None) -> dict:
+        "inverse of parse, the value for this class in a spec file"
+        ret = {'fields': [field.dump() for field in self.fields]}
+        if module is not None:
+            ret['module'] = module
+        return ret
+
     def get_field(self, name: str):
         "get field by name"
         for field in self.fields:
@@ -1,6 +1,6 @@
 "use pydantic classes as a source"
 
-import importlib.util, uuid, os, enum, warnings
+import functools, importlib.util, uuid, os, enum, warnings
 from typing import _GenericAlias, Literal, Union
 from datetime import datetime
 import pydantic
@@ -22,70 +22,66 @@ def classes_in_module(path):
         if isinstance(value, type) and issubclass(value, pydantic.BaseModel)
     ]
 
+def models_in_module(path):
+    "(class, module, name) for models in module, skipping settings classes and BaseModel itself"
+    return [
+        (cls, cls.__module__, cls.__name__)
+        for cls in classes_in_module(path)
+        if cls is not pydantic.BaseModel and not issubclass(cls, pydantic.BaseSettings)
+    ]
+
 def safe_subclass(cls, parent):
     "safe issubclass wrapper"
     return isinstance(cls, type) and issubclass(cls, parent)
 
+# memoized: identical annotations across a schema resolve once. DartTypes are interned, so sharing them is safe
+@functools.lru_cache(maxsize=None)
 def dart_type(py_type: type, nullable: bool = False) -> DartType:
     # warning: are there other Optional cases I'm not picking up? List[Optional[int]], for example
     # careful: List[int] isn't a subclass of type
     # todo: (t: Literal['u'] = 'u') thinks it's optional but isn't. is the default confusing it?
-    null_tail = '?' if nullable else ''
     if py_type is int or safe_subclass(py_type, pydantic.types.ConstrainedInt):
-        return DartType('int' + null_tail, nullable)
+        return DartType.simple('int', nullable)
     elif py_type is float:
-        return DartType('double' + null_tail, nullable)
+        return DartType.simple('double', nullable)
     elif py_type in (str, uuid.UUID) or safe_subclass(py_type, pydantic.types.ConstrainedStr):
-        return DartType('String' + null_tail, nullable)
+        return DartType.simple('String', nullable)
     elif py_type is bool:
-        return DartType('bool' + null_tail, nullable)
+        return DartType.simple('bool', nullable)
     elif py_type is datetime:
-        return DartType('DateTime' + null_tail, nullable)
+        return DartType.simple('DateTime', nullable)
     elif isinstance(py_type, _GenericAlias):
         if py_type.__origin__ is list:
             assert len(py_type.__args__) == 1
-            inner = dart_type(py_type.__args__[0])
-            return DartType(
-                f'List<{inner.full_type}>{null_tail}',
-                nullable,
-                'List',
-                [inner],
-                is_ext=inner.is_ext,
-            )
+            return DartType.list_of(dart_type(py_type.__args__[0]), nullable)
         elif py_type.__origin__ is dict:
             assert len(py_type.__args__) == 2
             key, val = map(dart_type, py_type.__args__)
             assert key.full_type == 'String'
-            return DartType(
-                f'Map<{key.full_type}, {val.full_type}>{null_tail}',
-                nullable,
-                'Map',
-                [key, val], # is this right? or should it be val
-                is_ext=val.is_ext,
-            )
+            return DartType.map_of(key, val, nullable)
         elif py_type.__origin__ is Literal:
             # todo: maybe enum here
-            return DartType('String' + null_tail, nullable)
+            return DartType.simple('String', nullable)
         elif py_type.__origin__ is Union:
             # todo: provide a way to parse the union
             # todo: does dynamic ever need to be nullable?
-            return DartType('dynamic' + null_tail, nullable)
+            return DartType.simple('dynamic', nullable)
         else:
             raise TypeError('unk collection type', py_type, type(py_type), py_type.__origin__)
     elif isinstance(py_type, type) and issubclass(py_type, pydantic.BaseModel):
         # assume this is a tracked type. todo: eventually complain if it's not a known type
-        return DartType(py_type.__name__ + null_tail, nullable, is_ext=True)
+        return DartType.simple(py_type.__name__, nullable, is_ext=True)
     elif isinstance(py_type, type) and issubclass(py_type, enum.Enum):
         # todo: register this globally so we know to generate an enum for it, then ref the type
-        return DartType('String' + null_tail, nullable)
+        return DartType.simple('String', nullable)
     elif py_type is list:
         # todo: include source class in warning
         warnings.warn('bare list, using List but this is probably bad')
-        return DartType('List' + null_tail, nullable)
+        return DartType.simple('List', nullable)
     elif py_type is dict:
         # todo: include source class in warning
         warnings.warn('bare dict, ideally type this')
-        return DartType('Map<String, dynamic>' + null_tail, nullable)
+        return DartType.simple('Map<String, dynamic>', nullable)
     else:
         raise NotImplementedError('unk whatever', py_type)
 
@@ -99,6 +95,8 @@ def pydantic_to_dart(cls: pydantic.BaseModel):
         for field in cls.__fields__.values()
     ])
 
+to_dart = pydantic_to_dart
+
 def dep_classes(cls: pydantic.BaseModel, seen: set = None):
     "list of classes that are dependencies of this one"
     # todo: high pri for test coverage
@@ -0,0 +1,126 @@
+"render DartClasses to dart source. workers are top-level functions so they can run in a process pool"
+
+import contextlib, functools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+from .parser import DartClass
+from .dartgen import genclass
+from .codegen import iter_lines
+from .cache import RenderCache, write_if_changed
+from . import timings
+
+# (class, genclass flags)
+ClassJob = Tuple[DartClass, dict]
+# (output path, file header, [(class, genclass flags, cached text or None)], keep rendered text for the cache)
+ModuleJob = Tuple[str, str, List[Tuple[DartClass, dict, Optional[str]]], bool]
+
+def class_lines(cls: DartClass, flags: dict) -> Iterator[str]:
+    "render one class to lines of dart source, lazily"
+    # todo: python source file + line
+    if timings.TIMINGS is not None:
+        return timed_class_lines(cls, flags)
+    return iter_lines(genclass(cls, **flags).iter_render())
+
+def timed_class_lines(cls: DartClass, flags: dict) -> Iterator[str]:
+    "class_lines for --timings. holds the class's tokens + lines in memory so genclass, render and format time separately"
+    with timings.stage('genclass', cls.name):
+        expr = genclass(cls, **flags)
+    with timings.stage('render', cls.name):
+        tokens = expr.render()
+    with timings.stage('format', cls.name):
+        lines = list(iter_lines(tokens))
+    timings.TIMINGS.note(cls.name, tokens=len(tokens), bytes=sum(map(len, lines)) + len(lines))
+    return iter(lines)
+
+def render_class(job: ClassJob) -> str:
+    "render one class to dart source"
+    return '\n'.join(class_lines(*job))
+
+def class_chunks(cls: DartClass, flags: dict, text: Optional[str] = None) -> Iterator[str]:
+    "source chunks for a class + the blank line after it. streams line by line unless text is already rendered"
+    if text is None:
+        yield from ijoin(class_lines(cls, flags))
+    else:
+        yield text
+    yield '\n\n'
+
+def ijoin(lines: Iterable[str], sep: str = '\n') -> Iterator[str]:
+    "lazy sep.join(lines)"
+    first = True
+    for line in lines:
+        if not first:
+            yield sep
+        first = False
+        yield line
+
+def render_module(job: ModuleJob) -> Tuple[str, bool, Optional[List[str]]]:
+    """
+    Render the classes of one module which missed the cache, write the file if it changed.
+    Returns (path, written, texts). Texts are only collected (and classes only held in memory whole) when keep is set.
+    """
+    fname, header, classes, keep = job
+    texts = [] if keep else None
+    def chunks():
+        yield header
+        for cls, flags, text in classes:
+            if keep:
+                text = text if text is not None else render_class((cls, flags))
+                texts.append(text)
+            yield from class_chunks(cls, flags, text)
+    return fname, write_if_changed(fname, chunks()), texts
+
+def timed_job(fn, job):
+    "run fn(job) in a pool worker with its own --timings, return (result, timings) for the parent to merge"
+    timings.TIMINGS = timings.Timings()
+    return fn(job), timings.TIMINGS
+
+def merge_timings(results: Iterable[tuple]) -> Iterator:
+    "unwrap timed_job results, merging each worker's timings into this process's"
+    for result, worker in results:
+        timings.TIMINGS.merge(worker)
+        yield result
+
+@contextlib.contextmanager
+def mapper(jobs: int = 1):
+    "yields map(fn, items), fanned out to a process pool when jobs > 1. results come back in input order either way"
+    if jobs <= 1:
+        yield map
+        return
+    with ProcessPoolExecutor(jobs) as pool:
+        def pmap(fn, items):
+            # chunks amortize pickling for many small jobs, while leaving enough chunks to balance uneven ones
+            chunksize = max(1, len(items) // (jobs * 4))
+            if timings.TIMINGS is None:
+                return pool.map(fn, items, chunksize=chunksize)
+            return merge_timings(pool.map(functools.partial(timed_job, fn), items, chunksize=chunksize))
+        yield pmap
+
+def render_classes(classes: Sequence[ClassJob], cache: RenderCache = None, jobs: int = 1) -> List[str]:
+    "render classes in order. only cache misses get rendered (in parallel if jobs > 1)"
+    cached = [cache.lookup(cls, flags) if cache else None for cls, flags in classes]
+    misses = [job for job, text in zip(classes, cached) if text is None]
+    with mapper(jobs) as pmap:
+        rendered = iter(list(pmap(render_class, misses)))
+    texts = [text if text is not None else next(rendered) for text in cached]
+    if cache:
+        for (cls, flags), text in zip(classes, texts):
+            cache.store(cls, flags, text)
+    return texts
+
+def iter_classes(classes: Sequence[ClassJob], cache: RenderCache = None, jobs: int = 1) -> Iterator[str]:
+    "source chunks for classes in order. a serial run streams whatever isn't cached; jobs > 1 renders misses whole in the pool"
+    if jobs > 1:
+        for text in render_classes(classes, cache, jobs):
+            yield from (text, '\n\n')
+        return
+    for cls, flags in classes:
+        yield from class_chunks(cls, flags, cache and cache.get(cls, flags, lambda: render_class((cls, flags))))
+
+def render_modules(modules: Sequence[ModuleJob], cache: RenderCache = None, jobs: int = 1):
+    "render + write module files in order (in parallel if jobs > 1), yielding (path, written) as each finishes"
+    with mapper(jobs) as pmap:
+        for (fname, written, texts), (_, _, classes, _) in zip(pmap(render_module, modules), modules):
+            if cache:
+                for (cls, flags, _), text in zip(classes, texts):
+                    cache.store(cls, flags, text)
+            yield fname, written
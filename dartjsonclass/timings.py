@@ -0,0 +1,106 @@
+"--timings: wall time + net allocated blocks per stage and per class, cheap enough to leave on"
+
+import contextlib, json, sys, time
+from typing import Dict, List, Optional
+
+class Timings:
+    """
+    stages are summed over calls; a stage timed for a class also counts toward that class's row.
+    seconds include stages nested inside (output streams genclass / render / format), self_seconds don't
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, dict] = {}
+        self.classes: Dict[str, dict] = {}
+        self.caches: Dict[str, dict] = {}
+        # time spent in nested stages, per open stage
+        self.open: List[float] = []
+        self.workers = 0
+
+    @contextlib.contextmanager
+    def stage(self, name: str, cls_name: Optional[str] = None):
+        # getallocatedblocks is a counter read, unlike tracemalloc which hooks every allocation
+        blocks = sys.getallocatedblocks()
+        self.open.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            blocks = sys.getallocatedblocks() - blocks
+            nested = self.open.pop()
+            if self.open:
+                self.open[-1] += elapsed
+            entry = self.stages.setdefault(name, {'seconds': 0.0, 'self_seconds': 0.0, 'blocks': 0, 'calls': 0})
+            entry['seconds'] += elapsed
+            entry['self_seconds'] += elapsed - nested
+            entry['blocks'] += blocks
+            entry['calls'] += 1
+            if cls_name is not None:
+                row = self.classes.setdefault(cls_name, {})
+                row[name] = row.get(name, 0.0) + elapsed
+                row['blocks'] = row.get('blocks', 0) + blocks
+
+    def note(self, cls_name: str, **counts):
+        "attach counts (tokens, bytes) to a class row"
+        self.classes.setdefault(cls_name, {}).update(counts)
+
+    def merge(self, other: 'Timings'):
+        "add a pool worker's timings. worker stages ran beside this process's, so their times are process time, not wall"
+        for name, entry in other.stages.items():
+            mine = self.stages.setdefault(name, dict.fromkeys(entry, 0))
+            for key, val in entry.items():
+                mine[key] += val
+        for name, row in other.classes.items():
+            mine = self.classes.setdefault(name, {})
+            for key, val in row.items():
+                mine[key] = mine.get(key, 0) + val
+        self.workers += 1
+
+    def largest(self, count: int = 10) -> list:
+        "names of the classes with the most rendered bytes"
+        sized = [name for name, row in self.classes.items() if 'bytes' in row]
+        return sorted(sized, key=lambda name: -self.classes[name]['bytes'])[:count]
+
+    def report(self) -> dict:
+        return {'stages': self.stages, 'classes': self.classes, 'largest': self.largest(), 'caches': self.caches, 'worker_jobs': self.workers}
+
+    def format_text(self) -> str:
+        lines = ['timings:', f"  {'stage':<12} {'calls':>7} {'ms':>9} {'self ms':>9} {'net blocks':>11}"]
+        for name, entry in self.stages.items():
+            lines.append(f"  {name:<12} {entry['calls']:>7} {entry['seconds'] * 1e3:>9.1f} {entry['self_seconds'] * 1e3:>9.1f} {entry['blocks']:>11}")
+        if self.workers:
+            lines.append(f'  (includes {self.workers} pool worker jobs, whose times overlap this process\'s)')
+        rendered = sum('bytes' in row for row in self.classes.values())
+        lines.append(f'{len(self.classes)} classes, {rendered} rendered this run')
+        if rendered:
+            lines.append('largest rendered classes:')
+            for name in self.largest():
+                row = self.classes[name]
+                times = ' '.join(f'{stage} {row[stage] * 1e3:.1f} ms' for stage in ('genclass', 'render', 'format') if stage in row)
+                lines.append(f"  {name:<24} {row['bytes'] / 1e3:>7.1f} kB {row['tokens']:>8} tokens  {times}")
+        if self.caches:
+            lines.append('caches:')
+            for name, stats in self.caches.items():
+                lines.append(f"  {name}: {', '.join(f'{key} {val}' for key, val in stats.items())}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, fmt: str, path: Optional[str] = None):
+        "write the report as 'text' or 'json' to path, or stderr so it never mixes with generated output"
+        body = json.dumps(self.report(), indent=2) + '\n' if fmt == 'json' else self.format_text()
+        if path is None:
+            sys.stderr.write(body)
+        else:
+            with open(path, 'w') as out:
+                out.write(body)
+
+# set by main() when --timings is on. module-level so the render path doesn't need it threaded through
+TIMINGS: Optional[Timings] = None
+
+def stage(name: str, cls_name: Optional[str] = None):
+    "time a stage if --timings is on, otherwise a no-op"
+    return TIMINGS.stage(name, cls_name) if TIMINGS is not None else contextlib.nullcontext()
+
+def cache_info_dict(info) -> dict:
+    "functools cache_info() as a dict"
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize}
@@ -0,0 +1,122 @@
+"--watch: long-lived process that keeps models imported and regenerates what changed"
+
+import importlib, json, os, sys, time, traceback
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from .cache import RenderCache
+from .depgraph import DepGraph, type_refs
+from .ast_source import path_to_module, static_importers
+from .parser import DartClass, DartType, INTERNED
+
+def mtimes(paths: Iterable[str]) -> Dict[str, float]:
+    "mtime per path, missing files as 0 (so deleting + restoring a file counts as a change)"
+    ret = {}
+    for path in paths:
+        try:
+            ret[path] = os.stat(path).st_mtime
+        except FileNotFoundError:
+            ret[path] = 0
+    return ret
+
+def path_modules(path: str) -> Set[str]:
+    "modules generate() puts a source path's classes in: the module of a .py file, the modules named in a .json spec"
+    if not path.endswith('.json'):
+        return {path_to_module(path)}
+    try:
+        with open(path) as stream:
+            return {DartClass.spec_module(path, module) for module, _ in DartClass.parse_spec(json.load(stream))}
+    except (OSError, ValueError):
+        # missing or half-written; the next change will tell
+        return set()
+
+def reset_type_caches():
+    "drop interned DartTypes + every cache keyed on them. generate() converts all classes again, so nothing live is stale"
+    from .dartgen import SUBTREE_CACHE, json_writer
+    INTERNED.clear()
+    DartType.parse.cache_clear()
+    json_writer.cache_clear()
+    type_refs.cache_clear()
+    SUBTREE_CACHE.clear()
+    if 'dartjsonclass.pydantic_source' in sys.modules:
+        sys.modules['dartjsonclass.pydantic_source'].dart_type.cache_clear()
+
+def python_importers(changed: Set[str], watched: Iterable[str]) -> Set[str]:
+    """
+    Watched modules that pull names out of changed modules, transitively. This catches dependencies the DepGraph can't
+    see, like a model subclassing a model from another module.
+    """
+    modules = {name: sys.modules[name] for name in watched if name in sys.modules}
+    ret = set()
+    todo = list(changed)
+    while todo:
+        target = todo.pop()
+        for name, mod in modules.items():
+            if name in ret or name in changed:
+                continue
+            if any(value is sys.modules.get(target) or getattr(value, '__module__', None) == target for value in vars(mod).values()):
+                ret.add(name)
+                todo.append(name)
+    return ret
+
+def reload_order(graph: DepGraph, modules: Set[str]) -> List[str]:
+    "modules sorted so dependencies reload before the modules that use their classes"
+    ordered = dict.fromkeys(graph.module[name] for name in graph.toposort())
+    return [mod for mod in modules if mod not in ordered] + [mod for mod in ordered if mod in modules]
+
+def reload(modules: Iterable[str]):
+    for name in modules:
+        if name in sys.modules:
+            importlib.reload(sys.modules[name])
+        else:
+            importlib.import_module(name)
+
+def watch(args, generate: Callable[..., DepGraph], cache: Optional[RenderCache] = None, interval: float = 0.5):
+    """
+    poll args.paths forever. on change, reload changed modules + their dependents and regenerate the affected outputs.
+    cache is the --cache main() loaded; without one, an in-memory cache keeps unchanged classes warm between cycles
+    """
+    if cache is None:
+        cache = RenderCache.load(None)
+    start = time.perf_counter()
+    graph = generate(args, cache=cache)
+    print(f'generated in {(time.perf_counter() - start) * 1e3:.0f} ms, watching {len(args.paths)} files', file=sys.stderr)
+    by_module = {path_to_module(path): path for path in args.paths if path.endswith('.py')}
+    modules = {path: path_modules(path) for path in args.paths}
+    seen = mtimes(args.paths)
+    # interned types only grow; edits that drop types leave them behind, so start over once there are plenty of those
+    interned = len(INTERNED)
+    while True:
+        time.sleep(interval)
+        current = mtimes(args.paths)
+        changed = set()
+        for path, mtime in current.items():
+            if mtime != seen[path]:
+                # a spec can move classes between modules: both the old and the new ones are affected
+                old, modules[path] = modules[path], path_modules(path)
+                changed |= old | modules[path]
+        if current == seen:
+            continue
+        seen = current
+        start = time.perf_counter()
+        affected = changed | graph.dependents(changed)
+        reset = len(INTERNED) > 2 * interned
+        if reset:
+            reset_type_caches()
+        try:
+            if args.source == 'import':
+                py_changed = changed & by_module.keys()
+                affected |= python_importers(py_changed, by_module)
+                # spec modules aren't python modules, there's nothing to reload for them
+                reload(reload_order(graph, affected & by_module.keys()))
+                from .pydantic_source import dart_type
+                # reloaded classes are new objects; drop resolutions keyed on the old ones
+                dart_type.cache_clear()
+            else:
+                affected |= static_importers(changed, by_module)
+            graph = generate(args, only_modules=affected, cache=cache)
+            if reset:
+                interned = len(INTERNED)
+        except Exception:
+            traceback.print_exc()
+            print('error, waiting for next change', file=sys.stderr)
+            continue
+        print(f"regenerated {', '.join(sorted(affected))} in {(time.perf_counter() - start) * 1e3:.0f} ms", file=sys.stderr)
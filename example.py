@@ -28,3 +28,9 @@ class UnionTester(pydantic.BaseModel):
     union: Union[Item, str]
     list_union: List[Union[Item, str]]
     map_union: Dict[str, Union[Item, str]]
+
+class Nested(pydantic.BaseModel):
+    grid: List[List[int]]
+    groups: Dict[str, List[Item]]
+    rows: List[Dict[str, Item]]
+    sparse: Optional[List[int]]
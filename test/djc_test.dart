@@ -1,3 +1,4 @@
+import 'dart:convert';
 import 'package:djc_example/jsonbase.dart';
 import 'package:djc_example/example.dart';
 import 'package:test/test.dart';
@@ -16,6 +17,10 @@ void commonTests<T extends JsonBaseMeta>(fromMap, fromJson, List<String> fields,
     expect(t.hashCode, jsonRoundtrip(fromJson, t).hashCode, reason: "hashCode");
   });
 
+  test('writeJson_matches_jsonEncode', () {
+    expect(t.toJson(), jsonEncode(t.toMap()));
+  });
+
   test('copy_equal', () {
     expect(t, t.copy());
     expect(t.copy(), jsonRoundtrip(fromJson, t));
@@ -55,12 +60,35 @@ void main() {
       expect(item == Item(1, "two"), false);
     });
 
+    test('fromJsonStream', () async {
+      final items = [item, Item(2, "a, [b]")];
+      final text = jsonEncode(items.map((e) => e.toMap()).toList());
+      final bytes = utf8.encode(text);
+      // split mid-element
+      final stream = Stream.fromIterable([bytes.sublist(0, 7), bytes.sublist(7)]);
+      expect(await Item.fromJsonStream(stream).toList(), items);
+      expect(await Item.fromJsonStringStream(Stream.value(text)).toList(), items);
+    });
+
     test('get_set', () {
       final item = Item(2, "two");
       expect(item.getAttr('a'), 2);
       item.setAttr('a', 3);
       expect(item.getAttr('a'), 3);
     });
+
+    test('get_set_by_index', () {
+      final item = Item(2, "two");
+      final b = item.fieldIndex('b');
+      expect(b, 1);
+      expect(Item.djc__fields[b], 'b');
+      expect(item.getAt(b), "two");
+      item.setAt(b, "three");
+      expect(item.getAttr('b'), "three");
+      expect(() => item.getAt(2), throwsRangeError);
+      expect(() => item.fieldIndex('c'), throwsArgumentError);
+      expect(Item.djc__index, {'a': 0, 'b': 1});
+    });
   });
 
   group('complex_Msg', () {
@@ -84,6 +112,63 @@ void main() {
       expect(round.dt, msg.dt);
       expect(round.dt, TypeMatcher<DateTime>());
     });
+
+    test('copyWith', () {
+      final edited = msg.copyWith(id: "other", maybe: 3);
+      expect(edited.id, "other");
+      expect(edited.maybe, 3);
+      expect(msg.id, "12345");
+      // unchanged fields are shared
+      expect(identical(edited.item_list, msg.item_list), true);
+      expect(identical(edited.item, msg.item), true);
+      expect(msg.copyWith(), msg);
+      // null is a value for nullable fields
+      expect(edited.copyWith(maybe: null).maybe, null);
+      expect(edited.copyWith(id: "x").maybe, 3);
+    });
+
+    test('nested_update', () {
+      final edited = msg.copyWith(item_dict: mapWith(msg.item_dict, "x", (item) => item!.copyWith(b: "changed")));
+      expect(edited.item_dict["x"]!.b, "changed");
+      expect(msg.item_dict["x"]!.b, "three");
+      final listed = msg.copyWith(item_list: listWith(msg.item_list, 0, (item) => item.copyWith(a: 9)));
+      expect(listed.item_list[0].a, 9);
+      expect(msg.item_list[0].a, 2);
+    });
+  });
+
+  group('nested_collections', () {
+    Nested nested() => Nested(
+      [[1, 2], [3]],
+      {"a": [Item(1, "one")], "b": []},
+      [{"x": Item(2, "two")}],
+      null,
+    );
+
+    test('equal', () {
+      expect(nested(), nested());
+      expect(Nested.fromJson(nested().toJson()), nested());
+      expect(nested().copyWith(sparse: [1]), nested().copyWith(sparse: [1]));
+    });
+
+    test('hash', () {
+      expect(nested().hashCode, nested().hashCode);
+      expect(Nested.fromJson(nested().toJson()).hashCode, nested().hashCode);
+      // insertion order doesn't matter to == or hashCode
+      final reordered = nested().copyWith(groups: {"b": [], "a": [Item(1, "one")]});
+      expect(reordered, nested());
+      expect(reordered.hashCode, nested().hashCode);
+      expect({nested(): 1}[reordered], 1);
+    });
+
+    test('not_equal', () {
+      expect(nested() == nested().copyWith(grid: [[1, 2], [4]]), false);
+      expect(nested() == nested().copyWith(grid: [[1, 2]]), false);
+      expect(nested() == nested().copyWith(groups: {"a": [Item(1, "one")], "c": []}), false);
+      expect(nested() == nested().copyWith(groups: {"a": [Item(1, "uno")], "b": []}), false);
+      expect(nested() == nested().copyWith(rows: [{"y": Item(2, "two")}]), false);
+      expect(nested() == nested().copyWith(sparse: []), false);
+    });
   });
 
   test('unions', () {
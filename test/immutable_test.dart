@@ -0,0 +1,80 @@
+import 'package:djc_example/example.dart' as base;
+import 'package:djc_example/example_immutable.dart' as immutable;
+import 'package:test/test.dart';
+
+void main() {
+  final msg = base.Msg(
+    "12345",
+    null,
+    base.Item(1, "one"),
+    DateTime.parse("2022-01-01 12:00:00+00:00"),
+    [base.Item(2, "two")],
+    {"x": base.Item(3, "three")},
+    {"y": base.Item(4, "four")},
+  );
+
+  test('same_json', () {
+    final frozen = immutable.Msg.fromJson(msg.toJson());
+    expect(frozen.toJson(), msg.toJson());
+    expect(immutable.Msg.fromMap(frozen.toMap()), frozen);
+  });
+
+  test('unmodifiable', () {
+    final frozen = immutable.Msg.fromJson(msg.toJson());
+    expect(() => frozen.item_list.add(immutable.Item(5, "five")), throwsUnsupportedError);
+    expect(() => frozen.item_dict["z"] = immutable.Item(5, "five"), throwsUnsupportedError);
+    expect(() => frozen.setAttr("id", "x"), throwsUnsupportedError);
+    // the constructor copies, so the caller's list can't change it later
+    final source = ["a"];
+    final strlist = immutable.StrList(source, {});
+    source.add("b");
+    expect(strlist.strlist, ["a"]);
+  });
+
+  test('dynamic_frozen', () {
+    // union fields are dynamic, the decoded json in them is frozen all the way down so the cached hash holds
+    final union = immutable.UnionTester.fromMap({
+      "union": {"a": 1, "b": "one"},
+      "list_union": [["x"], "y"],
+      "map_union": {"k": {"a": 2, "b": "two"}},
+    });
+    final hash = union.hashCode;
+    expect(() => (union.union as Map)["a"] = 2, throwsUnsupportedError);
+    expect(() => (union.list_union[0] as List).add("z"), throwsUnsupportedError);
+    expect(() => (union.map_union["k"] as Map)["a"] = 3, throwsUnsupportedError);
+    expect(union.hashCode, hash);
+    // and copied, so the caller's map can't change it either
+    final source = {"a": 1};
+    final constructed = immutable.UnionTester(source, [], {});
+    source["a"] = 2;
+    expect(constructed.union["a"], 1);
+  });
+
+  test('const_and_copy', () {
+    const item = immutable.Item(1, "one");
+    expect(identical(item, const immutable.Item(1, "one")), true);
+    final frozen = immutable.Msg.fromJson(msg.toJson());
+    expect(identical(frozen.copy(), frozen), true);
+  });
+
+  test('hash_and_equality', () {
+    final a = immutable.Msg.fromJson(msg.toJson());
+    final b = immutable.Msg.fromMap(msg.toMap());
+    expect(a.hashCode, b.hashCode);
+    expect(a, b);
+    expect({a: 1}[b], 1);
+    expect(a == immutable.Msg.fromMap({...msg.toMap(), "id": "other"}), false);
+  });
+
+  test('copyWith_shares', () {
+    final frozen = immutable.Msg.fromJson(msg.toJson());
+    final edited = frozen.copyWith(id: "other");
+    expect(identical(edited.item_list, frozen.item_list), true);
+    expect(identical(edited.item_dict, frozen.item_dict), true);
+    final source = [immutable.Item(5, "five")];
+    final replaced = frozen.copyWith(item_list: source);
+    source.clear();
+    expect(replaced.item_list.length, 1);
+    expect(() => replaced.item_list.add(immutable.Item(6, "six")), throwsUnsupportedError);
+  });
+}
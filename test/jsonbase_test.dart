@@ -1,3 +1,4 @@
+import 'dart:convert';
 import 'package:djc_example/jsonbase.dart';
 import 'package:test/test.dart';
 
@@ -62,6 +63,133 @@ void main() {
       expect(base.hashCode == {"a": 1, "b": 2}.hashCode, false);
       expect(hashcodeMap(base) == hashcodeMap({"a": 1, "b": 3}), false);
     });
+
+    test('map_order_independent', () {
+      expect(hashcodeMap({"a": 1, "b": 2}), hashcodeMap({"b": 2, "a": 1}));
+      // the key / value pairing still counts
+      expect(hashcodeMap({"a": 1, "b": 2}) == hashcodeMap({"a": 2, "b": 1}), false);
+    });
+
+    test('nested', () {
+      expect(hashcodeList([[1], [2, 3]]), hashcodeList([[1], [2, 3]]));
+      expect(hashcodeList([[1], [2, 3]]) == hashcodeList([[1, 2], [3]]), false);
+      expect(hashcodeMap({"a": [1], "b": {"c": 2}}), hashcodeMap({"b": {"c": 2}, "a": [1]}));
+      expect(hashcodeValue([{"x": 1, "y": 2}]), hashcodeValue([{"y": 2, "x": 1}]));
+    });
+
+    test('limit', () {
+      final long = List<int>.generate(100, (i) => i);
+      expect(hashcodeList(long, limit: 10), hashcodeList(List<int>.of(long), limit: 10));
+      // only the first 10 + the length count
+      expect(hashcodeList(long, limit: 10), hashcodeList([...long.take(99), -1], limit: 10));
+      expect(hashcodeList(long, limit: 10) == hashcodeList(long.take(99).toList(), limit: 10), false);
+      expect(hashcodeList(long, limit: 200), hashcodeList(long));
+    });
+  });
+
+  group('write_json', () {
+    String written(void Function(StringSink) write) {
+      final buffer = StringBuffer();
+      write(buffer);
+      return buffer.toString();
+    }
+
+    test('string_escapes_match_jsonEncode', () {
+      for (final s in ['', 'plain', 'quote " backslash \\', 'ctl \x00 \x1f \b\t\n\f\r', 'pair \u{1f600}', 'lone \ud800 \udc00 x', '\ud800', 'end\\']) {
+        expect(written((sink) => writeJsonString(sink, s)), jsonEncode(s));
+      }
+    });
+
+    test('values_match_jsonEncode', () {
+      for (final value in [null, true, 1, -2.5, 1e21, 'x', [1, 'a'], {'k': null}]) {
+        expect(written((sink) => writeJsonValue(sink, value)), jsonEncode(value));
+      }
+      expect(() => written((sink) => writeJsonNum(sink, double.nan)), throwsA(isA<JsonUnsupportedObjectError>()));
+    });
+
+    test('collections', () {
+      expect(written((sink) => writeJsonList<int>(sink, [1, 2], writeJsonNum)), '[1,2]');
+      expect(written((sink) => writeJsonList<int>(sink, null, writeJsonNum)), 'null');
+      expect(written((sink) => writeJsonMap<List<String>>(sink, {'a': ['"'], 'b': []}, (sink, e) => writeJsonList(sink, e, writeJsonString))), '{"a":["\\""],"b":[]}');
+    });
+  });
+
+  group('copy_with_helpers', () {
+    test('listWith', () {
+      final base = [[1], [2]];
+      final edited = listWith(base, 1, (e) => [...e, 3]);
+      expect(edited, [[1], [2, 3]]);
+      expect(base, [[1], [2]]);
+      expect(identical(edited[0], base[0]), true);
+    });
+
+    test('mapWith', () {
+      final base = {"a": [1]};
+      expect(mapWith<List<int>>(base, "b", (e) => e ?? [0]), {"a": [1], "b": [0]});
+      expect(identical(mapWith<List<int>>(base, "b", (e) => [0])["a"], base["a"]), true);
+      expect(base.length, 1);
+    });
+  });
+
+  group('copy_on_write', () {
+    test('list', () {
+      final storage = [1, 2];
+      // plain lists are copied, so later writes to them don't show
+      final a = cowCopyList(storage);
+      storage.add(5);
+      expect(a, [1, 2]);
+      final b = cowCopyList(a);
+      expect(b is CowList<int> && !identical(b, a), true);
+      b.add(3);
+      a[0] = 9;
+      expect(storage, [1, 2, 5]);
+      expect(a, [9, 2]);
+      expect(b, [1, 2, 3]);
+      expect(listEqual(a.fork(), a), true);
+      expect(hashcodeList(a.fork()), hashcodeList([9, 2]));
+      b.removeAt(0);
+      b.insert(0, 7);
+      b.length = 1;
+      expect(b, [7]);
+    });
+
+    test('map', () {
+      final storage = {"a": 1};
+      final a = CowMap<String, int>.owned(storage);
+      final b = cowCopyMap(a);
+      b["b"] = 2;
+      a.remove("a");
+      // both sides copied before writing to the forked storage
+      expect(storage, {"a": 1});
+      expect(a, {});
+      expect(b, {"a": 1, "b": 2});
+      expect(mapEqual(b.fork(), {"a": 1, "b": 2}), true);
+      expect(hashcodeMap(b.fork()), hashcodeMap({"a": 1, "b": 2}));
+      expect(jsonEncode(b), '{"a":1,"b":2}');
+    });
+  });
+
+  group('array_splitter', () {
+    const doc = ' [ {"a": [1, {"b": "]},\\""}]} , "x,y" ,3, null, [[]] ] ';
+    const elements = ['{"a": [1, {"b": "]},\\""}]}', '"x,y"', '3', 'null', '[[]]'];
+
+    test('whole', () {
+      expect(const JsonArraySplitter().convert(doc), elements);
+      expect(const JsonArraySplitter().convert('[]'), <String>[]);
+    });
+
+    test('every_chunk_boundary', () async {
+      for (var i = 0; i <= doc.length; i++) {
+        final chunks = Stream.fromIterable([doc.substring(0, i), doc.substring(i)]);
+        expect(await chunks.transform(const JsonArraySplitter()).expand((e) => e).toList(), elements);
+      }
+    });
+
+    test('bad_input', () {
+      for (final bad in ['{}', '[1,]', '[,1]', '[1 2', '[1] 2']) {
+        expect(() => const JsonArraySplitter().convert(bad), throwsFormatException, reason: bad);
+      }
+    });
   });
 
   // todo: nested collections like List<List<int>>, Map<String, List<int>>
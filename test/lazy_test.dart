@@ -0,0 +1,99 @@
+import 'dart:convert';
+import 'package:djc_example/example.dart' as base;
+import 'package:djc_example/example_lazy.dart' as lazy;
+import 'package:test/test.dart';
+
+/// --lazy has to behave like the default codegen, it just decodes later
+void main() {
+  final msg = base.Msg(
+    "12345",
+    null,
+    base.Item(1, "one"),
+    DateTime.parse("2022-01-01 12:00:00+00:00"),
+    [base.Item(2, "two")],
+    {"x": base.Item(3, "three")},
+    {"y": base.Item(4, "four")},
+  );
+
+  test('same_values', () {
+    final decoded = lazy.Msg.fromJson(msg.toJson());
+    expect(decoded.id, msg.id);
+    expect(decoded.maybe, null);
+    expect(decoded.dt, msg.dt);
+    expect(decoded.item_list.single.b, "two");
+    expect(jsonDecode(decoded.toJson()), jsonDecode(msg.toJson()));
+  });
+
+  test('untouched_tomap_views_source', () {
+    final raw = msg.toMap();
+    final decoded = lazy.Msg.fromMap(raw);
+    expect(decoded.id, "12345");
+    expect(decoded.dt, msg.dt);
+    final map = decoded.toMap();
+    expect(map, raw);
+    // a view on the source, not a deep copy
+    expect(identical(map["item"], raw["item"]), true);
+    expect(identical(map["item_list"], raw["item_list"]), true);
+    expect(() => map["id"] = "other", throwsUnsupportedError);
+    raw["id"] = "other";
+    expect(map["id"], "other");
+  });
+
+  test('data_methods_keep_source', () {
+    final raw = msg.toMap();
+    final decoded = lazy.Msg.fromMap(raw);
+    expect(decoded, lazy.Msg.fromJson(msg.toJson()));
+    expect(decoded.hashCode, lazy.Msg.fromJson(msg.toJson()).hashCode);
+    decoded.copy();
+    // still untouched, so toMap is built from the source map, not the decoded fields
+    raw["id_dict"]["z"] = {"a": 6, "b": "six"};
+    expect(decoded.toMap()["id_dict"].containsKey("z"), true);
+    // a nested model could be modified through the getter, so from here on toMap is built from the decoded fields,
+    // and id_dict was decoded (by hashCode) before the edit
+    decoded.item;
+    expect(decoded.toMap()["id_dict"].containsKey("z"), false);
+  });
+
+  test('set_after_partial_decode', () {
+    final decoded = lazy.Msg.fromJson(msg.toJson());
+    expect(decoded.id, "12345");
+    decoded.maybe = 7;
+    decoded.id = "other";
+    expect(decoded.toMap()["maybe"], 7);
+    expect(decoded.toMap()["id"], "other");
+    expect(decoded.item_dict["x"]!.b, "three");
+    decoded.maybe = null;
+    expect(decoded.maybe, null);
+  });
+
+  test('in_place_modification', () {
+    final decoded = lazy.Msg.fromJson(msg.toJson());
+    decoded.item.b = "changed";
+    decoded.item_list.add(lazy.Item(5, "five"));
+    final map = jsonDecode(decoded.toJson());
+    expect(map["item"]["b"], "changed");
+    expect(map["item_list"].length, 2);
+  });
+
+  test('data_methods', () {
+    final a = lazy.Msg.fromJson(msg.toJson());
+    final b = lazy.Msg.fromMap(msg.toMap());
+    expect(a, b);
+    expect(a.hashCode, b.hashCode);
+    final copied = a.copy();
+    expect(copied, a);
+    copied.item.b = "changed";
+    expect(a.item.b, "one");
+    expect(a.getAttr("id"), "12345");
+    a.setAttr("id", "x");
+    expect(a.id, "x");
+    expect(lazy.Item(1, "one"), lazy.Item.fromMap({"a": 1, "b": "one"}));
+  });
+
+  test('constructed', () {
+    final item = lazy.NullItem(null);
+    expect(item.item, null);
+    expect(item.toJson(), base.NullItem(null).toJson());
+    expect(lazy.NullItem.fromMap({"item": null}), item);
+  });
+}
@@ -0,0 +1,118 @@
+import 'dart:convert';
+import 'package:djc_example/example.dart' as base;
+import 'package:djc_example/example_lean.dart' as lean;
+import 'package:test/test.dart';
+
+/// lean codegen has to produce the same json as the default codegen
+void main() {
+  final item = base.Item(1, "one");
+  final msg = base.Msg(
+    "12345",
+    null,
+    item,
+    DateTime.parse("2022-01-01 12:00:00+00:00"),
+    [base.Item(2, "two")],
+    {"x": base.Item(3, "three")},
+    {"y": base.Item(4, "four")},
+  );
+  final strlist = base.StrList(["a", "b"], {"x": "y"});
+
+  test('same_json', () {
+    expect(lean.Msg.fromMap(msg.toMap()).toJson(), msg.toJson());
+    expect(lean.StrList.fromMap(strlist.toMap()).toJson(), strlist.toJson());
+    expect(lean.NullItem(null).toJson(), base.NullItem(null).toJson());
+    expect(lean.NullItem(lean.Item(1, "one")).toJson(), base.NullItem(item).toJson());
+  });
+
+  test('roundtrip', () {
+    final leanMsg = lean.Msg.fromJson(msg.toJson());
+    expect(lean.Msg.fromMap(leanMsg.toMap()), leanMsg);
+    expect(jsonDecode(leanMsg.toJson()), jsonDecode(msg.toJson()));
+  });
+
+  test('cow_copy_growable', () {
+    // example_lean has --cow-copy, so lists can grow whether or not copy() ran
+    final decoded = lean.Msg.fromJson(msg.toJson());
+    decoded.item_list.add(lean.Item(5, "five"));
+    final copied = decoded.copy();
+    decoded.item_list.add(lean.Item(6, "six"));
+    copied.item_list.add(lean.Item(7, "seven"));
+    expect(decoded.item_list.map((item) => item.a), [2, 5, 6]);
+    expect(copied.item_list.map((item) => item.a), [2, 5, 7]);
+    final strs = lean.StrList.fromMap(strlist.toMap());
+    strs.strlist.add("c");
+    strs.copy().strlist.add("d");
+    expect(strs.strlist, ["a", "b", "c"]);
+  });
+
+  test('frommap_owned_adopts', () {
+    final raw = jsonDecode(strlist.toJson());
+    final copied = lean.StrList.fromMap(raw);
+    final adopted = lean.StrList.fromMap(raw, owned: true);
+    raw["strlist"][0] = "changed";
+    raw["strmap"]["x"] = "changed";
+    expect(copied.strlist[0], "a");
+    expect(copied.strmap["x"], "y");
+    expect(adopted.strlist[0], "changed");
+    expect(adopted.strmap["x"], "changed");
+  });
+
+  test('tomap_shares_primitive_collections', () {
+    final leanStrList = lean.StrList.fromMap(strlist.toMap());
+    expect(identical(leanStrList.toMap()['strlist'], leanStrList.strlist), true);
+    expect(identical(leanStrList.toMap()['strmap'], leanStrList.strmap), true);
+  });
+
+  test('cow_copy', () {
+    final original = lean.Msg.fromJson(msg.toJson());
+    final copied = original.copy();
+    expect(copied, original);
+    expect(copied.hashCode, original.hashCode);
+    expect(identical(copied.item_list, original.item_list), false);
+    copied.item_list.add(lean.Item(5, "five"));
+    copied.item_dict.remove("x");
+    expect(original.item_list.length, 1);
+    expect(original.item_dict.containsKey("x"), true);
+    // writes on the original side don't show in the copy either
+    final second = original.copy();
+    original.id_dict["z"] = lean.Item(6, "six");
+    expect(second.id_dict.containsKey("z"), false);
+    expect(second == original, false);
+  });
+
+  test('cow_copy_is_a_snapshot', () {
+    // a plain list passed in from outside is copied, not shared, so writes to it don't reach the copy
+    final source = ["a"];
+    final original = lean.StrList(source, {"x": "y"});
+    final copied = original.copy();
+    source.add("b");
+    expect(original.strlist, ["a", "b"]);
+    expect(copied.strlist, ["a"]);
+    // copy() leaves the original's fields alone
+    expect(identical(original.strlist, source), true);
+    // copies of copies fork
+    final again = copied.copy();
+    copied.strlist.add("c");
+    expect(again.strlist, ["a"]);
+  });
+
+  test('compact_roundtrip', () {
+    final leanMsg = lean.Msg.fromJson(msg.toJson());
+    expect(lean.Msg.fromJsonCompact(leanMsg.toJsonCompact()), leanMsg);
+    expect(lean.Msg.fromList(jsonDecode(jsonEncode(leanMsg.toList()))), leanMsg);
+    expect(lean.NullItem.fromJsonCompact(lean.NullItem(null).toJsonCompact()), lean.NullItem(null));
+    final items = [lean.Item(1, "one"), lean.Item(2, "two")];
+    expect(lean.Item.fromJsonCompactList(lean.Item.toJsonCompactList(items)), items);
+    // no keys on the wire
+    expect(leanMsg.toJsonCompact().contains('item_list'), false);
+    expect(leanMsg.toJsonCompact().length < leanMsg.toJson().length, true);
+  });
+
+  test('compact_schema_mismatch', () {
+    final body = jsonEncode(lean.Item(1, "one").toList());
+    expect(() => lean.Item.fromJsonCompact('["000000000000", $body]'), throwsFormatException);
+    expect(() => lean.Item.fromJsonCompact(body), throwsFormatException);
+    // an Item document isn't a Msg document
+    expect(() => lean.Msg.fromJsonCompact(lean.Item(1, "one").toJsonCompact()), throwsFormatException);
+  });
+}
@@ -0,0 +1,102 @@
+import sys, textwrap, warnings
+import pytest
+from dartjsonclass import pydantic_source
+from dartjsonclass.ast_source import StaticSource, resolve_relative, static_importers
+
+MODULES = {
+    'spkg/__init__.py': '',
+    'spkg/base.py': '''
+        import enum
+        from typing import Optional
+        from pydantic import BaseModel, BaseSettings, constr, ConstrainedInt
+
+        Name = constr(max_length=10)
+
+        class Color(enum.Enum):
+            red = 'red'
+
+        class Small(ConstrainedInt):
+            le = 10
+
+        class Settings(BaseSettings):
+            x: int
+
+        class Base(BaseModel):
+            _private: int = 1
+            name: Name
+            color: Color
+            small: Optional[Small] = None
+    ''',
+    'spkg/models.py': '''
+        import datetime as dt, uuid
+        from typing import ClassVar, Dict, List, Literal, Optional, Union
+        import pydantic
+        from .base import Base, Color
+
+        Ids = List[uuid.UUID]
+
+        class Child(Base):
+            ids: Ids
+            when: dt.datetime
+            kind: Literal['a', 'b'] = 'a'
+            color: Optional[Color]
+            parent: 'Optional[Child]' = None
+            default_none: int = pydantic.Field(None)
+            required: int = pydantic.Field(...)
+            counter: ClassVar[int] = 0
+
+        class Holder(pydantic.BaseModel):
+            children: Dict[str, List[Child]]
+            maybe: Union[int, None]
+            many: Union[int, str, None]
+            nested: List[Optional[int]]
+            piped: float | None
+    ''',
+}
+
+@pytest.fixture
+def spkg(tmp_path, monkeypatch):
+    for path, body in MODULES.items():
+        (tmp_path / path).parent.mkdir(exist_ok=True)
+        (tmp_path / path).write_text(textwrap.dedent(body))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield tmp_path
+    for name in list(sys.modules):
+        if name.split('.')[0] == 'spkg':
+            del sys.modules[name]
+
+def test_resolve_relative():
+    assert resolve_relative('a.b', 'c', 1) == 'a.b.c'
+    assert resolve_relative('a.b', 'c', 2) == 'a.c'
+    assert resolve_relative('a.b', None, 1) == 'a.b'
+    assert resolve_relative('', 'x', 0) == 'x'
+
+def test_matches_import(spkg):
+    static = StaticSource()
+    for path in ('spkg/base.py', 'spkg/models.py'):
+        imported = pydantic_source.models_in_module(path)
+        parsed = static.models_in_module(path)
+        assert [(module, name) for _, module, name in parsed] == [(module, name) for _, module, name in imported]
+        assert [static.to_dart(key) for key, _, _ in parsed] == [pydantic_source.to_dart(key) for key, _, _ in imported]
+
+def test_no_import(spkg):
+    # a dependency that can't be installed shouldn't matter to the ast source
+    (spkg / 'spkg/models.py').write_text('import not_installed\n' + (spkg / 'spkg/models.py').read_text())
+    static = StaticSource()
+    assert [name for _, _, name in static.models_in_module('spkg/models.py')] == ['Base', 'Child', 'Holder']
+    assert 'spkg.models' not in sys.modules
+
+def test_bare_collections(spkg):
+    (spkg / 'spkg/bare.py').write_text('import pydantic\nclass Bare(pydantic.BaseModel):\n    l: list\n    d: dict\n')
+    static = StaticSource()
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        cls = static.to_dart(static.models_in_module('spkg/bare.py')[0][0])
+    assert [field.dart_type.full_type for field in cls.fields] == ['List', 'Map<String, dynamic>']
+    assert len(caught) == 2
+
+def test_static_importers(spkg):
+    watched = ['spkg.base', 'spkg.models']
+    assert static_importers({'spkg.base'}, watched) == {'spkg.models'}
+    assert static_importers({'spkg.models'}, watched) == set()
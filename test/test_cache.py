@@ -0,0 +1,36 @@
+import os
+from dartjsonclass.cache import RenderCache, class_fingerprint, write_if_changed
+from .test_parser import TEST_CLASS
+
+def test_fingerprint():
+    assert class_fingerprint(TEST_CLASS, {'meta': True}) == class_fingerprint(TEST_CLASS, {'meta': True})
+    assert class_fingerprint(TEST_CLASS, {'meta': True}) != class_fingerprint(TEST_CLASS, {'meta': False})
+
+def test_render_cache(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    cache = RenderCache.load(path)
+    assert cache.get(TEST_CLASS, {}, lambda: 'rendered') == 'rendered'
+    assert (cache.hits, cache.misses) == (0, 1)
+    cache.save()
+
+    cache = RenderCache.load(path)
+    assert cache.get(TEST_CLASS, {}, lambda: 'not called') == 'rendered'
+    assert cache.get(TEST_CLASS, {'meta': True}, lambda: 'flags changed') == 'flags changed'
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_write_if_changed(tmp_path):
+    path = str(tmp_path / 'out.dart')
+    assert write_if_changed(path, 'x')
+    os.utime(path, (0, 0))
+    assert not write_if_changed(path, 'x')
+    assert os.stat(path).st_mtime == 0
+    assert write_if_changed(path, 'y')
+
+def test_in_memory_retain(tmp_path):
+    cache = RenderCache.load(None)
+    cache.store(TEST_CLASS, {}, 'rendered')
+    cache.save()
+    # a partial run that skips TEST_CLASS keeps its entry
+    cache.retain([TEST_CLASS.name])
+    cache.save()
+    assert cache.lookup(TEST_CLASS, {}) == 'rendered'
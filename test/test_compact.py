@@ -0,0 +1,53 @@
+import json
+import pytest
+from dartjsonclass import compact
+from dartjsonclass.parser import DartClass
+from dartjsonclass.pydantic_source import pydantic_to_dart
+from .test_spec import run
+import example
+
+def msg():
+    return example.Msg(id='1', item=example.Item(a=1, b='x'), dt='2022-01-01T12:00:00+00:00', item_list=[example.Item(a=2, b='y')], item_dict={'k': example.Item(a=3, b='z')}, id_dict={})
+
+def test_fingerprint():
+    classes = {cls.name: cls for cls in map(pydantic_to_dart, compact.model_types(example.Msg))}
+    assert compact.fingerprint('Msg', classes) == compact.fingerprint_for(example.Msg)
+    # referenced classes are part of the schema
+    changed = dict(classes, Item=DartClass.parse('Item', {'fields': ['int a', 'int b']}))
+    assert compact.fingerprint('Msg', changed) != compact.fingerprint('Msg', classes)
+    assert compact.fingerprint('Item', changed) != compact.fingerprint('Item', classes)
+    assert compact.fingerprint_for(example.Item) != compact.fingerprint_for(example.Msg)
+
+def test_roundtrip():
+    raw = compact.dumps_compact(msg())
+    schema, body = json.loads(raw)
+    assert schema == compact.fingerprint_for(example.Msg)
+    assert body[2] == [1, 'x']
+    assert 'item_list' not in raw
+    assert compact.loads_compact(example.Msg, raw) == msg()
+    items = [example.Item(a=1, b='x'), example.Item(a=2, b='y')]
+    assert compact.loads_compact_list(example.Item, compact.dumps_compact_list(example.Item, items)) == items
+
+def test_mismatch():
+    with pytest.raises(ValueError):
+        compact.loads_compact(example.Msg, compact.dumps_compact(example.Item(a=1, b='x')))
+    with pytest.raises(ValueError):
+        compact.loads_compact(example.Msg, json.dumps([compact.fingerprint_for(example.Msg), [1, 2]]))
+
+def test_cli_schema():
+    "generated djc__schema is what the python side writes"
+    out = run('-m', 'dartjsonclass', 'example.py', '--compact')
+    assert f'  static const String djc__schema = "{compact.fingerprint_for(example.Msg)}";' in out.splitlines()
+
+def test_union_stays_keyed():
+    "union fields are dynamic in dart, so models in them keep the keyed json form"
+    union = example.UnionTester(union=example.Item(a=1, b='x'), list_union=['s', example.Item(a=2, b='y')], map_union={'k': example.Item(a=3, b='z')})
+    _, body = json.loads(compact.dumps_compact(union))
+    assert body == [{'a': 1, 'b': 'x'}, ['s', {'a': 2, 'b': 'y'}], {'k': {'a': 3, 'b': 'z'}}]
+    assert compact.loads_compact(example.UnionTester, compact.dumps_compact(union)) == union
+
+def test_cli_schema_filtered():
+    "classes left out by --exclude still count toward the fingerprint"
+    out = run('-m', 'dartjsonclass', 'example.py', '--compact', '--exclude', 'Item')
+    assert 'class Item ' not in out
+    assert f'  static const String djc__schema = "{compact.fingerprint_for(example.Msg)}";' in out.splitlines()
@@ -0,0 +1,58 @@
+import pytest
+from dartjsonclass.depgraph import DepGraph, type_refs
+from dartjsonclass.parser import DartClass, DartField, DartType
+
+def ref(name: str) -> DartType:
+    return DartType(name, is_ext=True)
+
+def list_of(inner: DartType) -> DartType:
+    return DartType(f'List<{inner}>', False, 'List', [inner], inner.is_ext)
+
+def map_of(inner: DartType) -> DartType:
+    return DartType(f'Map<String, {inner}>', False, 'Map', [DartType('String'), inner], inner.is_ext)
+
+def make_class(name: str, *types: DartType) -> DartClass:
+    return DartClass(name, [DartField(dart_type, f'f{i}') for i, dart_type in enumerate(types)])
+
+def make_graph():
+    return DepGraph([
+        ('a', make_class('A', DartType('int'))),
+        ('b', make_class('B', map_of(list_of(ref('A'))), DartType('dynamic'))),
+        ('c', make_class('C', ref('B'), DartType('String'))),
+        ('c', make_class('Node', list_of(ref('Node')))),
+        ('d', make_class('Ping', ref('Pong'))),
+        ('e', make_class('Pong', ref('Ping'), ref('A'))),
+    ])
+
+def test_type_refs():
+    assert type_refs(map_of(list_of(ref('A')))) == {'A'}
+    assert type_refs(DartType('int')) == set()
+
+def test_module_deps():
+    graph = make_graph()
+    # nested Map<String, List<A>> makes an edge; only direct deps are imported
+    assert graph.module_deps == {'a': set(), 'b': {'a'}, 'c': {'b'}, 'd': {'e'}, 'e': {'a', 'd'}}
+
+def test_toposort():
+    order = make_graph().toposort()
+    assert sorted(order) == ['A', 'B', 'C', 'Node', 'Ping', 'Pong']
+    assert order.index('A') < order.index('B') < order.index('C')
+    assert order.index('A') < order.index('Ping')
+
+def test_cycles():
+    assert make_graph().cycles() == [['Node'], ['Ping', 'Pong']]
+
+def test_dependents():
+    graph = make_graph()
+    assert graph.dependents(['a']) == {'b', 'c', 'd', 'e'}
+    assert graph.dependents(['b']) == {'c'}
+    assert graph.dependents(['c']) == set()
+
+def test_missing():
+    with pytest.warns(UserWarning, match='Gone'):
+        DepGraph([('a', make_class('A', ref('Gone')))])
+
+def test_deep_chain():
+    # iterative traversal, no recursion limit
+    graph = DepGraph([('m', make_class(f'C{i}', ref(f'C{i + 1}'))) for i in range(5000)] + [('m', make_class('C5000', DartType('int')))])
+    assert graph.toposort()[:2] == ['C5000', 'C4999']
@@ -0,0 +1,96 @@
+"format_exprs against a copy of the original quadratic formatter"
+import itertools, random
+from typing import List
+import pytest
+from dartjsonclass.codegen import format_exprs, iter_lines, Nosp, Nosemi, Endl, Indent, Dedent
+from dartjsonclass.dartgen import DartExpr, genclass
+from dartjsonclass.parser import DartClass
+from .test_parser import TEST_CLASS
+
+def reference_format_exprs(tokens: list, indent='  ') -> List[str]:
+    "format_exprs as of 0.0.3, kept to check the single-pass version produces identical output"
+    tokens = list(tokens)
+    endl_dedents = [i for i, pair in enumerate(itertools.pairwise(tokens)) if pair == (Endl, Dedent)]
+    for i, index in enumerate(endl_dedents):
+        index -= i
+        tokens[index:index + 2] = (Dedent,)
+    byline = [[]]
+    for tok in tokens:
+        if tok in (Indent, Dedent, Endl):
+            byline.append([tok])
+        else:
+            byline[-1].append(tok)
+    lines = []
+    nindent = 0
+    for linetok in byline:
+        line = []
+        linetok = list(filter(lambda x: x is not None, linetok))
+        for i, tok in enumerate(linetok):
+            if tok in (Nosp, ''):
+                continue
+            elif tok in (Endl, Indent, Dedent):
+                if tok is Indent:
+                    nindent += 1
+                if tok is Dedent:
+                    nindent -= 1
+                line.append(nindent * indent)
+            elif i == len(linetok) - 1 or linetok[i + 1] is Nosp:
+                line.append(tok)
+            else:
+                line.extend((tok, ' '))
+        while Nosemi in line:
+            index = line.index(Nosemi)
+            line[index:index + 2] = []
+        lines.append(''.join(line))
+    return lines
+
+MSG_CLASS = DartClass.parse('Msg', {'fields': [
+    'String id',
+    'int? maybe',
+    'Item item',
+    'DateTime dt',
+    'List<Item> item_list',
+    'Map<String, Item> item_dict',
+    'Map<String, Item>? id_dict',
+    'dynamic union',
+]})
+
+@pytest.mark.parametrize('cls', [TEST_CLASS, MSG_CLASS], ids=lambda cls: cls.name)
+@pytest.mark.parametrize('meta', [True, False])
+@pytest.mark.parametrize('data', [True, False])
+def test_genclass_corpus(cls, meta, data):
+    tokens = genclass(cls, meta=meta, data=data).render()
+    assert format_exprs(tokens) == reference_format_exprs(tokens)
+
+def test_expr_corpus():
+    for expr in [
+        DartExpr.fac2('case', 'true', ['x += 1', 'x *= 3']),
+        DartExpr.fac2('case', None, ['return x'], True),
+        DartExpr.x_block(sig=DartExpr.x_sig(name='f'), children=None),
+        DartExpr.x_block(sig='if (x)', children=[DartExpr.x_block(sig='else', children=['y'], nosemi=Nosemi)], nosemi=Nosemi),
+    ]:
+        tokens = expr.render()
+        assert format_exprs(tokens) == reference_format_exprs(tokens)
+
+def test_random_corpus():
+    rand = random.Random(0)
+    alphabet = ['a', 'bb', '(', ')', ';', '', None, Nosp, Nosemi, Endl, Indent, Dedent]
+    for _ in range(2000):
+        tokens = rand.choices(alphabet, k=rand.randrange(30))
+        assert format_exprs(tokens) == reference_format_exprs(tokens), tokens
+        # second indent width
+        assert format_exprs(tokens, '\t') == reference_format_exprs(tokens, '\t'), tokens
+
+def test_empty():
+    assert format_exprs([]) == reference_format_exprs([]) == ['']
+
+def test_iter_lines_lazy():
+    def endless():
+        while True:
+            yield from ('x', Nosp, ';', Endl)
+    assert list(itertools.islice(iter_lines(endless()), 3)) == ['x;', 'x;', 'x;']
+
+def test_iter_render_matches_render():
+    expr = genclass(MSG_CLASS, meta=True)
+    assert list(expr.iter_render()) == expr.render()
+    assert list(iter_lines(expr.iter_render())) == format_exprs(expr.render())
@@ -1,6 +1,7 @@
 import pytest
-from dartjsonclass.codegen import ajoin, flatten, Nosp, Endl, Indent, Dedent, format_exprs
-from dartjsonclass.dartgen import DartExpr, field_from_map, genclass, maybe_mask
+from dartjsonclass.codegen import Expr, ajoin, flatten, Nosp, Endl, Indent, Dedent, format_exprs, CodegenError
+from dartjsonclass.dartgen import DartExpr, field_from_map, genclass, maybe_mask, tomap_lean, ffm_lean, field_writejson, write_json, unmodifiable, copy_with, cow_copy_field, equality_helpers, hash_field, field_from_list, SUBTREE_CACHE
+from dartjsonclass.parser import DartClass
 from .test_parser import TEST_CLASS
 
 def test_flatten():
@@ -76,3 +77,184 @@ def test_maybe_mask():
     assert maybe_mask([], 'name') == 'name'
     assert maybe_mask(['name'], 'name') == 'this.name'
     assert maybe_mask(['name'], 'other') == 'other'
+
+def test_expr_binding():
+    # fac, fac2 and x_ factories all store args positionally, defaults filled in
+    assert DartExpr.fac('dot', obj='a', field='b') == DartExpr.fac2('dot', 'a', 'b') == DartExpr.x_dot('a', field='b')
+    assert DartExpr.fac2('dot', 'a', 'b').args == ('a', 'b', False)
+    assert DartExpr.fac2('dot', 'a', 'b').kwargs == {'obj': 'a', 'field': 'b', 'elvis': False}
+    with pytest.raises(CodegenError):
+        DartExpr.fac('nope')
+    with pytest.raises(CodegenError):
+        DartExpr.fac('dot', obj='a')
+    with pytest.raises(CodegenError):
+        DartExpr.fac('dot', obj='a', field='b', other='c')
+
+def test_subtree_cache():
+    SUBTREE_CACHE.clear()
+    first = format_exprs(genclass(TEST_CLASS).render())
+    misses = SUBTREE_CACHE.misses
+    assert misses > 0
+    # nested List<List<Other>> reuses the List<Other> subtree for 'elt'
+    assert SUBTREE_CACHE.hits > 0
+    assert format_exprs(genclass(TEST_CLASS).render()) == first
+    assert SUBTREE_CACHE.misses == misses
+    assert SUBTREE_CACHE.stats()['size'] == misses
+
+def lean_helper(field: str):
+    "helper"
+    field = TEST_CLASS.get_field(field)
+    return format_exprs(Expr.maybe_render(tomap_lean(field.dart_type, field.name)))
+
+def test_tomap_lean():
+    # primitive trees pass through
+    assert lean_helper('lstr') == ['lstr']
+    assert lean_helper('optlstr') == ['optlstr']
+    assert lean_helper('lms') == ['lms']
+    assert lean_helper('maplstr') == ['maplstr']
+    assert lean_helper('listo') == ['[for (final e0 in listo) e0.toMap()]']
+    assert lean_helper('optlisto') == ['(optlisto != null) ? [for (final e0 in optlisto!) e0.toMap()] : null']
+    assert lean_helper('mapo') == ['{for (final kv0 in mapo.entries) kv0.key: kv0.value.toMap()}']
+    assert lean_helper('llo') == ['[for (final e0 in llo) [for (final e1 in e0) e1.toMap()]]']
+    assert lean_helper('lmo') == ['[for (final e0 in lmo) {for (final kv1 in e0.entries) kv1.key: kv1.value.toMap()}]']
+    assert lean_helper('maplisto') == ['{for (final kv0 in maplisto.entries) kv0.key: [for (final e1 in kv0.value) e1.toMap()]}']
+
+def ffm_lean_helper(field: str):
+    "helper"
+    return format_exprs(Expr.maybe_render(ffm_lean(TEST_CLASS.get_field(field).dart_type, 'src')))
+
+def test_ffm_lean():
+    assert ffm_lean_helper('str') == ['src']
+    assert ffm_lean_helper('lstr') == ['(owned) ? (src as List).cast<String>() : List<String>.from(src, growable: false)']
+    assert ffm_lean_helper('optlstr') == ['(src != null) ? (owned) ? (src as List).cast<String>() : List<String>.from(src, growable: false) : null']
+    assert ffm_lean_helper('mstr') == ['(owned) ? (src as Map).cast<String, String>() : Map<String, String>.from(src)']
+    assert ffm_lean_helper('listo') == ['List<Other>.generate(src.length, (i0) => Other.fromMap(src[i0], owned: owned), growable: false)']
+    assert ffm_lean_helper('mapo') == ['<String, Other>{for (final kv0 in src.entries) kv0.key: Other.fromMap(kv0.value, owned: owned)}']
+    assert ffm_lean_helper('lms') == [
+        'List<Map<String, String>>.generate(src.length, (i0) => (owned) ? (src[i0] as Map).cast<String, String>() : Map<String, String>.from(src[i0]), growable: false)'
+    ]
+    assert ffm_lean_helper('llo') == [
+        'List<List<Other>>.generate(src.length, (i0) => List<Other>.generate(src[i0].length, (i1) => Other.fromMap(src[i0][i1], owned: owned), growable: false), growable: false)'
+    ]
+
+def test_writejson():
+    assert field_writejson(TEST_CLASS.get_field('str')) == 'writeJsonString(sink, str)'
+    assert field_writejson(TEST_CLASS.get_field('optstr')) == 'writeJsonValue(sink, optstr)'
+    assert field_writejson(TEST_CLASS.get_field('listo')) == 'writeJsonList<Other>(sink, listo, writeJsonOpt)'
+    assert field_writejson(TEST_CLASS.get_field('maplisto')) == 'writeJsonMap<List<Other>>(sink, maplisto, (StringSink sink, List<Other> e) => writeJsonList<Other>(sink, e, writeJsonOpt))'
+    assert field_writejson(TEST_CLASS.get_field('lms')) == 'writeJsonList<Map<String, String>>(sink, lms, (StringSink sink, Map<String, String> e) => writeJsonMap<String>(sink, e, writeJsonString))'
+    lines = format_exprs(write_json(TEST_CLASS).render())
+    assert lines[2:4] == ["""  sink.write('{"str":');""", '  writeJsonString(sink, str);']
+    assert lines[-2] == "  sink.write('}');"
+
+def test_json_stream():
+    lines = format_exprs(genclass(TEST_CLASS).render())
+    assert '  static Stream<Test> fromJsonStream(Stream<List<int>> bytes) => fromJsonStringStream(bytes.transform(utf8.decoder));' in lines
+    assert '  static Stream<Test> fromJsonStringStream(Stream<String> chunks) => chunks.transform(const JsonArraySplitter()).expand((elements) => elements).map((raw) => Test.fromJson(raw));' in lines
+
+def test_lazy():
+    lines = format_exprs(genclass(TEST_CLASS, lazy=True).render())
+    assert '  Test.fromMap(Map<String, dynamic> raw) : _djc__raw = raw;' in lines
+    assert '  String get str => _str ??= _djc__raw!["str"]!;' in lines
+    assert '  String? get optstr => (_djc__raw == null) ? _optstr : _optstr ??= _djc__raw!["optstr"];' in lines
+    # mutable fields count as touched once handed out
+    assert '  List<Other> get _djc__peek_listo => _listo ??= _djc__raw!["listo"].map<Other>((elt) => Other.fromMap(elt)).toList();' in lines
+    index = lines.index('  List<Other> get listo {')
+    assert lines[index + 1:index + 3] == ['    _djc__touched = true;', '    return _djc__peek_listo;']
+    assert '  set str(String value) {' in lines
+    assert any(line.startswith('  Map<String, dynamic> toMap() => (_djc__raw != null && !_djc__touched) ? jsonView(_djc__raw!) : ') for line in lines)
+    # the data methods don't hand fields out
+    assert any(line.startswith('  int get hashCode => Object.hash(str, optstr, hashcodeList(_djc__peek_lstr)') for line in lines)
+    assert any(line.startswith('  Test copy() => (_djc__raw != null && !_djc__touched) ? Test.fromMap(_djc__raw!) : Test(str, optstr, [..._djc__peek_lstr]') for line in lines)
+    with pytest.raises(CodegenError):
+        genclass(TEST_CLASS, lazy=True, lean_frommap=True)
+
+def test_immutable():
+    def helper(field):
+        return format_exprs(Expr.maybe_render(unmodifiable(TEST_CLASS.get_field(field).dart_type, field)))
+    assert helper('str') == ['str']
+    assert helper('lstr') == ['List<String>.unmodifiable(lstr)']
+    assert helper('optlstr') == ['(optlstr != null) ? List<String>.unmodifiable(optlstr!) : null']
+    assert helper('lms') == ['List<Map<String, String>>.unmodifiable(lms.map((e0) => Map<String, String>.unmodifiable(e0)))']
+    assert helper('maplisto') == ['Map<String, List<Other>>.unmodifiable({for (final kv0 in maplisto.entries) kv0.key: List<Other>.unmodifiable(kv0.value)})']
+    lines = format_exprs(genclass(TEST_CLASS, immutable=True).render())
+    assert '  final String str;' in lines
+    assert any(line.startswith('  late final int hashCode = Object.hash(') for line in lines)
+    assert '  Test copy() => this;' in lines
+    scalar = DartClass.parse('Scalar', {'fields': ['int a', 'String? b']})
+    lines = format_exprs(genclass(scalar, immutable=True).render())
+    assert '  const Scalar(this.a, this.b);' in lines
+    assert '  int get hashCode => Object.hash(a, b);' in lines
+    # a nested model's hash recurses, so it's cached, which rules out const
+    lines = format_exprs(genclass(DartClass.parse('Outer', {'fields': ['int a', 'Other? b']}), immutable=True).render())
+    assert '  Outer(this.a, this.b);' in lines
+    assert '  late final int hashCode = Object.hash(a, b);' in lines
+    # dynamic can hold decoded json collections, which would change under the cached hash, so they're frozen too
+    lines = format_exprs(genclass(DartClass.parse('Union', {'fields': ['dynamic a', 'List<dynamic> b']}), immutable=True).render())
+    assert '  Union(dynamic a, List<dynamic> b) : a = jsonFreeze(a), b = List<dynamic>.unmodifiable(b.map((e0) => jsonFreeze(e0)));' in lines
+    with pytest.raises(CodegenError):
+        genclass(TEST_CLASS, lazy=True, immutable=True)
+
+def test_copy_with():
+    cls = DartClass.parse('Part', {'fields': ['String str', 'String? optstr', 'List<String> lstr']})
+    sig = 'Part copyWith({String? str, Object? optstr = djcUnset, List<String>? lstr})'
+    assert format_exprs(copy_with(cls).render()) == [
+        sig + ' => Part(str ?? this.str, (identical(optstr, djcUnset)) ? this.optstr : (optstr as String?), lstr ?? this.lstr)'
+    ]
+    assert format_exprs(copy_with(cls, [cls.fields[2]]).render()) == [
+        sig + ' => Part._djc__shared(str ?? this.str, (identical(optstr, djcUnset)) ? this.optstr : (optstr as String?), (lstr == null) ? this.lstr : List<String>.unmodifiable(lstr))'
+    ]
+
+def test_cow_copy():
+    assert format_exprs(Expr.maybe_render(cow_copy_field(TEST_CLASS.get_field('lstr')))) == ['cowCopyList(lstr)']
+    assert format_exprs(Expr.maybe_render(cow_copy_field(TEST_CLASS.get_field('optlstr')))) == ['(optlstr != null) ? cowCopyList(optlstr!) : null']
+    assert format_exprs(Expr.maybe_render(cow_copy_field(TEST_CLASS.get_field('mapo')))) == ['cowCopyMap(mapo)']
+    assert format_exprs(Expr.maybe_render(cow_copy_field(TEST_CLASS.get_field('str')))) == ['str']
+    # fromMap stores what it decodes copy-on-write, so copies of decoded objects can fork
+    lines = format_exprs(genclass(DartClass.parse('Part', {'fields': ['List<String> lstr', 'Map<String, Other>? mapo']}), cow_copy=True).render())
+    assert '  factory Part.fromMap(Map<String, dynamic> raw) => Part(CowList<String>.owned([...raw["lstr"]]), cowOwnedMap<Other>((raw["mapo"] != null) ? raw["mapo"]?.map<String, Other>((key, val) => MapEntry(key as String, Other.fromMap(val))) : null));' in lines
+    # with --lean-frommap the lists are growable, like the storage a CowList makes on its first write after copy()
+    lines = format_exprs(genclass(DartClass.parse('Part', {'fields': ['List<String> lstr', 'List<Other> lo']}), cow_copy=True, lean_frommap=True).render())
+    assert '    return Part(CowList<String>.owned((owned) ? (lstr_raw as List).cast<String>() : List<String>.from(lstr_raw)), CowList<Other>.owned(List<Other>.generate(lo_raw.length, (i0) => Other.fromMap(lo_raw[i0], owned: owned))));' in lines
+
+def test_equality_helpers():
+    names, helpers = equality_helpers(TEST_CLASS)
+    assert names[TEST_CLASS.get_field('lli').dart_type] == '_djc__eq6'
+    assert names[TEST_CLASS.get_field('lli').dart_type.children[0]] == '_djc__eq7'
+    lines = format_exprs(helpers[6].render())
+    assert lines[0] == 'static bool _djc__eq6(List<List<Int>> a, List<List<Int>> b) {'
+    assert '    if (!_djc__eq7(a[i], b[i])) return false;' in lines
+    # one helper per distinct type
+    assert len(helpers) == len(set(names.values()))
+    lines = format_exprs(helpers[list(names).index(TEST_CLASS.get_field('maplisto').dart_type)].render())
+    assert lines[4:6] == ['    final value = b[key];', f"    if (value == null || !{names[TEST_CLASS.get_field('listo').dart_type]}(a[key]!, value)) return false;"]
+    lines = format_exprs(genclass(TEST_CLASS).render())
+    assert '    if (identical(this, other)) return true;' in lines
+    assert not any('listEqual' in line or 'mapEqual' in line for line in lines)
+
+def test_hash_field():
+    assert hash_field(TEST_CLASS.get_field('str')) == 'str'
+    assert hash_field(TEST_CLASS.get_field('str'), True) == 'str.hashCode'
+    assert hash_field(TEST_CLASS.get_field('lli')) == 'hashcodeList(lli)'
+    assert hash_field(TEST_CLASS.get_field('lli'), limit=16) == 'hashcodeList(lli, limit: 16)'
+    assert hash_field(TEST_CLASS.get_field('mapo'), limit=16) == 'hashcodeMap(mapo, limit: 16)'
+
+def test_get_set_at():
+    lines = format_exprs(genclass(DartClass.parse('Part', {'fields': ['int index', 'String val']})).render())
+    assert '  static const Map<String, int> djc__index = {"index": 0, "val": 1};' in lines
+    start = lines.index('  getAt(int index) {')
+    assert lines[start + 2:start + 5] == ['      case 0: return this.index;', '      case 1: return val;', '      default: throw RangeError.index(index, djc__fields);']
+    start = lines.index('  void setAt(int index, dynamic val) {')
+    assert lines[start + 3] == '        this.index = val;'
+    frozen = format_exprs(genclass(DartClass.parse('Frozen', {'fields': ['int a']}), immutable=True).render())
+    assert '  void setAt(int index, dynamic val) => throw UnsupportedError("Frozen is immutable");' in frozen
+
+def test_compact():
+    assert field_from_list(TEST_CLASS.get_field('str'), 0) == 'raw[0]'
+    assert format_exprs(field_from_list(TEST_CLASS.get_field('optlisto'), 5).render()) == ['(raw[5] != null) ? raw[5]?.map<Other>((elt) => Other.fromList(elt)).toList() : null']
+    lines = format_exprs(genclass(TEST_CLASS, compact='0123456789ab').render())
+    assert '  static const String djc__schema = "0123456789ab";' in lines
+    assert '  factory Test.fromJsonCompact(String raw) => Test.fromList(compactBody(jsonDecode(raw), djc__schema));' in lines
+    tolist = next(line for line in lines if line.startswith('  List<dynamic> toList() => ['))
+    assert 'listo.map' not in tolist and '[for (final e0 in listo) e0.toList()]' in tolist
+    assert not any('djc__schema' in line for line in format_exprs(genclass(TEST_CLASS).render()))
@@ -1,3 +1,4 @@
+import dataclasses, pickle
 import pytest
 from dartjsonclass.parser import DartType, scoped_split, DartClass
 
@@ -8,8 +9,19 @@ def test_scoped_split():
         scoped_split('a, b<c, <d>, e')
     with pytest.raises(AssertionError):
         scoped_split('<>>')
+    # scope opening right after a delimiter
+    assert ['a', '<b, c>'] == scoped_split('a,<b, c>')
+
+def test_interning():
+    assert DartType.parse('Map<String, List<int>>') is DartType.parse('Map<String, List<int>>')
+    assert DartType.parse('Map<String, List<int>>').children[1] is DartType.parse('List<int>')
+    assert DartType('int?', True) is DartType.parse('int?')
+    assert DartType('int?', True) is not DartType('int?', True, is_ext=True)
+    assert {DartType.parse('List<int>'): 1}[DartType('List<int>', False, 'List', [DartType('int')])] == 1
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        DartType.parse('int').nullable = True
+    assert pickle.loads(pickle.dumps(DartType.parse('List<int>'))) is DartType.parse('List<int>')
 
-@pytest.mark.xfail
 def test_type_parser():
     dt = DartType.parse('String')
     assert not dt.nullable
@@ -52,3 +64,9 @@ TEST_CLASS = DartClass.parse('Test', {'fields': [
     'Map<String, List<String>> maplstr',
     'Map<String, List<Other>> maplisto',
 ]})
+
+def test_spec_roundtrip():
+    spec = {'Test': TEST_CLASS.dump('pkg.mod')}
+    assert spec['Test']['module'] == 'pkg.mod'
+    assert DartClass.parse_spec(spec) == [('pkg.mod', TEST_CLASS)]
+    assert DartClass.parse_spec({'Test': TEST_CLASS.dump()}) == [(None, TEST_CLASS)]
@@ -0,0 +1,21 @@
+import dataclasses
+from dartjsonclass.render import render_classes, render_modules
+from .test_parser import TEST_CLASS
+
+CLASSES = [
+    (dataclasses.replace(TEST_CLASS, name=f'Test{i}'), {'meta': bool(i % 2)})
+    for i in range(6)
+]
+
+def test_parallel_matches_serial():
+    assert render_classes(CLASSES, jobs=3) == render_classes(CLASSES)
+
+def test_render_modules(tmp_path):
+    jobs = [
+        (str(tmp_path / f"mod{i}.dart"), "// header\n", [(cls, flags, None) for cls, flags in CLASSES[i::2]], False)
+        for i in range(2)
+    ]
+    assert [written for _, written in render_modules(jobs, jobs=2)] == [True, True]
+    serial = [(tmp_path / f'mod{i}.dart').read_text() for i in range(2)]
+    assert [written for _, written in render_modules(jobs)] == [False, False]
+    assert serial[0].startswith('// header\nclass Test0 extends JsonBase {')
@@ -0,0 +1,24 @@
+import os, subprocess, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run(*args) -> str:
+    "run python with args from the repo root, return stdout"
+    return subprocess.run([sys.executable, *args], capture_output=True, text=True, check=True, cwd=ROOT).stdout
+
+def test_spec_matches_py(tmp_path):
+    spec = tmp_path / 'example.json'
+    run('-m', 'dartjsonclass', 'example.py', '--dump-spec', '-o', str(spec))
+    assert run('-m', 'dartjsonclass', str(spec), '--with-meta', 'Msg') == run('-m', 'dartjsonclass', 'example.py', '--with-meta', 'Msg')
+
+def test_spec_skips_pydantic(tmp_path):
+    spec = tmp_path / 'example.json'
+    run('-m', 'dartjsonclass', 'example.py', '--dump-spec', '-o', str(spec))
+    code = f'''
+import sys
+from dartjsonclass.__main__ import main
+sys.argv = ['dartjsonclass', {str(spec)!r}, '-o', {str(tmp_path / 'out.dart')!r}]
+main()
+print('pydantic' in sys.modules)
+'''
+    assert run('-c', code).strip() == 'False'
@@ -0,0 +1,47 @@
+import json
+from dartjsonclass.timings import Timings
+from .test_spec import run
+
+def test_timings_cli(tmp_path):
+    report_path = tmp_path / 'timings.json'
+    plain = run('-m', 'dartjsonclass', 'example.py')
+    # report goes to the file, generated dart on stdout is unchanged
+    assert run('-m', 'dartjsonclass', 'example.py', '--timings=json', '--timings-file', str(report_path)) == plain
+    report = json.loads(report_path.read_text())
+    assert {'load', 'convert', 'genclass', 'render', 'format', 'output'} <= report['stages'].keys()
+    assert report['stages']['convert']['calls'] == len(report['classes']) == 6
+    assert report['largest'][0] == 'Nested'
+    assert report['classes']['Msg']['tokens'] > 0
+    assert 'subtrees' in report['caches']
+    # output streams the per-class stages, its self time leaves them out
+    output = report['stages']['output']
+    assert output['self_seconds'] < output['seconds']
+
+def test_timings_jobs(tmp_path):
+    "per-class rows recorded in pool workers make it back to the report"
+    report_path = tmp_path / 'timings.json'
+    run('-m', 'dartjsonclass', 'example.py', '-j', '2', '--timings=json', '--timings-file', str(report_path))
+    report = json.loads(report_path.read_text())
+    assert report['worker_jobs'] == 6
+    assert report['stages']['genclass']['calls'] == 6
+    assert report['classes']['Msg']['tokens'] > 0
+
+def test_timings_text():
+    timings = Timings()
+    with timings.stage('genclass', 'A'):
+        pass
+    with timings.stage('genclass', 'B'):
+        pass
+    timings.note('A', tokens=10, bytes=100)
+    assert timings.stages['genclass']['calls'] == 2
+    with timings.stage('outer'):
+        with timings.stage('inner'):
+            pass
+    assert timings.stages['outer']['self_seconds'] <= timings.stages['outer']['seconds'] - timings.stages['inner']['seconds'] + 1e-9
+    worker = Timings()
+    with worker.stage('genclass', 'C'):
+        pass
+    timings.merge(worker)
+    assert timings.stages['genclass']['calls'] == 3 and 'C' in timings.classes
+    assert timings.largest() == ['A']
+    assert 'A ' in timings.format_text()
@@ -0,0 +1,43 @@
+import json, sys, types
+from dartjsonclass.dartgen import SUBTREE_CACHE
+from dartjsonclass.parser import DartType, INTERNED
+from dartjsonclass.watch import path_modules, python_importers, reload_order, reset_type_caches
+from .test_depgraph import make_graph
+
+def test_python_importers(monkeypatch):
+    base = types.ModuleType('wbase')
+    class Base: pass
+    Base.__module__ = 'wbase'
+    base.Base = Base
+    child = types.ModuleType('wchild')
+    child.Base = Base
+    grandchild = types.ModuleType('wgrand')
+    grandchild.child = child
+    other = types.ModuleType('wother')
+    for mod in (base, child, grandchild, other):
+        monkeypatch.setitem(sys.modules, mod.__name__, mod)
+    assert python_importers({'wbase'}, ['wbase', 'wchild', 'wgrand', 'wother']) == {'wchild', 'wgrand'}
+
+def test_reload_order():
+    order = reload_order(make_graph(), {'c', 'a', 'b', 'new'})
+    assert order[0] == 'new'
+    assert order.index('a') < order.index('b') < order.index('c')
+
+def test_path_modules(tmp_path):
+    spec = tmp_path / 'models.json'
+    spec.write_text(json.dumps({'A': {'fields': ['int a'], 'module': 'pkg.a'}, 'B': {'fields': ['int b']}}))
+    assert path_modules(str(spec)) == {'pkg.a', 'models'}
+    assert path_modules('pkg/mod.py') == {'pkg.mod'}
+    assert path_modules(str(tmp_path / 'missing.json')) == set()
+
+def test_reset_type_caches():
+    saved = dict(INTERNED)
+    try:
+        before = DartType.parse('List<Watched>')
+        reset_type_caches()
+        assert not INTERNED and not SUBTREE_CACHE.stats()['size']
+        assert DartType.parse('List<Watched>') is not before
+    finally:
+        # types other tests built at import time are the interned ones again
+        reset_type_caches()
+        INTERNED.update(saved)